@@ -1,26 +1,25 @@
 from azure.storage.blob import BlobServiceClient
 from azure.storage.blob import PublicAccess
+import json
 import os
+import threading
 import time
-from datetime import datetime
-
-AZURE_BLOB_CONNECTION = "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;BlobEndpoint=http://localhost:10003/devstoreaccount1;"
-CONTAINER = "dados-pregao-bolsa"
-
-def print_timestamp():
-    """Retorna timestamp formatado para logs"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-def format_file_size(size_bytes):
-    """Formata tamanho de arquivo em unidades legíveis"""
-    if size_bytes == 0:
-        return "0 B"
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024
-        i += 1
-    return f"{size_bytes:.1f} {size_names[i]}"
+
+from config import AZURE_BLOB_CONNECTION, CONTAINER
+from helpers import print_timestamp, format_file_size
+import instrumentation
+
+# Cliente do Blob Storage compartilhado pelo processo (mantém as conexões HTTP abertas)
+_blob_service = None
+_blob_service_lock = threading.Lock()
+
+def get_blob_service():
+    """Retorna o BlobServiceClient do processo, criando-o na primeira chamada"""
+    global _blob_service
+    with _blob_service_lock:
+        if _blob_service is None:
+            _blob_service = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION)
+        return _blob_service
 
 def save_file_to_blob(file_name, local_path_file):
     """
@@ -45,7 +44,7 @@ def save_file_to_blob(file_name, local_path_file):
     try:
         # Conectar ao serviço
         connect_start = time.time()
-        service = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION)
+        service = get_blob_service()
         container = service.get_container_client(CONTAINER)
         connect_time = time.time() - connect_start
         
@@ -68,6 +67,8 @@ def save_file_to_blob(file_name, local_path_file):
             
         upload_file_time = time.time() - upload_file_start
         total_time = time.time() - upload_start
+        instrumentation.counter("blob_upload_bytes", file_size)
+        instrumentation.observe("blob_upload_seconds", upload_file_time)
         
         # Verificar se upload foi bem-sucedido
         try:
@@ -114,7 +115,7 @@ def get_file_from_blob(file_name):
     try:
         # Conectar ao serviço
         connect_start = time.time()
-        service = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION)
+        service = get_blob_service()
         container = service.get_container_client(CONTAINER)
         connect_time = time.time() - connect_start
         
@@ -156,6 +157,8 @@ def get_file_from_blob(file_name):
         total_time = time.time() - download_start
         
         content_size = len(blob_content.encode('utf-8'))
+        instrumentation.counter("blob_download_bytes", content_size)
+        instrumentation.observe("blob_download_seconds", download_file_time)
         
         print(f"[{print_timestamp()}] [OK] ✅ Download concluído com sucesso!")
         print(f"[{print_timestamp()}] [INFO] 📊 ESTATÍSTICAS DO DOWNLOAD:")
@@ -175,6 +178,88 @@ def get_file_from_blob(file_name):
         print(f"[{print_timestamp()}] [ERROR] ❌ Erro ao baixar arquivo após {total_time:.2f}s: {e}")
         return None
 
+def get_blob_etag(file_name):
+    """
+    Retorna o ETag do arquivo no blob storage sem baixá-lo
+
+    Args:
+        file_name: Nome do arquivo no blob storage
+
+    Returns:
+        str: ETag do blob ou None se o arquivo não existir/erro
+    """
+    try:
+        service = get_blob_service()
+        blob_client = service.get_blob_client(CONTAINER, file_name)
+        return blob_client.get_blob_properties().etag
+    except Exception:
+        return None
+
+def manifest_blob_name(file_name):
+    """Nome do manifesto do dia: BVBG186_250923.xml -> BVBG186_250923.manifest.json"""
+    return f"{os.path.splitext(file_name)[0]}.manifest.json"
+
+def part_blob_names(file_name, count):
+    """
+    Nomes estáveis dos XMLs de um dia
+
+    Um único arquivo mantém o nome do dia (BVBG186_250923.xml); com várias
+    partes, cada uma recebe um sufixo pela ordem do nome no ZIP
+    (BVBG186_250923_part01.xml, ...), sem sobrescrever as demais.
+    """
+    if count == 1:
+        return [file_name]
+    stem = os.path.splitext(file_name)[0]
+    return [f"{stem}_part{i:02d}.xml" for i in range(1, count + 1)]
+
+def save_manifest(file_name, manifest):
+    """
+    Grava o manifesto JSON do dia (depois das partes: sua presença indica o
+    dia completo no blob storage)
+
+    Returns:
+        str: ETag do manifesto
+    """
+    container = get_blob_service().get_container_client(CONTAINER)
+    data = json.dumps(manifest, indent=2).encode("utf-8")
+    container.upload_blob(name=manifest_blob_name(file_name), data=data, overwrite=True)
+    return get_blob_etag(manifest_blob_name(file_name))
+
+def get_manifest(file_name):
+    """
+    Manifesto do dia ou None (dias extraídos antes dos manifestos)
+
+    Returns:
+        dict: {'date', 'created_at', 'source_validator', 'parts': [{'blob', 'member', 'size'}, ...]}
+    """
+    try:
+        blob_client = get_blob_service().get_blob_client(CONTAINER, manifest_blob_name(file_name))
+        return json.loads(blob_client.download_blob().readall())
+    except Exception:
+        return None
+
+def list_day_parts(file_name):
+    """Blobs XML do dia segundo o manifesto (sem manifesto: o próprio file_name)"""
+    manifest = get_manifest(file_name)
+    if manifest and manifest.get("parts"):
+        return [part["blob"] for part in manifest["parts"]]
+    return [file_name]
+
+def get_source_validator(file_name):
+    """
+    Versão do arquivo da B3 que originou o dia, registrada no load_ledger
+
+    Gravada no manifesto na extração (extract.source_validator): ETag ou
+    Last-Modified da B3 ou hash SHA-256 do ZIP. O ETag do blob no Azurite
+    não serve: muda a cada reextração mesmo com o mesmo conteúdo e não muda
+    quando a B3 republica o arquivo sem nova extração.
+
+    Returns:
+        str: Validador ou None (dias sem manifesto ou extraídos antes do validador)
+    """
+    manifest = get_manifest(file_name)
+    return manifest.get("source_validator") if manifest else None
+
 def list_blobs():
     """Lista todos os arquivos no blob storage com informações detalhadas"""
     list_start = time.time()
@@ -185,7 +270,7 @@ def list_blobs():
     try:
         # Conectar ao serviço
         connect_start = time.time()
-        service = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION)
+        service = get_blob_service()
         container = service.get_container_client(CONTAINER)
         connect_time = time.time() - connect_start
         
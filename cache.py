@@ -0,0 +1,138 @@
+"""
+Cache em memória (LRU + TTL) para consultas de leitura
+
+Cada entrada guarda o resultado de uma consulta identificada por
+(consulta, ativos, intervalo) e o intervalo de datas que ela cobre. Quando
+uma carga confirma novas datas, apenas as entradas cujo intervalo inclui
+alguma dessas datas são descartadas (intervalos abertos, como "último
+fechamento", cobrem qualquer data).
+
+O tamanho é limitado por número de entradas e pelo custo total guardado
+(linhas, por padrão; bytes no cache de respostas do quote_service.py); ao
+exceder qualquer limite, as entradas menos usadas saem primeiro.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 2048
+DEFAULT_MAX_ROWS = 500_000
+DEFAULT_TTL_SECONDS = 300
+
+class QueryCache:
+    """
+    Cache LRU com expiração por tempo, limite de linhas e contadores
+
+    Seguro para uso por várias threads (ex.: servidor HTTP com ThreadingHTTPServer).
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_rows=DEFAULT_MAX_ROWS,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        # key -> (valor, expira_em, linhas, início, fim)
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Busca key no cache
+
+        Returns:
+            tuple: (True, valor) em caso de acerto, (False, None) caso contrário
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, key, value, start=None, end=None, cost=None):
+        """
+        Guarda value para key
+
+        Args:
+            start/end: Intervalo de datas coberto pelo resultado (None = aberto),
+                       usado por invalidate_dates
+            cost: Custo da entrada contado em max_rows (padrão: número de linhas)
+        """
+        rows = cost if cost is not None else len(value) if isinstance(value, (list, tuple)) else 1
+        if rows > self.max_rows:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, rows, start, end)
+            self._rows += rows
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, start=None, end=None):
+        """Retorna o valor em cache ou executa loader() e guarda o resultado"""
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = loader()
+        if value is not None:
+            self.put(key, value, start, end)
+        return value
+
+    def invalidate_dates(self, dates):
+        """
+        Descarta as entradas cujo intervalo inclui alguma das datas
+
+        Returns:
+            int: Entradas descartadas
+        """
+        dates = list(dates)
+        if not dates:
+            return 0
+        with self._lock:
+            stale = [
+                key for key, (_, _, _, start, end) in self._entries.items()
+                if any((start is None or start <= d) and (end is None or d <= end) for d in dates)
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self):
+        """Esvazia o cache (os contadores são mantidos)"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._rows = 0
+
+    def stats(self):
+        """Contadores de uso do cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "rows": self._rows,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        """Remove key (chamado com o lock adquirido)"""
+        entry = self._entries.pop(key)
+        self._rows -= entry[2]
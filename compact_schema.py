@@ -0,0 +1,328 @@
+"""
+Armazenamento compacto opcional de cotações (migração 9)
+
+- tickers: dicionário símbolo -> id inteiro
+- cotacoes_compact: (ticker_id, datapregao) + preços e volume em centavos
+  (bigint), particionada por mês como cotacoes
+- cotacoes_compat: view com os nomes e tipos originais de cotacoes
+  (ativo VARCHAR(10), abertura/fechamento DECIMAL(10,2), volume DECIMAL(18,2))
+
+Com COMPACT_STORAGE=1, cotacoes_compact passa a ser o armazenamento das
+cotações: a carga grava apenas nela (load_compact), os ids dos ativos são
+resolvidos logo após o parse (resolve_ticker_ids) e os leitores (queries.py,
+show_db.py, export.py, metrics.py e as tabelas de resumo) consultam
+QUOTES_TABLE, que aponta para a view cotacoes_compat. O histórico já gravado
+em cotacoes é migrado uma única vez com --backfill (e --truncate-source
+libera o espaço da tabela original).
+"""
+
+from helpers import print_timestamp
+import io
+import csv
+import os
+import threading
+import time
+
+# Grava e lê as cotações em cotacoes_compact em vez de cotacoes
+COMPACT_STORAGE = os.getenv("COMPACT_STORAGE", "0") == "1"
+
+# Relação lida pelas consultas de cotações (mesmas colunas de cotacoes)
+QUOTES_TABLE = "cotacoes_compat" if COMPACT_STORAGE else "cotacoes"
+
+# Fator de escala dos preços e do volume (centavos)
+PRICE_SCALE = 100
+
+COMPACT_COLUMNS = ("ticker_id", "datapregao", "abertura", "fechamento", "volume")
+
+# Ids já conhecidos (símbolo -> id); tickers nunca tem linhas apagadas
+_ticker_ids = {}
+_ticker_lock = threading.Lock()
+
+def resolve_ticker_ids(db, cotacoes_data):
+    """
+    Preenche c['ticker_id'] de cada cotação, internando os símbolos novos em tickers
+
+    Os ids ficam em cache no processo: após o primeiro dia, só símbolos
+    nunca vistos vão ao banco.
+
+    Returns:
+        int: Símbolos novos inseridos em tickers
+    """
+    symbols = {c['ativo'] for c in cotacoes_data}
+    created = 0
+    with _ticker_lock:
+        missing = sorted(symbols - _ticker_ids.keys())
+        if missing:
+            if db.engine is None and not db.connect():
+                raise RuntimeError("sem conexão com o banco para resolver os ids de tickers")
+            with db.engine.begin() as conn:
+                # Só insere símbolos ausentes: ON CONFLICT sozinho consumiria o SERIAL a cada carga
+                created = conn.exec_driver_sql("""
+                    INSERT INTO tickers (simbolo)
+                    SELECT s FROM unnest(%s::varchar[]) AS s
+                    WHERE NOT EXISTS (SELECT 1 FROM tickers t WHERE t.simbolo = s)
+                    ON CONFLICT (simbolo) DO NOTHING
+                """, (missing,)).rowcount
+                rows = conn.exec_driver_sql(
+                    "SELECT simbolo, id FROM tickers WHERE simbolo = ANY(%s)", (missing,)
+                ).fetchall()
+            _ticker_ids.update(rows)
+        ids = dict(_ticker_ids)
+
+    for cotacao in cotacoes_data:
+        cotacao['ticker_id'] = ids[cotacao['ativo']]
+    if created:
+        print(f"[{print_timestamp()}] [INFO] 🏷️ {created} ativo(s) novo(s) em tickers")
+    return created
+
+def _cents(value):
+    """Decimal em reais -> inteiro em centavos (None se ausente)"""
+    return None if value is None else int(round(value * PRICE_SCALE))
+
+def _copy_compact(cursor, cotacoes_list):
+    """COPY das cotações, já em centavos, para o staging ordenado pela chave primária"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for cotacao in sorted(cotacoes_list, key=lambda c: (c['ticker_id'], c['data_pregao'])):
+        writer.writerow((
+            cotacao['ticker_id'],
+            cotacao['data_pregao'].isoformat(),
+            *("" if v is None else v for v in (
+                _cents(cotacao.get('abertura')),
+                _cents(cotacao.get('fechamento')),
+                _cents(cotacao.get('volume')),
+            )),
+        ))
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY cotacoes_compact_staging ({', '.join(COMPACT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+def load_compact(db, cotacoes_list, mode="replace"):
+    """
+    Carrega cotações diretamente em cotacoes_compact numa única transação
+
+    replace: remove das datas carregadas os ativos ausentes e faz merge pela
+    chave (ticker_id, datapregao), sem reescrever linhas idênticas.
+    append: insere apenas os pares (ativo, data) ainda inexistentes.
+    As tabelas de resumo são atualizadas na mesma transação.
+
+    Returns:
+        int: Registros carregados (0 em caso de falha)
+    """
+    if not cotacoes_list:
+        print(f"[{print_timestamp()}] [WARNING] ⚠️ Lista de cotações vazia")
+        return 0
+
+    import summary_stats
+
+    load_start = time.time()
+    dates = sorted({c['data_pregao'] for c in cotacoes_list})
+    print(f"[{print_timestamp()}] [INFO] 💾 Carga compacta ({mode}) de {len(cotacoes_list):,} cotações "
+          f"({len(dates)} data(s): {', '.join(str(d) for d in dates)})")
+
+    raw_connection = None
+    try:
+        if any('ticker_id' not in c for c in cotacoes_list):
+            resolve_ticker_ids(db, cotacoes_list)
+        db.ensure_partitions(dates, table="cotacoes_compact")
+
+        raw_connection = db.engine.raw_connection()
+        cursor = raw_connection.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE cotacoes_compact_staging (
+                ticker_id INTEGER NOT NULL,
+                datapregao DATE NOT NULL,
+                abertura BIGINT,
+                fechamento BIGINT,
+                volume BIGINT
+            ) ON COMMIT DROP
+        """)
+        _copy_compact(cursor, cotacoes_list)
+
+        old_pairs = summary_stats.fetch_pairs(cursor, dates)
+        removed = 0
+        if mode == "append":
+            cursor.execute(f"""
+                INSERT INTO cotacoes_compact ({', '.join(COMPACT_COLUMNS)})
+                SELECT DISTINCT ON (ticker_id, datapregao) {', '.join(COMPACT_COLUMNS)}
+                FROM cotacoes_compact_staging
+                ORDER BY ticker_id, datapregao
+                ON CONFLICT (ticker_id, datapregao) DO NOTHING
+            """)
+            written = cursor.rowcount
+            new_pairs = old_pairs | {(c['ativo'], c['data_pregao']) for c in cotacoes_list}
+        else:
+            cursor.execute("""
+                DELETE FROM cotacoes_compact c
+                WHERE c.datapregao = ANY(%s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM cotacoes_compact_staging s
+                      WHERE s.ticker_id = c.ticker_id AND s.datapregao = c.datapregao
+                  )
+            """, (dates,))
+            removed = cursor.rowcount
+            # Linhas idênticas não são reescritas (evita tuplas mortas em recargas)
+            cursor.execute(f"""
+                INSERT INTO cotacoes_compact ({', '.join(COMPACT_COLUMNS)})
+                SELECT DISTINCT ON (ticker_id, datapregao) {', '.join(COMPACT_COLUMNS)}
+                FROM cotacoes_compact_staging
+                ORDER BY ticker_id, datapregao
+                ON CONFLICT (ticker_id, datapregao) DO UPDATE
+                SET abertura = EXCLUDED.abertura,
+                    fechamento = EXCLUDED.fechamento,
+                    volume = EXCLUDED.volume
+                WHERE (cotacoes_compact.abertura, cotacoes_compact.fechamento, cotacoes_compact.volume)
+                      IS DISTINCT FROM (EXCLUDED.abertura, EXCLUDED.fechamento, EXCLUDED.volume)
+            """)
+            written = cursor.rowcount
+            new_pairs = {(c['ativo'], c['data_pregao']) for c in cotacoes_list}
+
+        summary_stats.apply_load_delta(cursor, dates, old_pairs, new_pairs)
+        db.ensure_date_locks(dates)
+        raw_connection.commit()
+    except Exception as e:
+        if raw_connection is not None:
+            raw_connection.rollback()
+        print(f"[{print_timestamp()}] [ERROR] ❌ Falha na carga compacta após {time.time() - load_start:.2f}s: {e}")
+        print(f"[{print_timestamp()}] [INFO] 💡 Nenhuma alteração foi aplicada (transação desfeita)")
+        return 0
+    finally:
+        if raw_connection is not None:
+            raw_connection.close()
+
+    print(f"[{print_timestamp()}] [OK] ✅ cotacoes_compact: {written:,} gravado(s), {removed:,} removido(s) "
+          f"em {time.time() - load_start:.2f}s")
+    return len(cotacoes_list)
+
+def sync_dates(db, dates):
+    """
+    Copia para cotacoes_compact as datas informadas a partir de cotacoes
+
+    Usado apenas na migração do histórico (backfill); com COMPACT_STORAGE=1
+    a carga grava direto em cotacoes_compact. Linhas que já existem em
+    cotacoes_compact (cargas feitas com COMPACT_STORAGE=1) são mantidas: nada
+    é apagado, só as ausentes são copiadas.
+
+    Returns:
+        int: Linhas gravadas em cotacoes_compact
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return 0
+
+    sync_start = time.time()
+    db.ensure_partitions(dates, table="cotacoes_compact")
+
+    raw_connection = db.engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        cursor.execute("""
+            INSERT INTO tickers (simbolo)
+            SELECT DISTINCT c.ativo
+            FROM cotacoes c
+            WHERE c.datapregao = ANY(%s)
+              AND NOT EXISTS (SELECT 1 FROM tickers t WHERE t.simbolo = c.ativo)
+            ON CONFLICT (simbolo) DO NOTHING
+        """, (dates,))
+        new_tickers = cursor.rowcount
+
+        cursor.execute("""
+            INSERT INTO cotacoes_compact (abertura, fechamento, volume, ticker_id, datapregao)
+            SELECT round(c.abertura * %(scale)s)::bigint,
+                   round(c.fechamento * %(scale)s)::bigint,
+                   round(c.volume * %(scale)s)::bigint,
+                   t.id,
+                   c.datapregao
+            FROM cotacoes c
+            JOIN tickers t ON t.simbolo = c.ativo
+            WHERE c.datapregao = ANY(%(dates)s)
+            ORDER BY c.datapregao, t.id
+            ON CONFLICT (ticker_id, datapregao) DO NOTHING
+        """, {"scale": PRICE_SCALE, "dates": dates})
+        written = cursor.rowcount
+        raw_connection.commit()
+    except Exception:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+
+    print(f"[{print_timestamp()}] [OK] ✅ cotacoes_compact: {written:,} registros em "
+          f"{time.time() - sync_start:.2f}s ({new_tickers} ativo(s) novo(s) em tickers)")
+    return written
+
+def backfill(db, chunk_days=31):
+    """
+    Preenche cotacoes_compact com todo o histórico, em blocos de chunk_days datas
+
+    Só as datas com linhas em cotacoes são copiadas; com cotacoes vazia (já
+    esvaziada por --truncate-source) nada é feito.
+
+    Returns:
+        int: Linhas gravadas ou None se cotacoes está vazia
+    """
+    with db.engine.connect() as conn:
+        all_dates = [row[0] for row in conn.exec_driver_sql(
+            "SELECT DISTINCT datapregao FROM cotacoes ORDER BY datapregao"
+        )]
+    if not all_dates:
+        print(f"[{print_timestamp()}] [ERROR] ❌ cotacoes está vazia: nada a copiar para cotacoes_compact "
+              f"(o histórico já foi migrado?)")
+        return None
+    written = 0
+    for i in range(0, len(all_dates), chunk_days):
+        written += sync_dates(db, all_dates[i:i + chunk_days])
+    return written
+
+def truncate_source(db):
+    """
+    Esvazia cotacoes após o backfill, para não manter os dados duplicados
+
+    Só deve ser usado com COMPACT_STORAGE=1 em todos os processos: sem a
+    flag, os leitores voltam a consultar cotacoes.
+    """
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("TRUNCATE cotacoes")
+    print(f"[{print_timestamp()}] [INFO] 🧹 cotacoes esvaziada: as cotações ficam apenas em cotacoes_compact")
+
+def size_report(db):
+    """
+    Compara o espaço de cotacoes e cotacoes_compact (somando as partições)
+
+    Returns:
+        list: Tuplas (tabela, bytes da tabela, bytes dos índices)
+    """
+    report = []
+    with db.engine.connect() as conn:
+        for table in ("cotacoes", "cotacoes_compact"):
+            row = conn.exec_driver_sql("""
+                SELECT COALESCE(SUM(pg_table_size(relid)), 0),
+                       COALESCE(SUM(pg_indexes_size(relid)), 0)
+                FROM pg_partition_tree(to_regclass(%s))
+                WHERE isleaf
+            """, (table,)).fetchone()
+            report.append((table, int(row[0]), int(row[1])))
+    return report
+
+if __name__ == "__main__":
+    import sys
+    from database import DatabaseManager
+
+    db = DatabaseManager()
+    if not (db.connect() and db.create_tables()):
+        sys.exit(1)
+    if "--backfill" in sys.argv[1:]:
+        if backfill(db) is None:
+            sys.exit(1)
+        if "--truncate-source" in sys.argv[1:]:
+            if not COMPACT_STORAGE:
+                print(f"[{print_timestamp()}] [ERROR] ❌ --truncate-source requer COMPACT_STORAGE=1")
+                sys.exit(1)
+            truncate_source(db)
+
+    print(f"{'TABELA':<20} {'DADOS':>12} {'ÍNDICES':>12}")
+    print("-" * 46)
+    for table, table_bytes, index_bytes in size_report(db):
+        print(f"{table:<20} {table_bytes / (1024 * 1024):>10.1f} MB {index_bytes / (1024 * 1024):>10.1f} MB")
@@ -0,0 +1,244 @@
+"""
+Modo daemon do pipeline (main.py --daemon)
+
+Um único processo fica no ar e processa cada novo pregão assim que a B3
+publica o arquivo, reaproveitando o engine do SQLAlchemy, a sessão HTTP
+com a B3 e o cliente do Blob Storage entre as execuções (sem o custo de
+subir um novo interpretador a cada agendamento).
+
+- Antes de DAEMON_POLL_START (horário local) o daemon apenas aguarda
+- Depois, sonda a publicação com requisições condicionais
+  (extract.probe_archive) e espera crescente entre DAEMON_POLL_MIN_SECONDS
+  e DAEMON_POLL_MAX_SECONDS
+- Publicado o arquivo, executa o pipeline em modo direto e passa para o
+  próximo dia útil (dias atrasados são recuperados em sequência)
+- Dias úteis sem arquivo após DAEMON_GIVE_UP_HOURS são tratados como
+  feriados
+- O estado atual fica em DAEMON_STATUS_FILE (JSON) e, com --status-port,
+  em GET /health
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from helpers import yymmdd, print_timestamp
+import json
+import os
+import signal
+import threading
+import time
+
+# Horário local a partir do qual o arquivo do dia passa a ser sondado (após o fechamento)
+DAEMON_POLL_START = os.getenv("DAEMON_POLL_START", "18:00")
+DAEMON_POLL_MIN_SECONDS = int(os.getenv("DAEMON_POLL_MIN_SECONDS", "60"))
+DAEMON_POLL_MAX_SECONDS = int(os.getenv("DAEMON_POLL_MAX_SECONDS", "900"))
+# Horas após o início da sondagem sem arquivo publicado: dia considerado sem pregão
+DAEMON_GIVE_UP_HOURS = int(os.getenv("DAEMON_GIVE_UP_HOURS", "18"))
+DAEMON_STATUS_FILE = os.getenv("DAEMON_STATUS_FILE", "./dados_b3/daemon_status.json")
+
+# Intervalo máximo de espera sem atualizar o estado (mantém o status recente)
+_MAX_SLEEP_SECONDS = 300
+
+class DaemonStatus:
+    """Estado do daemon, gravado em arquivo JSON a cada mudança"""
+
+    def __init__(self, path=DAEMON_STATUS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {
+            "pid": os.getpid(),
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "state": "starting",
+            "next_day": None,
+            "last_poll_at": None,
+            "next_poll_at": None,
+            "last_loaded_day": None,
+            "last_load_seconds": None,
+            "publication_lag_seconds": None,
+            "days_loaded": 0,
+            "last_error": None,
+            "updated_at": None,
+        }
+
+    def update(self, **fields):
+        """Atualiza campos e regrava o arquivo de forma atômica"""
+        with self._lock:
+            self._state.update(fields)
+            self._state["updated_at"] = datetime.now().isoformat(timespec="seconds")
+            snapshot = dict(self._state)
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(snapshot, f, indent=2, default=str)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[{print_timestamp()}] [WARN] ⚠️ Não foi possível gravar {self.path}: {e}")
+
+    def snapshot(self):
+        """Cópia do estado atual"""
+        with self._lock:
+            return dict(self._state)
+
+def start_status_server(status, port, host="127.0.0.1"):
+    """
+    Serve GET /health com o estado do daemon (503 enquanto houver erro) e
+    GET /metrics no formato texto do Prometheus (instrumentation.py)
+    """
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") == "/metrics":
+                from instrumentation import render_prometheus
+                body = render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.path.rstrip("/") not in ("/health", ""):
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            snapshot = status.snapshot()
+            body = json.dumps(snapshot, default=str).encode()
+            self.send_response(503 if snapshot["state"] == "error" else 200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            return
+
+    server = ThreadingHTTPServer((host, port), StatusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="daemon-status", daemon=True).start()
+    print(f"[{print_timestamp()}] [OK] ✅ Status do daemon em http://{host}:{port}/health")
+    return server
+
+def next_weekday(day):
+    """Próximo dia útil (segunda a sexta) depois de day"""
+    day += timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+def poll_start(day):
+    """Horário local em que a sondagem do arquivo de day começa"""
+    hour, minute = (int(part) for part in DAEMON_POLL_START.split(":"))
+    return datetime(day.year, day.month, day.day, hour, minute)
+
+def first_pending_day(db):
+    """Dia útil seguinte ao último pregão carregado (ou hoje, com o banco vazio)"""
+    from sqlalchemy import text
+
+    with db.engine.connect() as conn:
+        last = conn.execute(text("SELECT MAX(datapregao) FROM cotacoes_stats_dia")).scalar()
+    if last:
+        return next_weekday(last)
+    today = datetime.now().date()
+    return today if today.weekday() < 5 else next_weekday(today)
+
+def _publication_lag(validators):
+    """Segundos entre o Last-Modified do arquivo na B3 e agora (None se ausente)"""
+    try:
+        published_at = parsedate_to_datetime(validators["last_modified"])
+        return round((datetime.now(timezone.utc) - published_at).total_seconds(), 1)
+    except (KeyError, TypeError, ValueError):
+        return None
+
+def run_daemon(pipeline, status_port=None, **pipeline_options):
+    """
+    Executa o daemon até SIGTERM/SIGINT
+
+    Args:
+        pipeline: Função que processa um dia, pipeline(date_str, **pipeline_options) -> bool
+                  (main.run_pipeline)
+        status_port: Porta do endpoint GET /health (None = somente arquivo)
+        pipeline_options: Opções repassadas ao pipeline (load_mode, workers, ...)
+    """
+    from database import DatabaseManager
+    from extract import probe_archive
+    from health import check_services
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+
+    status = DaemonStatus()
+    server = start_status_server(status, status_port) if status_port else None
+    db = DatabaseManager()
+
+    day = None
+    validators = None
+    interval = DAEMON_POLL_MIN_SECONDS
+
+    def backoff(state, error=None):
+        nonlocal interval
+        next_poll = datetime.now() + timedelta(seconds=interval)
+        status.update(state=state, last_error=error, next_poll_at=next_poll.isoformat(timespec="seconds"))
+        stop.wait(interval)
+        interval = min(interval * 2, DAEMON_POLL_MAX_SECONDS)
+
+    print(f"[{print_timestamp()}] [INFO] 🛰️ Daemon iniciado (pid {os.getpid()}, estado em {DAEMON_STATUS_FILE})")
+    try:
+        while not stop.is_set():
+            try:
+                # Sondas rápidas com cache: serviço local fora do ar não gasta uma sondagem à B3
+                down = [name for name, result in check_services().items() if not result["ok"]]
+                if down:
+                    print(f"[{print_timestamp()}] [WARN] ⚠️ Serviço(s) indisponível(is): {', '.join(down)}; "
+                          f"nova verificação em {interval}s")
+                    backoff("error", f"{', '.join(down)} indisponível")
+                    continue
+
+                if day is None:
+                    day = first_pending_day(db)
+                    print(f"[{print_timestamp()}] [INFO] 📅 Próximo pregão a carregar: {day}")
+
+                now = datetime.now()
+                start_at = poll_start(day)
+                if now < start_at:
+                    status.update(state="waiting", next_day=day.isoformat(), last_error=None,
+                                  next_poll_at=start_at.isoformat(timespec="seconds"))
+                    stop.wait(min((start_at - now).total_seconds(), _MAX_SLEEP_SECONDS))
+                    continue
+
+                status.update(state="polling", next_day=day.isoformat(), last_poll_at=now.isoformat(timespec="seconds"))
+                published, validators = probe_archive(yymmdd(day), validators)
+
+                if published:
+                    status.update(state="loading")
+                    load_start = time.time()
+                    lag = _publication_lag(validators)
+                    if pipeline(yymmdd(day), **pipeline_options):
+                        load_seconds = round(time.time() - load_start, 1)
+                        lag = round(lag + load_seconds, 1) if lag is not None else None
+                        print(f"[{print_timestamp()}] [OK] ✅ Pregão {day} carregado em {load_seconds}s"
+                              + (f" ({lag}s após a publicação)" if lag is not None else ""))
+                        status.update(state="idle", last_loaded_day=day.isoformat(), last_load_seconds=load_seconds,
+                                      publication_lag_seconds=lag, days_loaded=status.snapshot()["days_loaded"] + 1,
+                                      last_error=None)
+                        day, validators, interval = next_weekday(day), None, DAEMON_POLL_MIN_SECONDS
+                        continue
+                    backoff("error", f"Falha no pipeline de {day}")
+                elif now - start_at > timedelta(hours=DAEMON_GIVE_UP_HOURS):
+                    print(f"[{print_timestamp()}] [INFO] ⏭️ {day}: nenhum arquivo após {DAEMON_GIVE_UP_HOURS}h; "
+                          f"considerado dia sem pregão")
+                    day, validators, interval = next_weekday(day), None, DAEMON_POLL_MIN_SECONDS
+                else:
+                    print(f"[{print_timestamp()}] [INFO] ⏳ {day}: arquivo ainda não publicado; "
+                          f"nova sondagem em {interval}s")
+                    backoff("polling")
+            except Exception as e:
+                print(f"[{print_timestamp()}] [ERROR] ❌ Erro no daemon: {e}")
+                backoff("error", str(e))
+    except KeyboardInterrupt:
+        print(f"\n[{print_timestamp()}] [INFO] ⚠️ Daemon interrompido pelo usuário")
+    finally:
+        status.update(state="stopped", next_poll_at=None)
+        if server:
+            server.shutdown()
+    return True
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Exportação em massa de cotações via COPY ... TO STDOUT
+
+O PostgreSQL gera o CSV e os bytes seguem direto para o arquivo de saída
+(gzip) sem passar por objetos Python linha a linha, com memória constante.
+Para Parquet, o CSV do COPY é lido em streaming pelo leitor do pyarrow
+(dependência opcional) e gravado em row groups.
+
+Com --workers > 1 cada partição mensal que intersecta o intervalo é
+exportada em paralelo, numa conexão própria, para um arquivo por partição.
+
+Uso:
+    python export.py --from=2025-09-01 --to=2025-09-30 [--ticker=PETR4,VALE3]
+                     [--format=csv|parquet] [--workers=4] [--output=caminho]
+"""
+
+from database import DatabaseManager, DB_POOL_SIZE, DB_MAX_OVERFLOW
+from compact_schema import QUOTES_TABLE
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from helpers import print_timestamp, format_file_size
+import gzip
+import os
+import sys
+import threading
+import time
+
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_COLUMNS = ("ativo", "datapregao", "abertura", "fechamento", "volume")
+EXPORT_DIR = "./exports"
+
+GZIP_LEVEL = 6
+PARQUET_ROW_GROUP_SIZE = 250_000
+# Tamanho dos blocos lidos do COPY pelo leitor CSV do pyarrow
+PARQUET_READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+def build_select(cursor, table, tickers, start, end):
+    """
+    SELECT da exportação com os filtros já interpolados
+
+    COPY não aceita parâmetros: os valores são escapados por cursor.mogrify.
+    """
+    clauses = ["datapregao BETWEEN %s AND %s"]
+    params = [start, end]
+    if tickers:
+        clauses.append("ativo = ANY(%s)")
+        params.append(list(tickers))
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM {table} WHERE {' AND '.join(clauses)}"
+    return cursor.mogrify(sql, params).decode()
+
+def _copy_sql(select_sql):
+    """COPY da consulta para STDOUT em CSV com cabeçalho"""
+    return f"COPY ({select_sql}) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+def _write_csv_gzip(cursor, select_sql, path):
+    """COPY direto para um arquivo .csv.gz"""
+    with gzip.open(path, "wb", compresslevel=GZIP_LEVEL) as out:
+        cursor.copy_expert(_copy_sql(select_sql), out)
+
+def _write_parquet(cursor, select_sql, path):
+    """
+    COPY em uma thread escrevendo num pipe; o pyarrow lê o CSV em blocos e
+    grava row groups de PARQUET_ROW_GROUP_SIZE linhas
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("--format=parquet requer pyarrow: pip install pyarrow")
+
+    schema = pa.schema([
+        ("ativo", pa.string()),
+        ("datapregao", pa.date32()),
+        ("abertura", pa.decimal128(10, 2)),
+        ("fechamento", pa.decimal128(10, 2)),
+        ("volume", pa.decimal128(18, 2)),
+    ])
+
+    read_fd, write_fd = os.pipe()
+    reader = os.fdopen(read_fd, "rb")
+    writer = os.fdopen(write_fd, "wb")
+    copy_errors = []
+
+    def produce():
+        try:
+            cursor.copy_expert(_copy_sql(select_sql), writer)
+        except Exception as e:
+            copy_errors.append(e)
+        finally:
+            writer.close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        stream = pacsv.open_csv(
+            reader,
+            read_options=pacsv.ReadOptions(block_size=PARQUET_READ_BLOCK_SIZE),
+            convert_options=pacsv.ConvertOptions(column_types=schema),
+        )
+        pending = []
+        pending_rows = 0
+        with pq.ParquetWriter(path, schema) as parquet:
+            for batch in stream:
+                pending.append(batch)
+                pending_rows += batch.num_rows
+                if pending_rows >= PARQUET_ROW_GROUP_SIZE:
+                    parquet.write_table(pa.Table.from_batches(pending, schema), row_group_size=PARQUET_ROW_GROUP_SIZE)
+                    pending, pending_rows = [], 0
+            if pending:
+                parquet.write_table(pa.Table.from_batches(pending, schema), row_group_size=PARQUET_ROW_GROUP_SIZE)
+    finally:
+        # Fechar a leitura desbloqueia o COPY se o pyarrow parou no meio
+        reader.close()
+        producer.join()
+    if copy_errors:
+        raise copy_errors[0]
+
+def export_one(db, table, tickers, start, end, path, export_format):
+    """
+    Exporta uma tabela (ou partição) para path numa conexão própria
+
+    Returns:
+        int: Bytes gravados
+    """
+    raw_connection = db.engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        # Exportações grandes não devem esbarrar no statement_timeout do pool
+        cursor.execute("SET LOCAL statement_timeout = 0")
+        select_sql = build_select(cursor, table, tickers, start, end)
+        if export_format == "parquet":
+            _write_parquet(cursor, select_sql, path)
+        else:
+            _write_csv_gzip(cursor, select_sql, path)
+        raw_connection.commit()
+    finally:
+        raw_connection.close()
+    return os.path.getsize(path)
+
+def export_range(start, end, tickers=None, export_format="csv", workers=1, output=None, db=None):
+    """
+    Exporta as cotações entre start e end (inclusivos)
+
+    Args:
+        start, end: Datas do intervalo
+        tickers: Lista de ativos (None = todos)
+        export_format: 'csv' (gzip) ou 'parquet'
+        workers: 1 = um único arquivo; > 1 = um arquivo por partição, em paralelo
+        output: Arquivo (workers=1) ou diretório (workers > 1) de saída
+        db: DatabaseManager conectado (padrão: novo)
+
+    Returns:
+        list: Caminhos gerados (vazia em caso de falha)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido: {export_format} (use {', '.join(EXPORT_FORMATS)})")
+
+    db = db or DatabaseManager()
+    if not db.connect():
+        return []
+
+    extension = "parquet" if export_format == "parquet" else "csv.gz"
+    export_start = time.time()
+    print(f"[{print_timestamp()}] [INFO] 📤 Exportando {start} até {end}"
+          f"{' para ' + ','.join(tickers) if tickers else ''} ({export_format}, {workers} worker(s))")
+
+    # Jobs: (rótulo, tabela lida, início, fim, arquivo)
+    if workers <= 1:
+        path = output or os.path.join(EXPORT_DIR, f"cotacoes_{start}_{end}.{extension}")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        jobs = [("cotacoes", QUOTES_TABLE, start, end, path)]
+    else:
+        out_dir = output or os.path.join(EXPORT_DIR, f"cotacoes_{start}_{end}")
+        os.makedirs(out_dir, exist_ok=True)
+        if QUOTES_TABLE == "cotacoes":
+            partitions = [
+                name for name, p_start, p_end in db.list_partitions()
+                if p_start <= end and start < p_end
+            ]
+            jobs = [(name, name, start, end, os.path.join(out_dir, f"{name}.{extension}")) for name in partitions]
+        else:
+            # Armazenamento compacto: cada partição é lida pela view (ativo e preços
+            # decodificados), com o intervalo recortado ao mês da partição
+            jobs = [
+                (name, QUOTES_TABLE, max(start, p_start), min(end, p_end - timedelta(days=1)),
+                 os.path.join(out_dir, f"{name}.{extension}"))
+                for name, p_start, p_end in db.list_partitions("cotacoes_compact")
+                if p_start <= end and start < p_end
+            ]
+        if not jobs:
+            jobs = [("cotacoes", QUOTES_TABLE, start, end, os.path.join(out_dir, f"cotacoes.{extension}"))]
+        workers = min(workers, len(jobs), DB_POOL_SIZE + DB_MAX_OVERFLOW)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = [
+                executor.submit(export_one, db, table, tickers, job_start, job_end, path, export_format)
+                for _, table, job_start, job_end, path in jobs
+            ]
+            total_bytes = 0
+            for (label, _, _, _, path), future in zip(jobs, futures):
+                size = future.result()
+                total_bytes += size
+                print(f"[{print_timestamp()}] [OK] ✅ {label} → {path} ({format_file_size(size)})")
+    except Exception as e:
+        print(f"[{print_timestamp()}] [ERROR] ❌ Falha na exportação após {time.time() - export_start:.2f}s: {e}")
+        return []
+
+    total_time = time.time() - export_start
+    rate = total_bytes / total_time if total_time > 0 else 0
+    print(f"[{print_timestamp()}] [OK] ✅ Exportação concluída: {len(jobs)} arquivo(s), "
+          f"{format_file_size(total_bytes)} em {total_time:.2f}s ({format_file_size(rate)}/s)")
+    return [job[-1] for job in jobs]
+
+def main():
+    """Interpreta os argumentos da linha de comando"""
+    options = {"from": None, "to": None, "ticker": None, "format": "csv", "workers": "1", "output": None}
+    for arg in sys.argv[1:]:
+        key, _, value = arg.lstrip("-").partition("=")
+        if key not in options or not value:
+            print(f"[ERROR] Argumento inválido: {arg}")
+            print(__doc__)
+            sys.exit(1)
+        options[key] = value
+
+    if not options["from"] or not options["to"]:
+        print("[ERROR] Informe --from=AAAA-MM-DD e --to=AAAA-MM-DD")
+        sys.exit(1)
+
+    start = datetime.strptime(options["from"], "%Y-%m-%d").date()
+    end = datetime.strptime(options["to"], "%Y-%m-%d").date()
+    tickers = options["ticker"].upper().split(",") if options["ticker"] else None
+    paths = export_range(start, end, tickers, options["format"], int(options["workers"]), options["output"])
+    sys.exit(0 if paths else 1)
+
+if __name__ == "__main__":
+    main()
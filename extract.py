@@ -1,30 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from helpers import yymmdd
+from helpers import yymmdd, print_timestamp, format_file_size
 import requests
+import hashlib
 import os
 import zipfile
-from azure_storage import save_file_to_blob
+from azure_storage import save_file_to_blob, save_manifest, part_blob_names, manifest_blob_name
 import shutil
+import threading
 import time
 from tqdm import tqdm
+from instrumentation import span, current_span
 
 PATH_TO_SAVE = "./dados_b3"
 
-def print_timestamp():
-    """Retorna timestamp formatado para logs"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-def format_file_size(size_bytes):
-    """Formata tamanho de arquivo em unidades legíveis"""
-    if size_bytes == 0:
-        return "0 B"
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024
-        i += 1
-    return f"{size_bytes:.1f} {size_names[i]}"
-
 def ensure_data_directory():
     """
     Garante que a pasta dados_b3 existe e exibe informações sobre ela
@@ -77,8 +66,111 @@ def ensure_data_directory():
 def build_url_download(date_to_download):
     return f"https://www.b3.com.br/pesquisapregao/download?filelist=SPRE{date_to_download}.zip"
 
-def try_http_download(url):
-    session = requests.Session()
+# Sessão HTTP compartilhada: processos longos (main.py --daemon, scheduler.py)
+# reaproveitam a conexão TLS com a B3 entre downloads e sondagens
+_http_session = None
+_http_session_lock = threading.Lock()
+
+# Timeout da sondagem de publicação (probe_archive), em segundos
+PROBE_TIMEOUT_SECONDS = 10
+
+def get_http_session():
+    """Retorna a requests.Session do processo, criando-a na primeira chamada"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            _http_session = requests.Session()
+        return _http_session
+
+def probe_archive(dt, validators=None):
+    """
+    Verifica se o ZIP da data já foi publicado pela B3 sem baixá-lo
+
+    Requisição condicional: com os validadores da sondagem anterior
+    (ETag/Last-Modified), um 304 indica que nada mudou desde então. Sem 304,
+    apenas os primeiros bytes são pedidos (Range) para conferir a assinatura
+    do ZIP.
+
+    Args:
+        dt: Data no formato YYMMDD
+        validators: dict devolvido pela sondagem anterior da mesma data
+
+    Returns:
+        tuple: (publicado, validators) com 'etag' e 'last_modified' da resposta
+    """
+    validators = dict(validators or {})
+    headers = {"Range": "bytes=0-3"}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+
+    resp = get_http_session().get(build_url_download(dt), headers=headers,
+                                  timeout=PROBE_TIMEOUT_SECONDS, stream=True)
+    try:
+        if resp.status_code == 304:
+            return validators.get("published", False), validators
+        if not resp.ok:
+            return False, validators
+        signature = resp.raw.read(4)
+        validators = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "published": signature[:2] == b"PK",
+        }
+        return validators["published"], validators
+    finally:
+        resp.close()
+
+def source_validator(etag=None, last_modified=None, content=None):
+    """
+    Identificador da versão do arquivo publicada pela B3, gravado no load_ledger
+
+    ETag ou Last-Modified da resposta da B3 permitem comparar versões sem
+    baixar o arquivo (probe_source_validator); sem eles, o hash SHA-256 do
+    ZIP baixado identifica o conteúdo.
+
+    Returns:
+        str: 'b3-etag:...', 'b3-last-modified:...', 'sha256:...' ou None
+    """
+    if etag:
+        return f"b3-etag:{etag}"
+    if last_modified:
+        return f"b3-last-modified:{last_modified}"
+    if content is not None:
+        return f"sha256:{hashlib.sha256(content).hexdigest()}"
+    return None
+
+def probe_source_validator(dt):
+    """
+    Validador da versão publicada pela B3 sem baixar o arquivo
+
+    Returns:
+        str: Validador ou None se a B3 não envia ETag/Last-Modified, se o
+             arquivo não está publicado ou se a sondagem falhou (nesses casos
+             só o hash do conteúdo, após o download, identifica a versão)
+    """
+    try:
+        published, validators = probe_archive(dt)
+    except requests.RequestException:
+        return None
+    if not published:
+        return None
+    return source_validator(validators.get("etag"), validators.get("last_modified"))
+
+# Validador de cada data baixada (download_zip), gravado no manifesto por upload_xml
+_source_validators = {}
+
+def try_http_download(url, response_headers=None):
+    """
+    Baixa url com a sessão compartilhada
+
+    response_headers: dict opcional preenchido com os cabeçalhos da resposta
+
+    Returns:
+        tuple: (bytes do ZIP, nome do arquivo) ou (None, None) em caso de falha
+    """
+    session = get_http_session()
     download_start = time.time()
     
     try:
@@ -86,6 +178,8 @@ def try_http_download(url):
         print(f"[{print_timestamp()}] [INFO] ⏳ Conectando ao servidor da B3...")
         
         resp = session.get(url, timeout=30, stream=True)
+        if response_headers is not None:
+            response_headers.update(resp.headers)
         
         if not resp.ok:
             print(f"[{print_timestamp()}] [ERROR] ❌ Servidor retornou status {resp.status_code}")
@@ -160,134 +254,185 @@ def try_http_download(url):
         print(f"[{print_timestamp()}] [ERROR] 🌐 Falha na requisição após {download_time:.2f}s: {e}")
         return None, None
 
-def run(date_str=None):
+def download_zip(dt):
     """
-    Executa o processo de extração de dados da B3
+    Baixa o ZIP de cotações da data e salva em PATH_TO_SAVE
 
     Args:
-        date_str: Data no formato YYMMDD (ex: "251007"). Se None, usa data do dia anterior
-                 (mais realista, pois dados ficam disponíveis após fechamento do pregão)
+        dt: Data no formato YYMMDD
+
+    Returns:
+        str: Caminho do ZIP salvo
     """
-    extraction_start = time.time()
+    with span("download", date=dt) as sp:
+        url_to_download = build_url_download(dt)
+        print(f"[{print_timestamp()}] [INFO] 🔗 URL: {url_to_download}")
+
+        # 1) Download do Zip
+        print(f"[{print_timestamp()}] [INFO] 📥 Iniciando download do arquivo de cotações...")
+        response_headers = requests.structures.CaseInsensitiveDict()
+        zip_bytes, zip_name = try_http_download(url_to_download, response_headers)
+
+        if not zip_bytes or not zip_name:
+            raise RuntimeError(f"❌ Não foi possível baixar o arquivo de cotações para a data {dt} após {sp.elapsed():.2f}s. "
+                             f"Verifique se a data é válida e se os dados estão disponíveis na B3.")
+
+        sp.add("bytes", len(zip_bytes))
+        _source_validators[dt] = source_validator(
+            response_headers.get("ETag"), response_headers.get("Last-Modified"), zip_bytes
+        )
+        print(f"[{print_timestamp()}] [OK] ✅ Download concluído: {zip_name}")
+
+        # 2) Salvar o Zip
+        save_start = time.time()
+        zip_path = f"{PATH_TO_SAVE}/pregao_{dt}.zip"
     
-    if date_str:
-        dt = date_str
-    else:
-        # Usa data do dia anterior por padrão (dados mais prováveis de estar disponíveis)
-        from datetime import timedelta
-        yesterday = datetime.now() - timedelta(days=1)
-        dt = yymmdd(yesterday)
-        print(f"[{print_timestamp()}] [INFO] 📅 Usando data do dia anterior: {dt}")
-
-    url_to_download = build_url_download(dt)
-
-    print(f"[{print_timestamp()}] [INFO] 🎯 Extraindo dados para a data: {dt}")
-    print(f"[{print_timestamp()}] [INFO] 🔗 URL: {url_to_download}")
-
-    # Verificar/criar pasta dados_b3
-    ensure_data_directory()
+        print(f"[{print_timestamp()}] [INFO] 💾 Salvando arquivo ZIP localmente...")
+        with open(zip_path, "wb") as f:
+            f.write(zip_bytes)
     
-    # 1) Download do Zip
-    print(f"[{print_timestamp()}] [INFO] 📥 Iniciando download do arquivo de cotações...")
-    zip_bytes, zip_name = try_http_download(url_to_download)
+        save_time = time.time() - save_start
+        zip_size = os.path.getsize(zip_path)
+        print(f"[{print_timestamp()}] [OK] ✅ ZIP salvo em {zip_path} ({format_file_size(zip_size)}) em {save_time:.2f}s")
+        return zip_path
 
-    if not zip_bytes or not zip_name:
-        elapsed = time.time() - extraction_start
-        raise RuntimeError(f"❌ Não foi possível baixar o arquivo de cotações para a data {dt} após {elapsed:.2f}s. "
-                         f"Verifique se a data é válida e se os dados estão disponíveis na B3.")
-
-    print(f"[{print_timestamp()}] [OK] ✅ Download concluído: {zip_name}")
+def unzip_spre(dt, zip_path):
+    """
+    Extrai o ZIP externo e o ZIP interno SPRE{dt}.zip
 
-    # 2) Salvar o Zip
-    save_start = time.time()
-    zip_path = f"{PATH_TO_SAVE}/pregao_{dt}.zip"
-    
-    print(f"[{print_timestamp()}] [INFO] 💾 Salvando arquivo ZIP localmente...")
-    with open(zip_path, "wb") as f:
-        f.write(zip_bytes)
+    Returns:
+        list: Caminhos dos arquivos XML extraídos
+    """
+    with span("unzip", date=dt) as sp:
     
-    save_time = time.time() - save_start
-    zip_size = os.path.getsize(zip_path)
-    print(f"[{print_timestamp()}] [OK] ✅ ZIP salvo em {zip_path} ({format_file_size(zip_size)}) em {save_time:.2f}s")
+        try:
+            # Extrair a primeira pasta
+            print(f"[{print_timestamp()}] [INFO] 📦 Extraindo arquivo principal: {zip_path}")
+            with zipfile.ZipFile(zip_path, "r") as zf:
+                file_list = zf.namelist()
+                print(f"[{print_timestamp()}] [INFO] 📋 Arquivos no ZIP externo: {len(file_list)} itens")
+                for file_name in file_list:
+                    print(f"[{print_timestamp()}] [INFO]   📄 {file_name}")
+                zf.extractall(f"{PATH_TO_SAVE}/pregao_{dt}")
+
+            # Extrair a segunda parte
+            inner_zip_path = f"{PATH_TO_SAVE}/pregao_{dt}/SPRE{dt}.zip"
+            if not os.path.exists(inner_zip_path):
+                raise RuntimeError(f"❌ Arquivo interno não encontrado: {inner_zip_path}")
 
-    # 3) Extrair os arquivos do zip
-    extraction_start_inner = time.time()
-    
-    try:
-        # Extrair a primeira pasta
-        print(f"[{print_timestamp()}] [INFO] 📦 Extraindo arquivo principal: {zip_path}")
-        with zipfile.ZipFile(zip_path, "r") as zf:
-            file_list = zf.namelist()
-            print(f"[{print_timestamp()}] [INFO] 📋 Arquivos no ZIP externo: {len(file_list)} itens")
-            for file_name in file_list:
-                print(f"[{print_timestamp()}] [INFO]   📄 {file_name}")
-            zf.extractall(f"{PATH_TO_SAVE}/pregao_{dt}")
-
-        # Extrair a segunda parte
-        inner_zip_path = f"{PATH_TO_SAVE}/pregao_{dt}/SPRE{dt}.zip"
-        if not os.path.exists(inner_zip_path):
-            raise RuntimeError(f"❌ Arquivo interno não encontrado: {inner_zip_path}")
-
-        inner_zip_size = os.path.getsize(inner_zip_path)
-        print(f"[{print_timestamp()}] [INFO] 📦 Extraindo arquivo interno: {inner_zip_path} ({format_file_size(inner_zip_size)})")
+            inner_zip_size = os.path.getsize(inner_zip_path)
+            print(f"[{print_timestamp()}] [INFO] 📦 Extraindo arquivo interno: {inner_zip_path} ({format_file_size(inner_zip_size)})")
         
-        with zipfile.ZipFile(inner_zip_path, "r") as zf:
-            inner_file_list = zf.namelist()
-            print(f"[{print_timestamp()}] [INFO] 📋 Arquivos no ZIP interno: {len(inner_file_list)} itens")
-            for file_name in inner_file_list:
-                print(f"[{print_timestamp()}] [INFO]   📄 {file_name}")
-            zf.extractall(f"{PATH_TO_SAVE}/SPRE{dt}")
+            with zipfile.ZipFile(inner_zip_path, "r") as zf:
+                inner_file_list = zf.namelist()
+                print(f"[{print_timestamp()}] [INFO] 📋 Arquivos no ZIP interno: {len(inner_file_list)} itens")
+                for file_name in inner_file_list:
+                    print(f"[{print_timestamp()}] [INFO]   📄 {file_name}")
+                zf.extractall(f"{PATH_TO_SAVE}/SPRE{dt}")
+                sp.add("bytes", sum(info.file_size for info in zf.infolist()))
+                sp.add("files", len(inner_file_list))
         
-        extraction_time = time.time() - extraction_start_inner
-        print(f"[{print_timestamp()}] [OK] ✅ Extração concluída em {extraction_time:.2f}s")
+            print(f"[{print_timestamp()}] [OK] ✅ Extração concluída em {sp.elapsed():.2f}s")
 
-    except zipfile.BadZipFile as e:
-        raise RuntimeError(f"❌ Arquivo ZIP corrompido: {e}")
-    except Exception as e:
-        raise RuntimeError(f"❌ Erro na extração do ZIP: {e}")
+        except zipfile.BadZipFile as e:
+            raise RuntimeError(f"❌ Arquivo ZIP corrompido: {e}")
+        except Exception as e:
+            raise RuntimeError(f"❌ Erro na extração do ZIP: {e}")
 
+        # Ordem estável pelo nome no ZIP: define os nomes das partes no blob
+        return [f"{PATH_TO_SAVE}/SPRE{dt}/{arquivo}" for arquivo in sorted(os.listdir(f"{PATH_TO_SAVE}/SPRE{dt}"))]
 
-    # Subir arquivo para o Blob Storage
-    upload_start = time.time()
-    print(f"[{print_timestamp()}] [INFO] ☁️ Preparando upload para Blob Storage...")
-    
-    arquivos = [f for f in os.listdir(f"{PATH_TO_SAVE}/SPRE{dt}")]
+# Uploads simultâneos das partes de um mesmo dia
+UPLOAD_WORKERS = 4
 
-    if not arquivos:
-        raise RuntimeError("❌ Nenhum arquivo encontrado após extração")
+def upload_xml(dt, xml_paths):
+    """
+    Envia os XMLs extraídos para o Blob Storage, grava o manifesto do dia e
+    remove as cópias locais
 
-    print(f"[{print_timestamp()}] [INFO] 📁 Arquivos encontrados para upload: {len(arquivos)}")
-    
-    for i, arquivo in enumerate(arquivos, 1):
-        # Usa o nome real do arquivo com prefixo padronizado para o blob
-        blob_name = f"BVBG186_{dt}.xml"
-        arquivo_path = f"{PATH_TO_SAVE}/SPRE{dt}/{arquivo}"
-        
-        arquivo_size = os.path.getsize(arquivo_path)
-        print(f"[{print_timestamp()}] [INFO] ☁️ Enviando {arquivo} ({format_file_size(arquivo_size)}) para blob storage como {blob_name} ({i}/{len(arquivos)})")
-        
-        upload_file_start = time.time()
-        save_file_to_blob(blob_name, arquivo_path)
-        upload_file_time = time.time() - upload_file_start
-        
-        print(f"[{print_timestamp()}] [OK] ✅ Upload concluído em {upload_file_time:.2f}s")
+    Cada parte recebe um nome próprio (azure_storage.part_blob_names) e as
+    partes são enviadas em paralelo; o manifesto é gravado por último.
 
-        # Apagar arquivo XML local APÓS envio para blob storage
-        try:
-            os.remove(arquivo_path)
-            print(f"[{print_timestamp()}] [INFO] 🗑️ Arquivo local removido: {arquivo_path}")
-        except Exception as e:
-            print(f"[{print_timestamp()}] [WARN] ⚠️ Erro ao remover arquivo local {arquivo_path}: {e}")
+    Returns:
+        str: Nome do dia no blob storage (BVBG186_{dt}.xml), chave do load_ledger
+    """
+    with span("upload", date=dt) as sp:
+        print(f"[{print_timestamp()}] [INFO] ☁️ Preparando upload para Blob Storage...")
+
+        if not xml_paths:
+            raise RuntimeError("❌ Nenhum arquivo encontrado após extração")
+
+        print(f"[{print_timestamp()}] [INFO] 📁 Arquivos encontrados para upload: {len(xml_paths)}")
+
+        blob_name = f"BVBG186_{dt}.xml"
+        part_names = part_blob_names(blob_name, len(xml_paths))
+
+        def upload_part(i, arquivo_path, part_name):
+            arquivo = os.path.basename(arquivo_path)
+            arquivo_size = os.path.getsize(arquivo_path)
+            print(f"[{print_timestamp()}] [INFO] ☁️ Enviando {arquivo} ({format_file_size(arquivo_size)}) para blob storage como {part_name} ({i}/{len(xml_paths)})")
+
+            upload_file_start = time.time()
+            if not save_file_to_blob(part_name, arquivo_path):
+                # Mantém o XML local: o blob é o registro oficial e não foi gravado
+                raise RuntimeError(f"❌ Falha no upload de {arquivo} para o blob storage")
+            upload_file_time = time.time() - upload_file_start
+            print(f"[{print_timestamp()}] [OK] ✅ Upload de {part_name} concluído em {upload_file_time:.2f}s")
+            return {"blob": part_name, "member": arquivo, "size": arquivo_size}
+
+        with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(xml_paths))) as executor:
+            futures = [
+                executor.submit(upload_part, i, path, name)
+                for i, (path, name) in enumerate(zip(xml_paths, part_names), 1)
+            ]
+            parts = [future.result() for future in futures]
+        sp.add("bytes", sum(part["size"] for part in parts))
+        sp.add("files", len(parts))
+
+        # Manifesto só depois de todas as partes: sua presença indica o dia completo
+        save_manifest(blob_name, {
+            "date": dt,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "source_validator": _source_validators.get(dt),
+            "parts": parts,
+        })
+        print(f"[{print_timestamp()}] [OK] ✅ Manifesto {manifest_blob_name(blob_name)} gravado ({len(parts)} parte(s))")
+
+        # Apagar arquivos XML locais APÓS envio para blob storage
+        for arquivo_path in xml_paths:
+            try:
+                os.remove(arquivo_path)
+                print(f"[{print_timestamp()}] [INFO] 🗑️ Arquivo local removido: {arquivo_path}")
+            except Exception as e:
+                print(f"[{print_timestamp()}] [WARN] ⚠️ Erro ao remover arquivo local {arquivo_path}: {e}")
     
-    upload_total_time = time.time() - upload_start
-    print(f"[{print_timestamp()}] [OK] ✅ Todos os uploads concluídos em {upload_total_time:.2f}s")
+        print(f"[{print_timestamp()}] [OK] ✅ Todos os uploads concluídos em {sp.elapsed():.2f}s")
+        return blob_name
 
-    # Limpar arquivos temporários mantendo estrutura organizada
+def read_xml_parts(dt, xml_paths):
+    """
+    Lê os XMLs extraídos para a memória
+
+    Returns:
+        dict: nome da parte no blob -> bytes (na ordem de xml_paths)
+    """
+    part_names = part_blob_names(f"BVBG186_{dt}.xml", len(xml_paths))
+    xml_parts = {}
+    for name, path in zip(part_names, xml_paths):
+        with open(path, "rb") as f:
+            xml_parts[name] = f.read()
+    return xml_parts
+
+def cleanup_temp_files(dt):
+    """Remove ZIPs e pastas temporárias da data (mantém a pasta dados_b3)"""
     cleanup_start = time.time()
     print(f"[{print_timestamp()}] [INFO] 🧹 Iniciando limpeza de arquivos temporários...")
+    _source_validators.pop(dt, None)
     
     files_removed = 0
     dirs_removed = 0
+    zip_path = f"{PATH_TO_SAVE}/pregao_{dt}.zip"
+    inner_zip_path = f"{PATH_TO_SAVE}/pregao_{dt}/SPRE{dt}.zip"
     
     try:
         # Remove apenas os arquivos ZIP temporários, mantém os XMLs extraídos
@@ -321,12 +466,85 @@ def run(date_str=None):
         print(f"[{print_timestamp()}] [WARN] ⚠️ Erro ao limpar arquivos temporários: {e}")
 
     cleanup_time = time.time() - cleanup_start
-    total_time = time.time() - extraction_start
-    
     print(f"[{print_timestamp()}] [OK] ✅ Limpeza concluída em {cleanup_time:.2f}s ({files_removed} arquivos, {dirs_removed} pastas removidas)")
+
+# Arquivamento no blob em segundo plano (modo direto)
+_archive_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="archive")
+
+def archive_xml(dt, xml_paths, parent=None):
+    """
+    Envia os XMLs ao blob storage e limpa os temporários da data
+
+    parent: span de quem agendou o arquivamento (o upload roda em outra thread)
+    """
+    with span("archive", parent=parent, date=dt):
+        blob_name = upload_xml(dt, xml_paths)
+        cleanup_temp_files(dt)
+    return blob_name
+
+def extract_direct(dt):
+    """
+    Modo direto: baixa e descompacta o arquivo da data e entrega o XML em
+    memória ao parser, enquanto o arquivamento no blob roda em paralelo
+
+    O blob storage continua sendo o registro oficial: quem consome os bytes
+    deve aguardar o Future antes de registrar a carga no load_ledger.
+
+    Args:
+        dt: Data no formato YYMMDD
+
+    Returns:
+        tuple: (dict parte -> bytes do XML, Future do arquivamento com o nome do dia)
+    """
+    ensure_data_directory()
+    zip_path = download_zip(dt)
+    xml_paths = unzip_spre(dt, zip_path)
+    if not xml_paths:
+        raise RuntimeError("❌ Nenhum arquivo encontrado após extração")
+
+    read_start = time.time()
+    xml_parts = read_xml_parts(dt, xml_paths)
+    total_size = sum(len(data) for data in xml_parts.values())
+    print(f"[{print_timestamp()}] [INFO] ⚡ {len(xml_parts)} XML(s) entregue(s) diretamente ao parser "
+          f"({format_file_size(total_size)} em {time.time() - read_start:.2f}s); arquivando no blob em paralelo")
+
+    archive = _archive_executor.submit(archive_xml, dt, xml_paths, current_span())
+    return xml_parts, archive
+
+def run(date_str=None):
+    """
+    Executa o processo de extração de dados da B3
+
+    Args:
+        date_str: Data no formato YYMMDD (ex: "251007"). Se None, usa data do dia anterior
+                 (mais realista, pois dados ficam disponíveis após fechamento do pregão)
+    """
+    extraction_start = time.time()
+    
+    if date_str:
+        dt = date_str
+    else:
+        # Usa data do dia anterior por padrão (dados mais prováveis de estar disponíveis)
+        from datetime import timedelta
+        yesterday = datetime.now() - timedelta(days=1)
+        dt = yymmdd(yesterday)
+        print(f"[{print_timestamp()}] [INFO] 📅 Usando data do dia anterior: {dt}")
+
+    print(f"[{print_timestamp()}] [INFO] 🎯 Extraindo dados para a data: {dt}")
+
+    # Verificar/criar pasta dados_b3
+    ensure_data_directory()
+
+    # Etapas separadas também usadas pelo scheduler.py (download, unzip, upload)
+    zip_path = download_zip(dt)
+    xml_paths = unzip_spre(dt, zip_path)
+    upload_xml(dt, xml_paths)
+    cleanup_temp_files(dt)
+
+    total_time = time.time() - extraction_start
     print(f"[{print_timestamp()}] [SUCCESS] 🎉 Extração completa concluída em {total_time:.2f}s")
     print(f"[{print_timestamp()}] [INFO] 📊 Resumo: Arquivo baixado → extraído → enviado para blob storage → limpeza local realizada")
 
 
 if __name__ == "__main__":
-    run()
\ No newline at end of file
+    run()
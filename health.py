@@ -0,0 +1,183 @@
+"""
+Verificação rápida dos serviços (PostgreSQL e Azurite)
+
+Cada serviço é testado em paralelo com um connect TCP seguido de uma troca
+mínima do protocolo, ambos com timeout curto:
+
+- PostgreSQL: SSLRequest (8 bytes); o servidor responde 'S' ou 'N' sem
+  autenticação nem sessão
+- Azurite: requisição HTTP HEAD no endpoint de blob; qualquer resposta HTTP
+  abaixo de 500 (inclusive 403 sem assinatura) indica o serviço no ar
+
+Resultados positivos ficam em cache (em memória e num arquivo temporário)
+por HEALTH_CACHE_TTL_SECONDS: execuções seguidas de main.py --check e loops
+do agendador não repetem as sondagens. Falhas não são guardadas, para que
+um serviço recém-iniciado seja visto na próxima verificação.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import http.client
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+
+HEALTH_PROBE_TIMEOUT_SECONDS = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "0.5"))
+HEALTH_CACHE_TTL_SECONDS = float(os.getenv("HEALTH_CACHE_TTL_SECONDS", "10"))
+HEALTH_CACHE_FILE = os.path.join(tempfile.gettempdir(), "cotacoes_b3_health.json")
+
+# Código do SSLRequest do protocolo do PostgreSQL (1234 << 16 | 5679)
+PG_SSL_REQUEST_CODE = 80877103
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _postgres_address():
+    """Host e porta do PostgreSQL a partir de DATABASE_URL"""
+    from config import DATABASE_URL
+    url = urlsplit(DATABASE_URL)
+    return url.hostname or "localhost", url.port or 5432
+
+def _azurite_address():
+    """Host, porta e caminho do endpoint de blob da connection string do Azurite"""
+    from config import AZURE_BLOB_CONNECTION
+    settings = dict(
+        part.split("=", 1) for part in AZURE_BLOB_CONNECTION.split(";") if "=" in part
+    )
+    url = urlsplit(settings["BlobEndpoint"])
+    return url.hostname or "localhost", url.port or 80, url.path or "/"
+
+def probe_postgres(host, port, timeout=HEALTH_PROBE_TIMEOUT_SECONDS):
+    """
+    TCP + SSLRequest no PostgreSQL
+
+    Returns:
+        str: Detalhe do sucesso (exceção em caso de falha)
+    """
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.settimeout(timeout)
+        sock.sendall(struct.pack("!II", 8, PG_SSL_REQUEST_CODE))
+        reply = sock.recv(1)
+    if reply not in (b"S", b"N"):
+        raise RuntimeError(f"resposta inesperada ao SSLRequest: {reply!r}")
+    return f"{host}:{port} respondeu ao protocolo"
+
+def probe_azurite(host, port, path, timeout=HEALTH_PROBE_TIMEOUT_SECONDS):
+    """
+    TCP + HEAD HTTP no endpoint de blob
+
+    Returns:
+        str: Detalhe do sucesso (exceção em caso de falha)
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        connection.request("HEAD", f"{path}?comp=list&maxresults=1")
+        status = connection.getresponse().status
+    finally:
+        connection.close()
+    if status >= 500:
+        raise RuntimeError(f"HTTP {status}")
+    return f"{host}:{port} HTTP {status}"
+
+def _timed(probe, *args):
+    """Executa a sonda e devolve (ok, latência em segundos, detalhe)"""
+    start = time.time()
+    try:
+        detail = probe(*args)
+        return True, time.time() - start, detail
+    except Exception as e:
+        return False, time.time() - start, str(e) or type(e).__name__
+
+def _load_cache_file():
+    """Resultados positivos gravados por outra execução recente (vazio se ausente/inválido)"""
+    try:
+        with open(HEALTH_CACHE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache_file(entries):
+    """Grava o cache de forma atômica (rename) para execuções concorrentes"""
+    try:
+        tmp_path = f"{HEALTH_CACHE_FILE}.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, HEALTH_CACHE_FILE)
+    except OSError:
+        pass
+
+def check_services(use_cache=True, timeout=HEALTH_PROBE_TIMEOUT_SECONDS):
+    """
+    Verifica PostgreSQL e Azurite em paralelo
+
+    Args:
+        use_cache: Reaproveita resultados positivos com menos de HEALTH_CACHE_TTL_SECONDS
+        timeout: Timeout de cada etapa (connect e resposta) das sondas, em segundos
+
+    Returns:
+        dict: serviço -> {'ok', 'latency', 'detail', 'endpoint', 'cached'}
+    """
+    probes = {
+        "PostgreSQL": (probe_postgres, _postgres_address()),
+        "Azurite": (probe_azurite, _azurite_address()),
+    }
+    now = time.time()
+    results = {}
+
+    with _cache_lock:
+        if use_cache:
+            cached = dict(_load_cache_file())
+            cached.update(_cache)
+            for name, (_, address) in probes.items():
+                entry = cached.get(name)
+                if (entry and entry["endpoint"] == list(address)
+                        and now - entry["checked_at"] < HEALTH_CACHE_TTL_SECONDS):
+                    results[name] = dict(entry, cached=True)
+
+        pending = {name: probe for name, probe in probes.items() if name not in results}
+        if pending:
+            with ThreadPoolExecutor(max_workers=len(pending)) as executor:
+                futures = {
+                    name: executor.submit(_timed, func, *address, timeout)
+                    for name, (func, address) in pending.items()
+                }
+                for name, future in futures.items():
+                    ok, latency, detail = future.result()
+                    results[name] = {
+                        "ok": ok, "latency": latency, "detail": detail,
+                        "endpoint": list(pending[name][1]), "checked_at": now, "cached": False,
+                    }
+
+            for name, result in results.items():
+                if result["ok"]:
+                    _cache[name] = dict(result, cached=False)
+                else:
+                    _cache.pop(name, None)
+            _save_cache_file(_cache)
+
+    return {name: results[name] for name in probes}
+
+def invalidate_cache():
+    """Descarta os resultados em cache (memória e arquivo)"""
+    with _cache_lock:
+        _cache.clear()
+        try:
+            os.remove(HEALTH_CACHE_FILE)
+        except OSError:
+            pass
+
+if __name__ == "__main__":
+    import sys
+
+    check_start = time.time()
+    results = check_services(use_cache="--no-cache" not in sys.argv[1:])
+    for name, result in results.items():
+        icon = "✅" if result["ok"] else "❌"
+        origin = " (cache)" if result["cached"] else ""
+        print(f"{icon} {name}: {result['detail']} ({result['latency'] * 1000:.0f}ms){origin}")
+    print(f"⏱️ {(time.time() - check_start) * 1000:.0f}ms")
+    sys.exit(0 if all(r["ok"] for r in results.values()) else 1)
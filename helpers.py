@@ -2,3 +2,18 @@ from datetime import datetime
 
 def yymmdd(dt:datetime):
     return dt.strftime("%y%m%d")
+
+def print_timestamp():
+    """Retorna timestamp formatado para logs"""
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def format_file_size(size_bytes):
+    """Formata tamanho de arquivo em unidades legíveis"""
+    if size_bytes == 0:
+        return "0 B"
+    size_names = ["B", "KB", "MB", "GB"]
+    i = 0
+    while size_bytes >= 1024 and i < len(size_names) - 1:
+        size_bytes /= 1024
+        i += 1
+    return f"{size_bytes:.1f} {size_names[i]}"
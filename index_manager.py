@@ -0,0 +1,68 @@
+"""
+Gerência de índices orientada à carga
+
+- datapregao usa BRIN (migração 5): o histórico é inserido em ordem de data,
+  então um índice de poucas páginas por faixa substitui o B-tree. Ele custa
+  pouco na carga, por isso não é removido em backfills (DROP INDEX na tabela
+  particionada bloquearia leitores e as outras instâncias); o único outro
+  índice é a chave única, da qual o merge ON CONFLICT depende
+- analyze_partitions() atualiza as estatísticas apenas das partições tocadas
+"""
+
+from sqlalchemy import text
+from helpers import print_timestamp
+import time
+
+def analyze_partitions(db, dates, table="cotacoes"):
+    """
+    Executa ANALYZE nas partições de table que contêm as datas carregadas
+
+    Returns:
+        list: Partições analisadas
+    """
+    touched = [
+        name for name, start, end in db.list_partitions(table)
+        if any(start <= d < end for d in dates)
+    ]
+    if not touched:
+        return []
+
+    analyze_start = time.time()
+    with db.engine.begin() as conn:
+        for name in touched:
+            conn.execute(text(f"ANALYZE {name}"))
+    print(f"[{print_timestamp()}] [INFO] 📐 ANALYZE em {', '.join(touched)} "
+          f"({time.time() - analyze_start:.2f}s)")
+    return touched
+
+def index_report(db):
+    """
+    Tamanho de cada índice de cotacoes, somando as partições
+
+    Returns:
+        list: Tuplas (nome do índice na tabela pai, tipo, bytes)
+    """
+    with db.engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT parent.relname AS index_name,
+                   am.amname AS index_type,
+                   SUM(pg_relation_size(leaf.relid)) AS size_bytes
+            FROM pg_class parent
+            JOIN pg_index i ON i.indexrelid = parent.oid
+            JOIN pg_am am ON am.oid = parent.relam
+            CROSS JOIN LATERAL pg_partition_tree(parent.oid) leaf
+            WHERE i.indrelid = to_regclass('cotacoes')
+            GROUP BY parent.relname, am.amname
+            ORDER BY size_bytes DESC
+        """)).fetchall()
+    return [(row.index_name, row.index_type, int(row.size_bytes or 0)) for row in rows]
+
+if __name__ == "__main__":
+    from database import DatabaseManager
+
+    db = DatabaseManager()
+    if db.connect():
+        print(f"{'ÍNDICE':<40} {'TIPO':<8} {'TAMANHO':>12}")
+        print("-" * 62)
+        for name, kind, size in index_report(db):
+            print(f"{name:<40} {kind:<8} {size / (1024 * 1024):>10.1f} MB")
@@ -2,22 +2,98 @@
 -- Este arquivo será executado automaticamente quando o container PostgreSQL for iniciado
 
 -- Criar a tabela Cotacoes conforme especificado
-CREATE TABLE IF NOT EXISTS Cotacoes (
-    Id SERIAL PRIMARY KEY,
-    Ativo VARCHAR(10) NOT NULL,
-    DataPregao DATE NOT NULL,
-    Abertura DECIMAL(10,2),
-    Fechamento DECIMAL(10,2),
-    Volume DECIMAL(18,2),
-
-    -- Índices para melhorar performance das consultas
-    CONSTRAINT idx_ativo_data UNIQUE (Ativo, DataPregao)
+-- IMPORTANTE: manter em sincronia com as migrações de migrations.py
+-- (o pipeline aplica as migrações e registra a versão em schema_version)
+-- Particionada por mês em DataPregao: as partições (cotacoes_yAAAAmMM) são
+-- criadas pelo pipeline antes de cada carga (DatabaseManager.ensure_partitions)
+CREATE TABLE IF NOT EXISTS cotacoes (
+    id SERIAL,
+    ativo VARCHAR(10) NOT NULL,
+    datapregao DATE NOT NULL,
+    abertura DECIMAL(10,2),
+    fechamento DECIMAL(10,2),
+    volume DECIMAL(18,2),
+
+    -- A chave primária de uma tabela particionada deve incluir a coluna de partição
+    CONSTRAINT cotacoes_pkey PRIMARY KEY (id, datapregao),
+    -- Um registro por ativo/data (também atende buscas por ativo)
+    CONSTRAINT idx_ativo_data UNIQUE (ativo, datapregao)
+) PARTITION BY RANGE (datapregao);
+
+-- Índice BRIN para consultas por data (o histórico é inserido em ordem de data)
+CREATE INDEX IF NOT EXISTS idx_cotacoes_data_pregao_brin ON cotacoes
+    USING brin (datapregao) WITH (pages_per_range = 32);
+
+-- Tabelas de resumo atualizadas pela carga na mesma transação (summary_stats.py)
+CREATE TABLE IF NOT EXISTS cotacoes_stats_dia (
+    datapregao DATE PRIMARY KEY,
+    registros INTEGER NOT NULL,
+    carregado_em TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_stats_dia_carregado_em ON cotacoes_stats_dia (carregado_em);
+
+CREATE TABLE IF NOT EXISTS cotacoes_stats_ativo (
+    ativo VARCHAR(10) PRIMARY KEY,
+    registros INTEGER NOT NULL,
+    primeira_data DATE,
+    ultima_data DATE
+);
+CREATE INDEX IF NOT EXISTS idx_stats_ativo_registros ON cotacoes_stats_ativo (registros DESC);
+
+-- Arquivos já carregados: o pipeline pula blobs inalterados (load_ledger.py)
+CREATE TABLE IF NOT EXISTS load_ledger (
+    blob_name TEXT PRIMARY KEY,
+    etag TEXT,
+    rows INTEGER NOT NULL DEFAULT 0,
+    parser_version TEXT NOT NULL,
+    load_mode TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TIMESTAMP NOT NULL DEFAULT now(),
+    finished_at TIMESTAMP,
+    duration_seconds DOUBLE PRECISION,
+    error TEXT
+);
+
+-- Métricas derivadas calculadas após cada carga (metrics.py)
+CREATE TABLE IF NOT EXISTS cotacoes_metrics (
+    ativo VARCHAR(10) NOT NULL,
+    datapregao DATE NOT NULL,
+    retorno DOUBLE PRECISION,
+    media_movel_5 DOUBLE PRECISION,
+    media_movel_20 DOUBLE PRECISION,
+    volatilidade_20 DOUBLE PRECISION,
+    calculado_em TIMESTAMP NOT NULL DEFAULT now(),
+    PRIMARY KEY (ativo, datapregao)
 );
+CREATE INDEX IF NOT EXISTS idx_metrics_data_pregao ON cotacoes_metrics (datapregao);
+
+-- Armazenamento compacto opcional (COMPACT_STORAGE=1, compact_schema.py)
+CREATE TABLE IF NOT EXISTS tickers (
+    id SERIAL PRIMARY KEY,
+    simbolo VARCHAR(10) NOT NULL UNIQUE
+);
+
+-- Preços e volume em centavos; colunas de 8 bytes primeiro (sem padding)
+CREATE TABLE IF NOT EXISTS cotacoes_compact (
+    abertura BIGINT,
+    fechamento BIGINT,
+    volume BIGINT,
+    ticker_id INTEGER NOT NULL REFERENCES tickers (id),
+    datapregao DATE NOT NULL,
+    PRIMARY KEY (ticker_id, datapregao)
+) PARTITION BY RANGE (datapregao);
+CREATE INDEX IF NOT EXISTS idx_cotacoes_compact_data_pregao_brin ON cotacoes_compact
+    USING brin (datapregao) WITH (pages_per_range = 32);
 
--- Criar índices para otimizar consultas
-CREATE INDEX IF NOT EXISTS idx_cotacoes_ativo ON Cotacoes (Ativo);
-CREATE INDEX IF NOT EXISTS idx_cotacoes_data_pregao ON Cotacoes (DataPregao);
-CREATE INDEX IF NOT EXISTS idx_cotacoes_ativo_data ON Cotacoes (Ativo, DataPregao);
+-- Mesmos nomes e tipos de cotacoes
+CREATE OR REPLACE VIEW cotacoes_compat AS
+SELECT t.simbolo::VARCHAR(10) AS ativo,
+       c.datapregao,
+       (c.abertura / 100.0)::DECIMAL(10, 2) AS abertura,
+       (c.fechamento / 100.0)::DECIMAL(10, 2) AS fechamento,
+       (c.volume / 100.0)::DECIMAL(18, 2) AS volume
+FROM cotacoes_compact c
+JOIN tickers t ON t.id = c.ticker_id;
 
 -- Inserir alguns dados de exemplo (opcional)
 -- INSERT INTO Cotacoes (Ativo, DataPregao, Abertura, Fechamento, Volume)
@@ -0,0 +1,260 @@
+"""
+Instrumentação do pipeline: spans aninhados, contadores e histogramas
+
+- span("parse", arquivo=...) mede uma etapa; spans abertos dentro dele (na
+  mesma thread) ficam aninhados e compartilham o trace_id
+- add("rows", n) soma ao span atual e ao contador cotacoes_b3_rows_total
+  com o rótulo stage do span (bytes, rows, elements, ...)
+- Ao fim de cada span: observação no histograma cotacoes_b3_stage_seconds,
+  gauge cotacoes_b3_stage_throughput (unidades/s de cada contador do span)
+  e uma linha JSON em TRACE_FILE
+- register_progress_listener(callback): avisado quando spans abrem, terminam
+  ou somam contadores (o heartbeat dos locks de data só bate com progresso)
+- render_prometheus() gera o formato texto do Prometheus; write_prometheus()
+  grava METRICS_FILE (textfile collector do node_exporter) e o daemon serve
+  o mesmo conteúdo em GET /metrics
+
+Sem dependências externas: importado também por main.py no início.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import threading
+import time
+import uuid
+
+METRIC_PREFIX = "cotacoes_b3"
+# Arquivo JSON-lines com um registro por span concluído ("" desativa)
+TRACE_FILE = os.getenv("TRACE_FILE", "./dados_b3/trace.jsonl")
+# Métricas no formato texto do Prometheus, regravado ao fim de cada execução ("" desativa)
+METRICS_FILE = os.getenv("METRICS_FILE", "./dados_b3/metrics.prom")
+
+# Limites (segundos) do histograma de duração das etapas
+STAGE_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_lock = threading.Lock()
+_local = threading.local()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_progress_listeners = []
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def counter(name, value=1, **labels):
+    """Incrementa o contador {METRIC_PREFIX}_{name}_total"""
+    key = (f"{METRIC_PREFIX}_{name}_total", _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name, value, **labels):
+    """Define o valor atual do gauge {METRIC_PREFIX}_{name}"""
+    with _lock:
+        _gauges[(f"{METRIC_PREFIX}_{name}", _labels_key(labels))] = value
+
+def observe(name, value, buckets=STAGE_BUCKETS, **labels):
+    """Registra value no histograma {METRIC_PREFIX}_{name}"""
+    key = (f"{METRIC_PREFIX}_{name}", _labels_key(labels))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": tuple(buckets), "counts": [0] * len(buckets),
+                                            "sum": 0.0, "count": 0}
+        for i, bound in enumerate(histogram["buckets"]):
+            if value <= bound:
+                histogram["counts"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+def register_progress_listener(callback):
+    """
+    Registra callback() chamado a cada sinal de progresso: span aberto,
+    span concluído ou contador somado a um span (ex.: heartbeat dos locks de data)
+    """
+    _progress_listeners.append(callback)
+
+def _progress():
+    for callback in _progress_listeners:
+        callback()
+
+class Span:
+    """Etapa medida: duração, atributos, contadores e spans filhos"""
+
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.attrs = attrs
+        self.counts = {}
+        self.children = []
+        self.status = "ok"
+        self.error = None
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.duration = None
+        if parent:
+            parent.children.append(self)
+
+    def add(self, name, value=1):
+        """Soma value ao contador name do span e ao contador global da etapa"""
+        self.counts[name] = self.counts.get(name, 0) + value
+        counter(name, value, stage=self.name)
+        _progress()
+
+    def set(self, **attrs):
+        """Acrescenta atributos ao span"""
+        self.attrs.update(attrs)
+
+    def elapsed(self):
+        """Segundos desde o início do span (duração final, se concluído)"""
+        return self.duration if self.duration is not None else time.perf_counter() - self._start
+
+    def find(self, name):
+        """Primeiro span descendente com o nome dado (ou None)"""
+        for child in self.children:
+            if child.name == name:
+                return child
+            found = child.find(name)
+            if found:
+                return found
+        return None
+
+    def to_record(self):
+        """Registro JSON do span (linha do TRACE_FILE)"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start": self.started_at.isoformat(timespec="milliseconds"),
+            "duration": round(self.elapsed(), 6),
+            "status": self.status,
+            "error": self.error,
+            "attrs": self.attrs,
+            "counts": self.counts,
+        }
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+def current_span():
+    """Span aberto mais interno da thread atual (ou None)"""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+def add(name, value=1):
+    """Soma value ao span atual (fora de um span, só ao contador global)"""
+    span_ = current_span()
+    if span_:
+        span_.add(name, value)
+    else:
+        counter(name, value)
+
+@contextmanager
+def span(name, parent=None, **attrs):
+    """
+    Mede uma etapa do pipeline
+
+    parent: span pai explícito, para etapas executadas em outra thread
+    (padrão: o span aberto mais interno da thread atual)
+
+    Exemplo:
+        with span("download", date=dt) as sp:
+            data = baixar()
+            sp.add("bytes", len(data))
+    """
+    stack = _stack()
+    if parent is None and stack:
+        parent = stack[-1]
+    current = Span(name, parent, **attrs)
+    stack.append(current)
+    _progress()
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = str(e) or type(e).__name__
+        raise
+    finally:
+        stack.pop()
+        _finish(current)
+
+def _finish(span_):
+    """Registra métricas e o trace do span concluído"""
+    span_.duration = time.perf_counter() - span_._start
+    observe("stage_seconds", span_.duration, stage=span_.name)
+    counter("stage_runs", stage=span_.name, status=span_.status)
+    if span_.status == "ok" and span_.duration > 0:
+        for unit, value in span_.counts.items():
+            set_gauge("stage_throughput", value / span_.duration, stage=span_.name, unit=unit)
+    if span_.parent is None:
+        set_gauge("last_run_timestamp_seconds", time.time(), stage=span_.name, status=span_.status)
+    _write_trace(span_.to_record())
+    _progress()
+
+def _write_trace(record):
+    if not TRACE_FILE:
+        return
+    try:
+        os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+        line = json.dumps(record, default=str) + "\n"
+        with _lock, open(TRACE_FILE, "a") as f:
+            f.write(line)
+    except OSError:
+        pass
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def render_prometheus():
+    """Contadores, gauges e histogramas no formato texto do Prometheus"""
+    lines = []
+    with _lock:
+        for kind, series in (("counter", _counters), ("gauge", _gauges)):
+            for name in sorted({name for name, _ in series}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(series.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for name in sorted({name for name, _ in _histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in sorted(_histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path=None):
+    """Grava render_prometheus() de forma atômica em path (padrão METRICS_FILE)"""
+    path = path if path is not None else METRICS_FILE
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(render_prometheus())
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+def reset():
+    """Descarta as métricas acumuladas no processo"""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
@@ -0,0 +1,121 @@
+"""
+Ledger de arquivos carregados (tabela load_ledger)
+
+Cada arquivo do blob storage carregado no PostgreSQL é registrado pelo nome,
+com a versão do arquivo publicado pela B3 (coluna etag: ETag ou Last-Modified
+da B3, ou hash SHA-256 do ZIP baixado; ver extract.source_validator), a versão
+do parser, número de registros, tempos e status. Antes de baixar e processar
+um arquivo, o pipeline consulta o ledger: se a B3 não republicou o arquivo
+(mesma versão) e ele foi carregado com sucesso pela mesma versão do parser,
+a carga é pulada.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+def get_entry(db, blob_name):
+    """
+    Retorna a linha do ledger para o arquivo (ou None se nunca foi carregado)
+    """
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(
+                text("SELECT * FROM load_ledger WHERE blob_name = :blob_name"),
+                {"blob_name": blob_name}
+            ).fetchone()
+    except SQLAlchemyError:
+        # Schema ainda sem a migração do ledger: nada registrado
+        return None
+
+def is_loaded(db, blob_name, etag, parser_version):
+    """
+    Verifica se o arquivo já foi carregado com sucesso e não mudou desde então
+
+    Args:
+        db: DatabaseManager conectado
+        blob_name: Nome do arquivo no blob storage
+        etag: Versão atual do arquivo na B3 (None = desconhecida, não pula)
+        parser_version: Versão atual do parser (transform_load.PARSER_VERSION)
+
+    Returns:
+        bool: True se a carga pode ser pulada
+    """
+    if etag is None:
+        return False
+    entry = get_entry(db, blob_name)
+    return (
+        entry is not None
+        and entry.status == STATUS_DONE
+        and entry.etag == etag
+        and entry.parser_version == parser_version
+    )
+
+def mark_started(db, blob_name, etag, parser_version, load_mode):
+    """Registra o início da carga do arquivo (status 'running')"""
+    with db.engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO load_ledger (blob_name, etag, parser_version, load_mode, status, started_at)
+            VALUES (:blob_name, :etag, :parser_version, :load_mode, :status, now())
+            ON CONFLICT (blob_name) DO UPDATE
+            SET etag = EXCLUDED.etag,
+                parser_version = EXCLUDED.parser_version,
+                load_mode = EXCLUDED.load_mode,
+                status = EXCLUDED.status,
+                rows = 0,
+                started_at = EXCLUDED.started_at,
+                finished_at = NULL,
+                duration_seconds = NULL,
+                error = NULL
+        """), {
+            "blob_name": blob_name,
+            "etag": etag,
+            "parser_version": parser_version,
+            "load_mode": load_mode,
+            "status": STATUS_RUNNING,
+        })
+
+def mark_finished(db, blob_name, rows, duration_seconds, error=None):
+    """Registra o fim da carga: 'done' com o número de registros ou 'failed' com o erro"""
+    with db.engine.begin() as conn:
+        conn.execute(text("""
+            UPDATE load_ledger
+            SET status = :status,
+                rows = :rows,
+                finished_at = now(),
+                duration_seconds = :duration_seconds,
+                error = :error
+            WHERE blob_name = :blob_name
+        """), {
+            "blob_name": blob_name,
+            "status": STATUS_FAILED if error else STATUS_DONE,
+            "rows": rows,
+            "duration_seconds": duration_seconds,
+            "error": error,
+        })
+
+def list_entries(db, limit=20):
+    """Últimas cargas registradas no ledger, da mais recente para a mais antiga"""
+    with db.engine.connect() as conn:
+        return conn.execute(text("""
+            SELECT blob_name, status, rows, parser_version, load_mode,
+                   started_at, duration_seconds, error
+            FROM load_ledger
+            ORDER BY started_at DESC
+            LIMIT :limit
+        """), {"limit": limit}).fetchall()
+
+if __name__ == "__main__":
+    from database import DatabaseManager
+
+    db = DatabaseManager()
+    if db.connect():
+        print(f"{'ARQUIVO':<24} {'STATUS':<8} {'REGISTROS':>10} {'PARSER':<8} {'INÍCIO':<20} {'DURAÇÃO':>9}")
+        print("-" * 84)
+        for row in list_entries(db):
+            duration = f"{row.duration_seconds:.1f}s" if row.duration_seconds is not None else "-"
+            print(f"{row.blob_name:<24} {row.status:<8} {row.rows:>10,} {row.parser_version:<8} "
+                  f"{row.started_at:%Y-%m-%d %H:%M:%S} {duration:>9}")
@@ -16,14 +16,14 @@ import sys
 import os
 import time
 from datetime import datetime
-from helpers import yymmdd
-from extract import run as extract_run
-from transform_load import transform_and_load
-from database import DatabaseManager
+from helpers import yymmdd, print_timestamp
+from scheduler import run_range, trading_days, STATUS_FAILED
+from health import check_services
+from instrumentation import span, current_span, write_prometheus
 
-def print_timestamp():
-    """Retorna timestamp formatado para logs"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# extract, transform_load, database e azure_storage (requests, tqdm,
+# sqlalchemy, SDK do Azure) são importados apenas em run_pipeline:
+# --help e --check iniciam sem carregá-los (ver tests/test_import_time.py)
 
 def print_section_header(title):
     """Imprime cabeçalho de seção formatado"""
@@ -31,69 +31,76 @@ def print_section_header(title):
     print(f"[{print_timestamp()}] {title}")
     print("=" * 60)
 
-def check_prerequisites():
+def check_prerequisites(use_cache=True):
     """
     Verifica se os pré-requisitos estão disponíveis
+
+    PostgreSQL e Azurite são sondados em paralelo, com timeout curto e cache
+    dos resultados positivos (ver health.py).
     """
     print(f"[{print_timestamp()}] [INFO] Verificando pré-requisitos...")
     
     start_time = time.time()
-    prereq_status = []
-
-    # Verificar se conseguimos conectar ao banco
-    print(f"[{print_timestamp()}] [INFO] Testando conexão com PostgreSQL...")
-    try:
-        db = DatabaseManager()
-        if not db.connect():
-            print(f"[{print_timestamp()}] [ERROR] PostgreSQL não está disponível em localhost:5433")
-            print("        Execute: docker-compose up -d")
-            prereq_status.append(("PostgreSQL", False, "Conexão falhou"))
-        else:
-            print(f"[{print_timestamp()}] [OK] PostgreSQL disponível e conectado")
-            prereq_status.append(("PostgreSQL", True, "Conectado"))
-    except Exception as e:
-        print(f"[{print_timestamp()}] [ERROR] Erro ao testar PostgreSQL: {e}")
-        prereq_status.append(("PostgreSQL", False, str(e)))
-
-    # Verificar se o Azurite está rodando
-    print(f"[{print_timestamp()}] [INFO] Testando conexão com Azurite (Blob Storage)...")
-    try:
-        from azure_storage import BlobServiceClient, AZURE_BLOB_CONNECTION
-        service = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION)
-        # Tentativa simples de listar containers
-        container_list = list(service.list_containers())
-        container_count = len(container_list)
-        print(f"[{print_timestamp()}] [OK] Azurite disponível ({container_count} containers encontrados)")
-        prereq_status.append(("Azurite", True, f"{container_count} containers"))
-    except Exception as e:
-        print(f"[{print_timestamp()}] [ERROR] Azurite não está disponível em localhost:10003")
-        print(f"        Erro: {e}")
-        print("        Execute: docker-compose up -d")
-        prereq_status.append(("Azurite", False, str(e)))
+    results = check_services(use_cache=use_cache)
 
     # Resumo dos pré-requisitos
     elapsed_time = time.time() - start_time
-    print(f"\n[{print_timestamp()}] [INFO] Verificação de pré-requisitos concluída em {elapsed_time:.2f}s")
+    print(f"[{print_timestamp()}] [INFO] Verificação de pré-requisitos concluída em {elapsed_time * 1000:.0f}ms")
     print("📋 Status dos serviços:")
     
     all_ok = True
-    for service, status, details in prereq_status:
-        status_icon = "✅" if status else "❌"
-        print(f"   {status_icon} {service}: {details}")
-        if not status:
+    for service, result in results.items():
+        status_icon = "✅" if result["ok"] else "❌"
+        origin = ", cache" if result["cached"] else ""
+        host, port = result["endpoint"][:2]
+        print(f"   {status_icon} {service} ({host}:{port}): {result['detail']} "
+              f"({result['latency'] * 1000:.0f}ms{origin})")
+        if not result["ok"]:
             all_ok = False
+
+    if not all_ok:
+        print("        Execute: docker-compose up -d")
     
     return all_ok
 
-def run_pipeline(date_str=None, file_name=None):
+def run_pipeline(date_str=None, file_name=None, load_mode="replace", workers=1, commit_mode="2pc", force=False,
+                 direct=False, lock_wait_seconds=0):
     """
     Executa o pipeline completo de processamento
 
     Args:
         date_str: Data no formato YYMMDD (ex: "250923"). Se None, usa data atual
         file_name: Nome específico do arquivo. Se None, usa padrão baseado na data
+        load_mode: 'replace' (recarga idempotente da data) ou 'append'
+        workers: Conexões paralelas na carga (1 = carga em uma conexão)
+        commit_mode: Com workers > 1, '2pc' (tudo ou nada) ou 'independent'
+        force: Reexecuta extração e carga mesmo se o arquivo já estiver no load_ledger
+        direct: Entrega o XML extraído direto ao parser e arquiva no blob em paralelo
+        lock_wait_seconds: Espera pela data quando outro processo a detém
+                           (0 = pula a data, None = espera sem limite)
     """
-    pipeline_start_time = time.time()
+    # Span raiz da execução: etapas medidas em TRACE_FILE e METRICS_FILE (instrumentation.py)
+    with span("pipeline", mode=load_mode, workers=workers, direct=direct) as root:
+        ok = _run_pipeline(date_str, file_name, load_mode, workers, commit_mode, force, direct, lock_wait_seconds)
+        if not ok:
+            root.status = "error"
+    write_prometheus()
+
+    # Histórico para o relatório de regressões (python run_history.py)
+    import run_history
+    record = run_history.build_record(root, ok)
+    if record:
+        run_history.save_run(record)
+    return ok
+
+def _run_pipeline(date_str, file_name, load_mode, workers, commit_mode, force, direct, lock_wait_seconds):
+    """Corpo de run_pipeline, executado dentro do span 'pipeline' (durações das etapas nos spans)"""
+    root = current_span()
+
+    from extract import run as extract_run, extract_direct, probe_source_validator
+    from transform_load import transform_and_load, PARSER_VERSION
+    from database import DatabaseManager
+    import load_ledger
     
     # Define data e nome do arquivo
     if not date_str:
@@ -105,63 +112,101 @@ def run_pipeline(date_str=None, file_name=None):
 
     if not file_name:
         file_name = f"BVBG186_{date_str}.xml"
+    current_span().set(date=date_str)
 
     print_section_header("INICIANDO PIPELINE DE PROCESSAMENTO")
     print(f"📅 Data do pregão: {date_str}")
     print(f"📁 Arquivo alvo: {file_name}")
+    print(f"🔁 Modo de carga: {load_mode}" + (f" ({workers} conexões, commit {commit_mode})" if workers > 1 else ""))
+    if direct:
+        print("⚡ Modo direto: XML vai da extração ao parser; blob gravado em paralelo")
     print(f"⏰ Horário de início: {print_timestamp()}")
 
+    # Arquivo já carregado e inalterado na B3 (ETag/Last-Modified da publicação): pula extração e carga.
+    # Sem esses cabeçalhos, a versão só é conhecida após o download (hash, em transform_and_load)
+    db = DatabaseManager()
+    validator = None if force else probe_source_validator(date_str)
+    if validator:
+        if db.connect() and load_ledger.is_loaded(db, file_name, validator, PARSER_VERSION):
+            print(f"[{print_timestamp()}] [INFO] ⏭️ {file_name} já carregado e inalterado (load_ledger); "
+                  f"nada a fazer em {root.elapsed():.2f}s. Use --force para reprocessar")
+            return True
+
+    # Posse da data entre processos (advisory lock): outra instância já a processa.
+    # Não é sucesso: se o dono falhar, a data precisa ser tentada de novo
+    # (o worker devolve a mensagem à fila e o daemon volta a sondá-la)
+    try:
+        trading_day = datetime.strptime(date_str, "%y%m%d").date()
+    except ValueError:
+        print(f"[{print_timestamp()}] [ERROR] ❌ Data inválida: {date_str} (use YYMMDD)")
+        return False
+    if db.connect() and not db.try_lock_date(trading_day):
+        owned, owner = db.lock_date(trading_day, wait_seconds=lock_wait_seconds)
+        if not owned:
+            print(f"[{print_timestamp()}] [WARN] ⏭️ {date_str} em processamento por outra instância "
+                  f"(pid {owner['pid'] if owner else '?'}); não carregado por esta execução")
+            return False
+        # O dono anterior pode ter concluído a carga enquanto esperávamos
+        if validator and load_ledger.is_loaded(db, file_name, validator, PARSER_VERSION):
+            db.unlock_date(trading_day)
+            print(f"[{print_timestamp()}] [INFO] ⏭️ {file_name} carregado pela outra instância; nada a fazer")
+            return True
+
     try:
         # Etapa 1: Extração (download da B3 e upload para blob local)
         print_section_header("ETAPA 1: EXTRAÇÃO DE DADOS DA B3")
-        step1_start = time.time()
-        
-        try:
-            extract_run(date_str)  # Passa a data para a função de extração
-            step1_time = time.time() - step1_start
-            print(f"[{print_timestamp()}] [OK] ✅ Extração concluída com sucesso em {step1_time:.2f}s")
-        except Exception as e:
-            step1_time = time.time() - step1_start
-            print(f"[{print_timestamp()}] [ERROR] ❌ Falha na extração após {step1_time:.2f}s: {e}")
-            return False
+        xml_parts = archive = None
+        with span("extract") as step1:
+            try:
+                if direct:
+                    xml_parts, archive = extract_direct(date_str)
+                else:
+                    extract_run(date_str)  # Passa a data para a função de extração
+                print(f"[{print_timestamp()}] [OK] ✅ Extração concluída com sucesso")
+            except Exception as e:
+                step1.status, step1.error = "error", str(e)
+                print(f"[{print_timestamp()}] [ERROR] ❌ Falha na extração: {e}")
+                return False
 
         # Etapa 2: Transformação e Carga (processamento XML e inserção no PostgreSQL)
         print_section_header("ETAPA 2: TRANSFORMAÇÃO E CARGA NO POSTGRESQL")
-        step2_start = time.time()
-        
-        try:
-            success = transform_and_load(file_name)
-            step2_time = time.time() - step2_start
-            
-            if success:
-                print(f"[{print_timestamp()}] [OK] ✅ Transformação e carga concluídas com sucesso em {step2_time:.2f}s")
-            else:
-                print(f"[{print_timestamp()}] [ERROR] ❌ Falha na transformação e carga após {step2_time:.2f}s")
+        with span("transform_load") as step2:
+            try:
+                success = transform_and_load(file_name, load_mode=load_mode, workers=workers,
+                                             commit_mode=commit_mode, force=force,
+                                             xml_parts=xml_parts, archive=archive)
+                xml_parts = None
+                
+                if success:
+                    print(f"[{print_timestamp()}] [OK] ✅ Transformação e carga concluídas com sucesso")
+                else:
+                    step2.status = "error"
+                    print(f"[{print_timestamp()}] [ERROR] ❌ Falha na transformação e carga")
+                    return False
+            except Exception as e:
+                step2.status, step2.error = "error", str(e)
+                print(f"[{print_timestamp()}] [ERROR] ❌ Falha na transformação e carga: {e}")
                 return False
-        except Exception as e:
-            step2_time = time.time() - step2_start
-            print(f"[{print_timestamp()}] [ERROR] ❌ Falha na transformação e carga após {step2_time:.2f}s: {e}")
-            return False
 
         # Resumo final
-        total_time = time.time() - pipeline_start_time
         print_section_header("PIPELINE CONCLUÍDO COM SUCESSO")
         print(f"🎉 Status: SUCESSO")
         print(f"📊 Dados processados: {date_str}")
-        print(f"⏱️  Tempo total: {total_time:.2f}s")
+        print(f"⏱️  Tempo total: {root.elapsed():.2f}s")
         print(f"⏰ Concluído em: {print_timestamp()}")
         print(f"💾 Dados inseridos no PostgreSQL")
         
         return True
 
     except KeyboardInterrupt:
-        total_time = time.time() - pipeline_start_time
-        print(f"\n[{print_timestamp()}] [INFO] ⚠️  Pipeline interrompido pelo usuário após {total_time:.2f}s")
+        print(f"\n[{print_timestamp()}] [INFO] ⚠️  Pipeline interrompido pelo usuário após {root.elapsed():.2f}s")
         return False
     except Exception as e:
-        total_time = time.time() - pipeline_start_time
-        print(f"\n[{print_timestamp()}] [ERROR] ❌ Erro inesperado no pipeline após {total_time:.2f}s: {e}")
+        print(f"\n[{print_timestamp()}] [ERROR] ❌ Erro inesperado no pipeline após {root.elapsed():.2f}s: {e}")
         return False
+    finally:
+        if db.engine is not None:
+            db.unlock_date(trading_day)
 
 def show_help():
     """Exibe ajuda sobre como usar o script"""
@@ -171,12 +216,24 @@ Pipeline de Processamento de Cotações B3
 USO:
     python main.py                    # Executa com data do dia anterior
     python main.py YYMMDD            # Executa com data específica
+    python main.py YYMMDD --append   # Só insere (falha se a data já estiver carregada)
+    python main.py YYMMDD --workers=4                # Carga paralela em 4 conexões (2PC: tudo ou nada)
+    python main.py YYMMDD --workers=4 --independent  # Cada shard confirma sozinho (ledger de shards)
+    python main.py YYMMDD --force    # Reprocessa mesmo se o arquivo já estiver carregado
+    python main.py YYMMDD --direct   # XML direto da extração ao parser (blob gravado em paralelo)
+    python main.py --daemon          # Fica no ar e carrega cada pregão assim que a B3 publica
+    python main.py --daemon --status-port=8090   # ... com GET /health do daemon
+    python main.py --enqueue YYMMDD-YYMMDD  # Publica os dias úteis na fila do Azurite
+    python main.py --worker          # Consome a fila (vários workers em paralelo)
+    python main.py --worker --exit-when-empty  # ... e encerra quando a fila esvaziar
+    python main.py YYMMDD-YYMMDD     # Intervalo de datas com estágios sobrepostos (scheduler.py)
     python main.py --check          # Verifica pré-requisitos
     python main.py --help           # Exibe esta ajuda
 
 EXEMPLOS:
     python main.py                   # Processa cotações de ontem (mais provável de estar disponível)
-    python main.py 250923           # Processa cotações de 23/09/2025
+    python main.py 250923           # Processa cotações de 23/09/2025 (pulada se já carregada)
+    python main.py 250901-250930    # Processa os dias úteis de setembro/2025 em paralelo por estágio
     python main.py --check          # Verifica se PostgreSQL e Azurite estão rodando
 
 PRÉ-REQUISITOS:
@@ -189,17 +246,58 @@ PRÉ-REQUISITOS:
 ESTRUTURA DO PIPELINE:
     1. Extração: Download de dados da B3 → Blob Storage local (Azurite)
     2. Transformação: Processamento XML → Dados estruturados
-    3. Carga: Inserção no PostgreSQL local
+    3. Carga: COPY para staging + substituição atômica da data no PostgreSQL local
+
+    Em intervalos, cada dia passa por download → unzip → upload → parse → load;
+    enquanto um dia carrega, os seguintes já estão sendo processados e baixados.
     """
     print(help_text)
 
+def parse_int_option(arg, minimum, maximum=None):
+    """
+    Valor inteiro de uma opção --nome=N; valor inválido ou fora de
+    [minimum, maximum] encerra com erro
+    """
+    name, value = arg.split('=', 1)
+    try:
+        number = int(value)
+    except ValueError:
+        number = None
+    if number is None or number < minimum or (maximum is not None and number > maximum):
+        limits = f"entre {minimum} e {maximum}" if maximum is not None else f"maior ou igual a {minimum}"
+        print(f"[ERROR] Valor inválido para {name}: '{value}' (inteiro {limits})")
+        print("Use --help para ver opções disponíveis")
+        sys.exit(1)
+    return number
+
+def parse_date_arg(arg, value):
+    """Confere que value é uma data YYMMDD válida; caso contrário encerra com erro"""
+    try:
+        datetime.strptime(value, "%y%m%d")
+    except ValueError:
+        print(f"[ERROR] Data inválida em {arg}: '{value}' (use YYMMDD)")
+        print("Use --help para ver opções disponíveis")
+        sys.exit(1)
+    return value
+
 def main():
     """Função principal"""
 
     # Verificar argumentos da linha de comando
-    if len(sys.argv) > 1:
-        arg = sys.argv[1]
+    date_str = None
+    date_range = None
+    load_mode = "replace"
+    workers = 1
+    commit_mode = "2pc"
+    force = False
+    direct = False
+    daemon = False
+    status_port = None
+    worker = False
+    enqueue = False
+    exit_when_empty = False
 
+    for arg in sys.argv[1:]:
         if arg in ['--help', '-h']:
             show_help()
             return
@@ -210,15 +308,62 @@ def main():
             else:
                 print("[ERROR] Alguns pré-requisitos não estão disponíveis")
                 sys.exit(1)
+        elif arg == '--append':
+            load_mode = "append"
+        elif arg.startswith('--workers='):
+            workers = parse_int_option(arg, 1)
+        elif arg == '--independent':
+            commit_mode = "independent"
+        elif arg == '--force':
+            force = True
+        elif arg == '--direct':
+            direct = True
+        elif arg == '--daemon':
+            daemon = True
+        elif arg.startswith('--status-port='):
+            status_port = parse_int_option(arg, 1, 65535)
+        elif arg == '--worker':
+            worker = True
+        elif arg == '--enqueue':
+            enqueue = True
+        elif arg == '--exit-when-empty':
+            exit_when_empty = True
         elif arg.isdigit() and len(arg) == 6:
             # Data fornecida no formato YYMMDD
-            date_str = arg
+            date_str = parse_date_arg(arg, arg)
+        elif len(arg) == 13 and arg[6] == '-' and arg[:6].isdigit() and arg[7:].isdigit():
+            # Intervalo YYMMDD-YYMMDD
+            date_range = (parse_date_arg(arg, arg[:6]), parse_date_arg(arg, arg[7:]))
         else:
             print(f"[ERROR] Argumento inválido: {arg}")
             print("Use --help para ver opções disponíveis")
             sys.exit(1)
-    else:
-        date_str = None
+
+    # Coordenador: publica as datas na fila do Azurite para os workers
+    if enqueue:
+        if not date_range:
+            print("[ERROR] --enqueue requer um intervalo YYMMDD-YYMMDD")
+            sys.exit(1)
+        from work_queue import enqueue_dates
+        enqueue_dates(trading_days(*date_range), force=force)
+        sys.exit(0)
+
+    # Worker: consome a fila; a mensagem só sai dela após a carga concluir
+    if worker:
+        from work_queue import run_worker
+        print_section_header("WORKER DA FILA DE PREGÕES")
+        counters = run_worker(run_pipeline, exit_when_empty=exit_when_empty, load_mode=load_mode,
+                              workers=workers, commit_mode=commit_mode, direct=True, lock_wait_seconds=None)
+        sys.exit(1 if counters["failed"] or counters["poisoned"] else 0)
+
+    # Daemon: processo único com conexões aquecidas; serviços fora do ar são
+    # tratados com nova tentativa, sem encerrar o processo
+    if daemon:
+        from daemon import run_daemon
+        print_section_header("PIPELINE EM MODO DAEMON")
+        run_daemon(run_pipeline, status_port=status_port, load_mode=load_mode, workers=workers,
+                   commit_mode=commit_mode, direct=True)
+        sys.exit(0)
 
     # Verificar pré-requisitos
     print_section_header("VERIFICAÇÃO DE PRÉ-REQUISITOS")
@@ -227,8 +372,16 @@ def main():
         print("💡 Use 'python main.py --help' para mais informações")
         sys.exit(1)
 
+    # Intervalo de datas: estágios sobrepostos pelo agendador
+    if date_range:
+        print_section_header(f"PIPELINE MULTI-DIA {date_range[0]} → {date_range[1]}")
+        results = run_range(trading_days(*date_range), load_mode=load_mode, workers=workers,
+                            commit_mode=commit_mode, force=force)
+        sys.exit(1 if any(r["status"] == STATUS_FAILED for r in results.values()) else 0)
+
     # Executar pipeline
-    success = run_pipeline(date_str)
+    success = run_pipeline(date_str, load_mode=load_mode, workers=workers, commit_mode=commit_mode, force=force,
+                           direct=direct)
 
     if success:
         sys.exit(0)
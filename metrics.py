@@ -0,0 +1,199 @@
+"""
+Métricas derivadas calculadas após a carga (tabela cotacoes_metrics)
+
+Para cada ativo das datas carregadas:
+- retorno: variação do fechamento em relação ao pregão anterior do ativo
+- media_movel_5 / media_movel_20: médias móveis do fechamento
+- volatilidade_20: desvio padrão amostral dos últimos 20 retornos diários
+
+Apenas a janela necessária é lida (LOOKBACK_SESSIONS pregões antes da
+primeira data carregada, pela chave única (ativo, datapregao)) e as contas
+são feitas com NumPy sobre arrays contíguos. Só as linhas das datas
+carregadas (e dos pregões seguintes que dependem delas, em backfills) são
+gravadas; consultas analíticas passam a ser buscas pela chave primária.
+
+NumPy é importado só no cálculo: transform_load importa este módulo e a carga
+não depende de NumPy (sem ele, a etapa de métricas falha com aviso).
+"""
+
+from helpers import print_timestamp
+from compact_schema import QUOTES_TABLE
+import time
+
+MOVING_AVERAGE_WINDOWS = (5, 20)
+VOLATILITY_WINDOW = 20
+
+# Pregões anteriores necessários: a volatilidade de 20 retornos usa 21 fechamentos
+LOOKBACK_SESSIONS = max(max(MOVING_AVERAGE_WINDOWS), VOLATILITY_WINDOW + 1)
+
+# Janela por ativo: pregões anteriores, datas carregadas e pregões seguintes
+# (um backfill altera as métricas dos LOOKBACK_SESSIONS pregões seguintes)
+WINDOW_QUERY = f"""
+    WITH tickers AS (
+        SELECT DISTINCT ativo FROM {QUOTES_TABLE} WHERE datapregao = ANY(%(dates)s)
+    )
+    SELECT t.ativo, w.datapregao, w.fechamento
+    FROM tickers t
+    CROSS JOIN LATERAL (
+        (SELECT c.datapregao, c.fechamento FROM {QUOTES_TABLE} c
+         WHERE c.ativo = t.ativo AND c.datapregao < %(first)s
+         ORDER BY c.datapregao DESC LIMIT %(lookback)s)
+        UNION ALL
+        (SELECT c.datapregao, c.fechamento FROM {QUOTES_TABLE} c
+         WHERE c.ativo = t.ativo AND c.datapregao BETWEEN %(first)s AND %(last)s)
+        UNION ALL
+        (SELECT c.datapregao, c.fechamento FROM {QUOTES_TABLE} c
+         WHERE c.ativo = t.ativo AND c.datapregao > %(last)s
+         ORDER BY c.datapregao LIMIT %(lookback)s)
+    ) w
+    ORDER BY t.ativo, w.datapregao
+"""
+
+def rolling(values, window, func):
+    """Aplica func em janelas deslizantes; posições sem janela completa ficam NaN"""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = func(sliding_window_view(values, window), axis=1)
+    return out
+
+def compute_metrics(closes):
+    """
+    Calcula as métricas de uma série de fechamentos ordenada por data
+
+    Args:
+        closes: numpy.ndarray float64 (NaN onde não há fechamento)
+
+    Returns:
+        dict: Arrays do mesmo tamanho de closes (NaN onde não há histórico suficiente)
+    """
+    import numpy as np
+    returns = np.full(len(closes), np.nan)
+    if len(closes) > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns[1:] = closes[1:] / closes[:-1] - 1.0
+        returns[~np.isfinite(returns)] = np.nan
+
+    result = {"retorno": returns}
+    for window in MOVING_AVERAGE_WINDOWS:
+        result[f"media_movel_{window}"] = rolling(closes, window, np.mean)
+    result[f"volatilidade_{VOLATILITY_WINDOW}"] = rolling(
+        returns, VOLATILITY_WINDOW, lambda w, axis: np.std(w, axis=axis, ddof=1)
+    )
+    return result
+
+METRIC_COLUMNS = ("retorno",) + tuple(f"media_movel_{w}" for w in MOVING_AVERAGE_WINDOWS) + (
+    f"volatilidade_{VOLATILITY_WINDOW}",
+)
+
+def _nullable(values):
+    """NaN vira None (NULL no PostgreSQL)"""
+    return [None if v != v else float(v) for v in values]
+
+def update_metrics(db, dates):
+    """
+    Recalcula cotacoes_metrics para as datas carregadas
+
+    Args:
+        db: DatabaseManager conectado
+        dates: Datas de pregão carregadas
+
+    Returns:
+        int: Linhas de métricas gravadas
+    """
+    dates = sorted(set(dates))
+    if not dates:
+        return 0
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("métricas derivadas requerem NumPy: pip install numpy")
+
+    metrics_start = time.time()
+    raw_connection = db.engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        cursor.execute(WINDOW_QUERY, {
+            "dates": dates, "first": dates[0], "last": dates[-1], "lookback": LOOKBACK_SESSIONS,
+        })
+        rows = cursor.fetchall()
+        read_time = time.time() - metrics_start
+
+        out = {"ativo": [], "datapregao": []}
+        out.update({column: [] for column in METRIC_COLUMNS})
+
+        # Linhas ordenadas por (ativo, datapregao): cada ativo é um bloco contíguo
+        start = 0
+        while start < len(rows):
+            ativo = rows[start][0]
+            end = start
+            while end < len(rows) and rows[end][0] == ativo:
+                end += 1
+            block = rows[start:end]
+            closes = np.array([r[2] if r[2] is not None else np.nan for r in block], dtype=np.float64)
+            computed = compute_metrics(closes)
+
+            # Só grava a partir da primeira data carregada (o resto é histórico lido)
+            first_index = next(i for i, r in enumerate(block) if r[1] >= dates[0])
+            out["ativo"].extend([ativo] * (len(block) - first_index))
+            out["datapregao"].extend(r[1] for r in block[first_index:])
+            for column in METRIC_COLUMNS:
+                out[column].extend(_nullable(computed[column][first_index:]))
+            start = end
+
+        # Ativos removidos das datas recarregadas não mantêm métricas antigas
+        cursor.execute(f"""
+            DELETE FROM cotacoes_metrics m
+            WHERE m.datapregao = ANY(%s)
+              AND NOT EXISTS (
+                  SELECT 1 FROM {QUOTES_TABLE} c
+                  WHERE c.ativo = m.ativo AND c.datapregao = m.datapregao
+              )
+        """, (dates,))
+
+        if out["ativo"]:
+            cursor.execute(f"""
+                INSERT INTO cotacoes_metrics (ativo, datapregao, {', '.join(METRIC_COLUMNS)}, calculado_em)
+                SELECT *, now() FROM unnest(
+                    %s::varchar[], %s::date[], {', '.join(['%s::double precision[]'] * len(METRIC_COLUMNS))}
+                )
+                ON CONFLICT (ativo, datapregao) DO UPDATE
+                SET {', '.join(f'{c} = EXCLUDED.{c}' for c in METRIC_COLUMNS)},
+                    calculado_em = EXCLUDED.calculado_em
+            """, [out["ativo"], out["datapregao"]] + [out[c] for c in METRIC_COLUMNS])
+
+        raw_connection.commit()
+    except Exception:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+
+    written = len(out["ativo"])
+    print(f"[{print_timestamp()}] [OK] ✅ Métricas derivadas: {written:,} linhas gravadas "
+          f"({len(rows):,} lidas em {read_time:.2f}s, total {time.time() - metrics_start:.2f}s)")
+    return written
+
+def rebuild_metrics(db, chunk_days=60):
+    """
+    Recalcula todas as métricas, em blocos de chunk_days datas (usa cotacoes_stats_dia)
+
+    Returns:
+        int: Linhas de métricas gravadas
+    """
+    with db.engine.connect() as conn:
+        all_dates = [row[0] for row in conn.exec_driver_sql(
+            "SELECT datapregao FROM cotacoes_stats_dia ORDER BY datapregao"
+        )]
+    written = 0
+    for i in range(0, len(all_dates), chunk_days):
+        written += update_metrics(db, all_dates[i:i + chunk_days])
+    return written
+
+if __name__ == "__main__":
+    from database import DatabaseManager
+
+    db = DatabaseManager()
+    if db.connect() and db.create_tables():
+        rebuild_metrics(db)
@@ -0,0 +1,506 @@
+"""
+Migrações versionadas do schema PostgreSQL
+
+Cada migração é registrada na tabela schema_version. A verificação feita a cada
+execução do pipeline é uma única leitura de MAX(version) pela chave primária;
+as migrações pendentes só rodam quando o banco está desatualizado.
+
+Para evoluir o schema, acrescente uma nova entrada ao final de MIGRATIONS
+(nunca altere migrações já publicadas).
+"""
+
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from datetime import timedelta
+from helpers import print_timestamp
+import time
+
+# Chave do advisory lock que serializa migrações entre processos
+MIGRATION_LOCK_KEY = 4_186_001
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT now()
+    )
+"""
+
+# (versão, descrição, lista de comandos SQL)
+# Os comandos passam por text(): evite '%' e parâmetros ':nome' no SQL das migrações
+MIGRATIONS = [
+    (1, "Tabela cotacoes (baseline)", [
+        """
+        CREATE TABLE IF NOT EXISTS cotacoes (
+            id SERIAL PRIMARY KEY,
+            ativo VARCHAR(10) NOT NULL,
+            datapregao DATE NOT NULL,
+            abertura DECIMAL(10, 2),
+            fechamento DECIMAL(10, 2),
+            volume DECIMAL(18, 2)
+        )
+        """,
+    ]),
+    (2, "Chave única (ativo, datapregao) e índices alinhados com init-db.sql", [
+        # Bancos criados pelo modelo ORM antigo podem ter duplicatas: mantém a mais recente
+        """
+        DELETE FROM cotacoes a
+        USING cotacoes b
+        WHERE a.ativo = b.ativo
+          AND a.datapregao = b.datapregao
+          AND a.id < b.id
+        """,
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conrelid = 'cotacoes'::regclass AND conname = 'idx_ativo_data'
+            ) THEN
+                ALTER TABLE cotacoes ADD CONSTRAINT idx_ativo_data UNIQUE (ativo, datapregao);
+            END IF;
+        END $$
+        """,
+        # A chave única já atende buscas por ativo e por (ativo, datapregao)
+        "DROP INDEX IF EXISTS idx_cotacoes_ativo",
+        "DROP INDEX IF EXISTS idx_cotacoes_ativo_data",
+        "CREATE INDEX IF NOT EXISTS idx_cotacoes_data_pregao ON cotacoes (datapregao)",
+    ]),
+    (3, "Particionamento mensal de cotacoes por datapregao", [
+        # Só converte diretamente uma tabela vazia (bancos novos). Com histórico,
+        # a conversão é feita online, mês a mês, por partition_history
+        # (python migrations.py --partition); até lá cotacoes segue sem partições
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'cotacoes'::regclass) THEN
+                RETURN;
+            END IF;
+            IF EXISTS (SELECT 1 FROM cotacoes) THEN
+                RETURN;
+            END IF;
+
+            DROP TABLE cotacoes;
+            CREATE TABLE cotacoes (
+                id SERIAL,
+                ativo VARCHAR(10) NOT NULL,
+                datapregao DATE NOT NULL,
+                abertura DECIMAL(10, 2),
+                fechamento DECIMAL(10, 2),
+                volume DECIMAL(18, 2),
+                CONSTRAINT cotacoes_pkey PRIMARY KEY (id, datapregao),
+                CONSTRAINT idx_ativo_data UNIQUE (ativo, datapregao)
+            ) PARTITION BY RANGE (datapregao);
+            CREATE INDEX idx_cotacoes_data_pregao ON cotacoes (datapregao);
+        END $$
+        """,
+    ]),
+    (4, "Ledger de shards da carga paralela", [
+        """
+        CREATE TABLE IF NOT EXISTS load_shard_ledger (
+            load_id TEXT NOT NULL,
+            shard INTEGER NOT NULL,
+            shard_count INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            finished_at TIMESTAMP,
+            PRIMARY KEY (load_id, shard)
+        )
+        """,
+    ]),
+    (5, "Índice BRIN em datapregao no lugar do B-tree", [
+        # O histórico chega em ordem de data: BRIN ocupa uma fração do B-tree
+        # e mantém a poda de faixas; buscas por ativo usam a chave única
+        "DROP INDEX IF EXISTS idx_cotacoes_data_pregao",
+        """
+        CREATE INDEX IF NOT EXISTS idx_cotacoes_data_pregao_brin ON cotacoes
+        USING brin (datapregao) WITH (pages_per_range = 32)
+        """,
+    ]),
+    (6, "Tabelas de resumo mantidas pela carga (show_db)", [
+        """
+        CREATE TABLE IF NOT EXISTS cotacoes_stats_dia (
+            datapregao DATE PRIMARY KEY,
+            registros INTEGER NOT NULL,
+            carregado_em TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cotacoes_stats_ativo (
+            ativo VARCHAR(10) PRIMARY KEY,
+            registros INTEGER NOT NULL,
+            primeira_data DATE,
+            ultima_data DATE
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_stats_dia_carregado_em ON cotacoes_stats_dia (carregado_em)",
+        "CREATE INDEX IF NOT EXISTS idx_stats_ativo_registros ON cotacoes_stats_ativo (registros DESC)",
+        # Carga inicial a partir do histórico existente (única varredura completa)
+        """
+        INSERT INTO cotacoes_stats_dia (datapregao, registros)
+        SELECT datapregao, COUNT(*) FROM cotacoes GROUP BY datapregao
+        ON CONFLICT (datapregao) DO NOTHING
+        """,
+        """
+        INSERT INTO cotacoes_stats_ativo (ativo, registros, primeira_data, ultima_data)
+        SELECT ativo, COUNT(*), MIN(datapregao), MAX(datapregao) FROM cotacoes GROUP BY ativo
+        ON CONFLICT (ativo) DO NOTHING
+        """,
+    ]),
+    (7, "Ledger de arquivos carregados (load_ledger)", [
+        """
+        CREATE TABLE IF NOT EXISTS load_ledger (
+            blob_name TEXT PRIMARY KEY,
+            etag TEXT,
+            rows INTEGER NOT NULL DEFAULT 0,
+            parser_version TEXT NOT NULL,
+            load_mode TEXT NOT NULL,
+            status TEXT NOT NULL,
+            started_at TIMESTAMP NOT NULL DEFAULT now(),
+            finished_at TIMESTAMP,
+            duration_seconds DOUBLE PRECISION,
+            error TEXT
+        )
+        """,
+    ]),
+    (8, "Métricas derivadas por ativo e data (cotacoes_metrics)", [
+        """
+        CREATE TABLE IF NOT EXISTS cotacoes_metrics (
+            ativo VARCHAR(10) NOT NULL,
+            datapregao DATE NOT NULL,
+            retorno DOUBLE PRECISION,
+            media_movel_5 DOUBLE PRECISION,
+            media_movel_20 DOUBLE PRECISION,
+            volatilidade_20 DOUBLE PRECISION,
+            calculado_em TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (ativo, datapregao)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_metrics_data_pregao ON cotacoes_metrics (datapregao)",
+    ]),
+    (9, "Armazenamento compacto opcional (tickers, cotacoes_compact e view de compatibilidade)", [
+        """
+        CREATE TABLE IF NOT EXISTS tickers (
+            id SERIAL PRIMARY KEY,
+            simbolo VARCHAR(10) NOT NULL UNIQUE
+        )
+        """,
+        # Preços e volume em centavos (bigint); colunas de 8 bytes primeiro
+        # para evitar padding de alinhamento
+        """
+        CREATE TABLE IF NOT EXISTS cotacoes_compact (
+            abertura BIGINT,
+            fechamento BIGINT,
+            volume BIGINT,
+            ticker_id INTEGER NOT NULL REFERENCES tickers (id),
+            datapregao DATE NOT NULL,
+            PRIMARY KEY (ticker_id, datapregao)
+        ) PARTITION BY RANGE (datapregao)
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_cotacoes_compact_data_pregao_brin ON cotacoes_compact
+        USING brin (datapregao) WITH (pages_per_range = 32)
+        """,
+        """
+        CREATE OR REPLACE VIEW cotacoes_compat AS
+        SELECT t.simbolo::VARCHAR(10) AS ativo,
+               c.datapregao,
+               (c.abertura / 100.0)::DECIMAL(10, 2) AS abertura,
+               (c.fechamento / 100.0)::DECIMAL(10, 2) AS fechamento,
+               (c.volume / 100.0)::DECIMAL(18, 2) AS volume
+        FROM cotacoes_compact c
+        JOIN tickers t ON t.id = c.ticker_id
+        """,
+    ]),
+    (10, "Histórico de execuções do pipeline (run_history)", [
+        """
+        CREATE TABLE IF NOT EXISTS run_history (
+            id SERIAL PRIMARY KEY,
+            started_at TIMESTAMP NOT NULL,
+            data_pregao TEXT,
+            status TEXT NOT NULL,
+            load_mode TEXT,
+            workers INTEGER,
+            direct BOOLEAN,
+            total_seconds DOUBLE PRECISION,
+            peak_rss_bytes BIGINT,
+            host TEXT,
+            trace_id TEXT,
+            stages JSONB NOT NULL DEFAULT '{}'
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_run_history_started_at ON run_history (started_at)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(engine):
+    """
+    Retorna a versão atual do schema (0 se schema_version ainda não existe)
+    """
+    try:
+        with engine.connect() as conn:
+            version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+            return version or 0
+    except ProgrammingError:
+        return 0
+
+def migrate(engine):
+    """
+    Aplica as migrações pendentes
+
+    Returns:
+        list: Versões aplicadas nesta chamada (vazia se o schema já estava atualizado)
+    """
+    current = get_schema_version(engine)
+    if current >= LATEST_VERSION:
+        return []
+
+    applied = []
+    with engine.begin() as conn:
+        # Outro processo pode estar migrando: espera e relê a versão
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        conn.execute(text(SCHEMA_VERSION_DDL))
+        current = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+        for version, description, statements in MIGRATIONS:
+            if version <= current:
+                continue
+
+            migration_start = time.time()
+            print(f"[{print_timestamp()}] [INFO] 🏗️ Aplicando migração {version}: {description}")
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(
+                text("INSERT INTO schema_version (version, description) VALUES (:version, :description)"),
+                {"version": version, "description": description}
+            )
+            applied.append(version)
+            print(f"[{print_timestamp()}] [OK] ✅ Migração {version} aplicada em {time.time() - migration_start:.2f}s")
+
+    if 3 in applied and not is_partitioned(engine):
+        print(f"[{print_timestamp()}] [INFO] 💡 cotacoes tem histórico e segue sem partições; "
+              f"converta online com 'python migrations.py --partition'")
+    return applied
+
+# Conversão online de cotacoes com histórico (partition_history):
+# a tabela particionada é montada ao lado da original e trocada no final
+SHADOW_TABLE = "cotacoes_part"
+# Datas alteradas em cotacoes durante a conversão (gatilho), recopiadas na troca
+DIRTY_TABLE = "cotacoes_part_dirty"
+# Nome da tabela original após a troca (mantida até ser apagada manualmente)
+UNPARTITIONED_TABLE = "cotacoes_unpartitioned"
+# Espera máxima pelos locks de DDL: não enfileira atrás de uma carga longa
+PARTITION_LOCK_TIMEOUT = "10s"
+
+def is_partitioned(engine):
+    """Verifica se cotacoes já é uma tabela particionada"""
+    with engine.connect() as conn:
+        return bool(conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('cotacoes'))"
+        )).scalar())
+
+def _month_partition(start):
+    """(nome, início, fim) da partição mensal que começa em start"""
+    end = (start + timedelta(days=32)).replace(day=1)
+    return f"cotacoes_y{start.year:04d}m{start.month:02d}", start, end
+
+def _prepare_shadow(conn):
+    """Tabela particionada vazia, tabela de datas alteradas e gatilho em cotacoes"""
+    conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {SHADOW_TABLE} (
+            id INTEGER NOT NULL DEFAULT nextval('cotacoes_id_seq'),
+            ativo VARCHAR(10) NOT NULL,
+            datapregao DATE NOT NULL,
+            abertura DECIMAL(10, 2),
+            fechamento DECIMAL(10, 2),
+            volume DECIMAL(18, 2),
+            CONSTRAINT {SHADOW_TABLE}_pkey PRIMARY KEY (id, datapregao),
+            CONSTRAINT {SHADOW_TABLE}_ativo_data_key UNIQUE (ativo, datapregao)
+        ) PARTITION BY RANGE (datapregao)
+    """))
+    conn.execute(text(f"""
+        CREATE INDEX IF NOT EXISTS {SHADOW_TABLE}_datapregao_brin ON {SHADOW_TABLE}
+        USING brin (datapregao) WITH (pages_per_range = 32)
+    """))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DIRTY_TABLE} (datapregao DATE PRIMARY KEY)"))
+    conn.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {DIRTY_TABLE}_mark() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {DIRTY_TABLE} VALUES (NEW.datapregao) ON CONFLICT DO NOTHING;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO {DIRTY_TABLE} VALUES (OLD.datapregao) ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql
+    """))
+    conn.execute(text(f"DROP TRIGGER IF EXISTS {DIRTY_TABLE}_mark ON cotacoes"))
+    conn.execute(text(f"""
+        CREATE TRIGGER {DIRTY_TABLE}_mark AFTER INSERT OR UPDATE OR DELETE ON cotacoes
+        FOR EACH ROW EXECUTE PROCEDURE {DIRTY_TABLE}_mark()
+    """))
+
+def _copy_month(conn, name, start, end):
+    """
+    Copia um mês de cotacoes para uma tabela nova e a anexa à tabela particionada
+
+    Chave primária, chave única, BRIN e o CHECK do intervalo são criados antes
+    do ATTACH: o anexo reaproveita os índices e dispensa a varredura de
+    validação. Só a tabela nova recebe lock exclusivo; cotacoes é apenas lida.
+
+    Returns:
+        int: Linhas copiadas
+    """
+    bounds = f"datapregao >= '{start.isoformat()}' AND datapregao < '{end.isoformat()}'"
+    conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {SHADOW_TABLE} INCLUDING DEFAULTS)"))
+    copied = conn.execute(text(f"""
+        INSERT INTO {name} (id, ativo, datapregao, abertura, fechamento, volume)
+        SELECT id, ativo, datapregao, abertura, fechamento, volume
+        FROM cotacoes
+        WHERE {bounds}
+        ORDER BY datapregao, ativo
+    """)).rowcount
+    conn.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_range CHECK ({bounds})"))
+    conn.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_pkey PRIMARY KEY (id, datapregao)"))
+    conn.execute(text(f"ALTER TABLE {name} ADD CONSTRAINT {name}_ativo_datapregao_key UNIQUE (ativo, datapregao)"))
+    conn.execute(text(f"CREATE INDEX {name}_datapregao_idx ON {name} USING brin (datapregao) WITH (pages_per_range = 32)"))
+    conn.execute(text(
+        f"ALTER TABLE {SHADOW_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    conn.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_range"))
+    return copied
+
+def _swap_shadow(conn):
+    """
+    Recopia as datas alteradas durante a conversão e troca as tabelas
+
+    Única etapa com lock exclusivo em cotacoes: só toca as datas carregadas
+    desde o início da conversão e renomeia as tabelas.
+
+    Returns:
+        int: Datas recopiadas
+    """
+    conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    conn.execute(text("LOCK TABLE cotacoes IN ACCESS EXCLUSIVE MODE"))
+    dirty = [row[0] for row in conn.execute(text(f"SELECT datapregao FROM {DIRTY_TABLE}"))]
+
+    if dirty:
+        attached = {row[0] for row in conn.execute(text(f"""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = '{SHADOW_TABLE}'::regclass
+        """))}
+        for name, start, end in sorted({_month_partition(d.replace(day=1)) for d in dirty}):
+            if name not in attached:
+                # Mês novo carregado durante a conversão: poucos dias, cópia direta
+                conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF {SHADOW_TABLE} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                ))
+        dates = "ARRAY[" + ", ".join(f"DATE '{d.isoformat()}'" for d in dirty) + "]"
+        conn.execute(text(f"DELETE FROM {SHADOW_TABLE} WHERE datapregao = ANY({dates})"))
+        conn.execute(text(f"""
+            INSERT INTO {SHADOW_TABLE} (id, ativo, datapregao, abertura, fechamento, volume)
+            SELECT id, ativo, datapregao, abertura, fechamento, volume
+            FROM cotacoes
+            WHERE datapregao = ANY({dates})
+        """))
+
+    pk_name = conn.execute(text(
+        "SELECT conname FROM pg_constraint WHERE conrelid = 'cotacoes'::regclass AND contype = 'p'"
+    )).scalar()
+    conn.execute(text(f"DROP TRIGGER {DIRTY_TABLE}_mark ON cotacoes"))
+    conn.execute(text(f"ALTER TABLE cotacoes RENAME TO {UNPARTITIONED_TABLE}"))
+    if pk_name:
+        conn.execute(text(f'ALTER TABLE {UNPARTITIONED_TABLE} RENAME CONSTRAINT "{pk_name}" TO {UNPARTITIONED_TABLE}_pkey'))
+    conn.execute(text(f"ALTER TABLE {UNPARTITIONED_TABLE} RENAME CONSTRAINT idx_ativo_data TO {UNPARTITIONED_TABLE}_ativo_data_key"))
+    conn.execute(text(f"ALTER INDEX IF EXISTS idx_cotacoes_data_pregao RENAME TO {UNPARTITIONED_TABLE}_datapregao_idx"))
+    conn.execute(text(f"ALTER INDEX IF EXISTS idx_cotacoes_data_pregao_brin RENAME TO {UNPARTITIONED_TABLE}_datapregao_brin"))
+
+    conn.execute(text(f"ALTER TABLE {SHADOW_TABLE} RENAME TO cotacoes"))
+    conn.execute(text(f"ALTER TABLE cotacoes RENAME CONSTRAINT {SHADOW_TABLE}_pkey TO cotacoes_pkey"))
+    conn.execute(text(f"ALTER TABLE cotacoes RENAME CONSTRAINT {SHADOW_TABLE}_ativo_data_key TO idx_ativo_data"))
+    conn.execute(text(f"ALTER INDEX {SHADOW_TABLE}_datapregao_brin RENAME TO idx_cotacoes_data_pregao_brin"))
+    conn.execute(text("ALTER SEQUENCE cotacoes_id_seq OWNED BY cotacoes.id"))
+    conn.execute(text(f"DROP TABLE {DIRTY_TABLE}"))
+    conn.execute(text(f"DROP FUNCTION {DIRTY_TABLE}_mark()"))
+    return len(dirty)
+
+def partition_history(engine):
+    """
+    Converte online uma cotacoes com histórico em tabela particionada por mês
+
+    1. Cria cotacoes_part (vazia) e um gatilho que registra as datas alteradas
+       em cotacoes a partir deste ponto
+    2. Copia cada mês numa transação curta (_copy_month); cargas e consultas
+       continuam usando cotacoes normalmente
+    3. Numa transação final com lock exclusivo, recopia só as datas alteradas
+       durante a conversão e troca as tabelas; a original fica em
+       cotacoes_unpartitioned até ser apagada manualmente
+
+    Interrompida, pode ser executada de novo: meses já anexados são pulados.
+
+    Returns:
+        bool: True se cotacoes está particionada ao final
+    """
+    if is_partitioned(engine):
+        print(f"[{print_timestamp()}] [INFO] cotacoes já é particionada")
+        return True
+
+    convert_start = time.time()
+    with engine.begin() as conn:
+        _prepare_shadow(conn)
+
+    # Leitura sem lock exclusivo: meses que surgirem depois entram pelo gatilho
+    with engine.connect() as conn:
+        months = [row[0] for row in conn.execute(text(
+            "SELECT DISTINCT date_trunc('month', datapregao)::date FROM cotacoes ORDER BY 1"
+        ))]
+        attached = {row[0] for row in conn.execute(text(f"""
+            SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = '{SHADOW_TABLE}'::regclass
+        """))}
+    print(f"[{print_timestamp()}] [INFO] 🧱 Convertendo cotacoes: {len(months)} mês(es), "
+          f"{len(attached)} já copiado(s)")
+
+    for month in months:
+        name, start, end = _month_partition(month)
+        if name in attached:
+            continue
+        month_start = time.time()
+        try:
+            with engine.begin() as conn:
+                copied = _copy_month(conn, name, start, end)
+        except Exception as e:
+            print(f"[{print_timestamp()}] [ERROR] ❌ Falha ao copiar {name}: {e}")
+            print(f"[{print_timestamp()}] [INFO] 💡 Execute novamente para continuar do mês pendente")
+            return False
+        print(f"[{print_timestamp()}] [OK] ✅ {name}: {copied:,} registros em {time.time() - month_start:.2f}s")
+
+    try:
+        with engine.begin() as conn:
+            recopied = _swap_shadow(conn)
+    except Exception as e:
+        print(f"[{print_timestamp()}] [ERROR] ❌ Falha na troca das tabelas: {e}")
+        print(f"[{print_timestamp()}] [INFO] 💡 Execute novamente; os meses já copiados são mantidos")
+        return False
+
+    print(f"[{print_timestamp()}] [OK] ✅ cotacoes particionada em {time.time() - convert_start:.2f}s "
+          f"({recopied} data(s) recopiada(s) na troca); apague {UNPARTITIONED_TABLE} após conferir os dados")
+    return True
+
+if __name__ == "__main__":
+    import sys
+    from database import get_engine
+
+    engine = get_engine()
+    migrate(engine)
+    if "--partition" in sys.argv[1:]:
+        sys.exit(0 if partition_history(engine) else 1)
+    print(f"[{print_timestamp()}] [INFO] Schema na versão {get_schema_version(engine)}; "
+          f"cotacoes {'particionada' if is_partitioned(engine) else 'sem partições'}")
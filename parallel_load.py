@@ -0,0 +1,433 @@
+"""
+Carga paralela de cotações em múltiplas conexões
+
+Os registros são divididos em shards (por hash do ativo ou por data) e cada
+shard é enviado por um worker com sua própria conexão: COPY para um staging
+temporário e merge em cotacoes via INSERT ... ON CONFLICT.
+
+Modos de commit:
+- '2pc': todos os shards são preparados (PREPARE TRANSACTION) e só então
+  confirmados; se qualquer shard falhar, todos são desfeitos. Requer
+  max_prepared_transactions > 0 no PostgreSQL (ver docker-compose.yml).
+  O finalizador grava o registro de decisão ('2pc-<token>' em
+  load_shard_ledger) e é confirmado antes dos shards; recover_prepared usa
+  esse registro para concluir ou desfazer as transações que um coordenador
+  interrompido deixou em pg_prepared_xacts.
+
+Uso:
+    python parallel_load.py --recover   # Resolve transações 2PC pendentes
+- 'independent': cada shard confirma sozinho e registra sua conclusão em
+  load_shard_ledger na mesma transação; reexecutar a mesma carga pula os
+  shards já concluídos.
+
+Os shards apenas inserem/atualizam. A remoção dos pares (ativo, data) que
+não vieram na carga e a atualização das tabelas de resumo (summary_stats)
+ficam num passo final único, para que nenhum shard dispute as mesmas linhas
+de resumo com os demais.
+"""
+
+from database import (
+    DatabaseManager, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    _create_staging, _copy_cotacoes, _has_unique_key, _merge_staging,
+)
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from helpers import print_timestamp
+import summary_stats
+import hashlib
+import os
+import time
+import uuid
+import zlib
+
+SHARD_MODES = ("ativo", "date")
+COMMIT_MODES = ("2pc", "independent")
+
+# Transações preparadas da carga 2PC: gtrid 'cotacoes-<token>-<shard|final>'
+XID_PREFIX = "cotacoes-"
+# Transações preparadas sem registro de decisão mais antigas que isso são de
+# coordenadores interrompidos; as mais novas podem ser de uma carga em andamento
+PREPARED_XACT_MAX_AGE_SECONDS = int(os.getenv("PREPARED_XACT_MAX_AGE_SECONDS", "600"))
+
+def shard_records(cotacoes_list, shards, shard_by="ativo"):
+    """
+    Divide as cotações em até `shards` grupos
+
+    Por 'ativo' usa CRC32 do ticker (o mesmo ativo sempre cai no mesmo shard);
+    por 'date' distribui dias inteiros entre os shards.
+
+    Returns:
+        list: Listas de cotações, sem shards vazios
+    """
+    if shard_by not in SHARD_MODES:
+        raise ValueError(f"Modo de shard inválido: {shard_by} (use {', '.join(SHARD_MODES)})")
+
+    groups = [[] for _ in range(shards)]
+    if shard_by == "ativo":
+        for cotacao in cotacoes_list:
+            groups[zlib.crc32(cotacao['ativo'].encode()) % shards].append(cotacao)
+    else:
+        dates = sorted({c['data_pregao'] for c in cotacoes_list})
+        slot = {d: i % shards for i, d in enumerate(dates)}
+        for cotacao in cotacoes_list:
+            groups[slot[cotacao['data_pregao']]].append(cotacao)
+    return [g for g in groups if g]
+
+def compute_load_id(cotacoes_list, shards, shard_by):
+    """Identificador determinístico da carga: mesma entrada gera o mesmo id"""
+    digest = hashlib.sha1(f"{shard_by}:{shards}".encode())
+    for c in cotacoes_list:
+        digest.update(f"{c['ativo']}|{c['data_pregao']}|{c.get('abertura')}|"
+                      f"{c.get('fechamento')}|{c.get('volume')}\n".encode())
+    return digest.hexdigest()[:16]
+
+def _load_shard(cursor, records, staging=None):
+    """
+    COPY + merge de um shard no cursor informado (sem commit, sem remoções)
+
+    Sem `staging` usa a tabela temporária padrão; com um nome, cria uma
+    tabela UNLOGGED própria do shard e a apaga ao final (exigido pelo 2PC).
+    """
+    dates = sorted({c['data_pregao'] for c in records})
+    if staging is None:
+        _create_staging(cursor)
+        _copy_cotacoes(cursor, "cotacoes_staging", records)
+        return _merge_staging(cursor, dates, prune=False)
+
+    _create_staging(cursor, staging, temporary=False)
+    _copy_cotacoes(cursor, staging, records)
+    result = _merge_staging(cursor, dates, prune=False, staging=staging)
+    cursor.execute(f"DROP TABLE {staging}")
+    return result
+
+def _prune_missing(cursor, dates, new_pairs):
+    """Remove das datas carregadas os pares (ativo, data) que não vieram na carga"""
+    pairs = sorted(new_pairs)
+    cursor.execute("""
+        DELETE FROM cotacoes
+        WHERE datapregao = ANY(%s)
+          AND (ativo, datapregao) NOT IN (
+              SELECT a, d FROM unnest(%s::varchar[], %s::date[]) AS t(a, d)
+          )
+    """, (dates, [a for a, _ in pairs], [d for _, d in pairs]))
+    return cursor.rowcount
+
+def load_parallel(cotacoes_list, workers=4, shard_by="ativo", commit_mode="2pc",
+                  load_id=None, database_url=None):
+    """
+    Carrega cotações em paralelo, um shard por conexão
+
+    Args:
+        cotacoes_list: Lista de dicionários no formato de insert_cotacoes_batch
+        workers: Número de shards/conexões simultâneas
+        shard_by: 'ativo' (hash do ticker) ou 'date' (dias inteiros por shard)
+        commit_mode: '2pc' (tudo ou nada) ou 'independent' (ledger por shard)
+        load_id: Identificador da carga no ledger (padrão: hash da entrada)
+        database_url: URL do banco (padrão: DATABASE_URL)
+
+    Returns:
+        int: Número de registros carregados (0 em caso de falha)
+    """
+    if commit_mode not in COMMIT_MODES:
+        raise ValueError(f"Modo de commit inválido: {commit_mode} (use {', '.join(COMMIT_MODES)})")
+    if not cotacoes_list:
+        print(f"[{print_timestamp()}] [WARNING] ⚠️ Lista de cotações vazia")
+        return 0
+
+    # Uma conexão fica reservada para o passo final (remoções e resumos)
+    pool_capacity = DB_POOL_SIZE + DB_MAX_OVERFLOW - 1
+    if workers > pool_capacity:
+        print(f"[{print_timestamp()}] [WARN] ⚠️ {workers} workers excedem o pool ({pool_capacity}); "
+              f"usando {pool_capacity} (ajuste DB_POOL_SIZE/DB_MAX_OVERFLOW)")
+        workers = pool_capacity
+
+    db = DatabaseManager(database_url)
+    if not db.connect():
+        return 0
+
+    load_start = time.time()
+    shards = shard_records(cotacoes_list, workers, shard_by)
+    dates = sorted({c['data_pregao'] for c in cotacoes_list})
+    new_pairs = {(c['ativo'], c['data_pregao']) for c in cotacoes_list}
+
+    print(f"[{print_timestamp()}] [INFO] 🚀 Carga paralela de {len(cotacoes_list):,} cotações: "
+          f"{len(shards)} shards por {shard_by}, commit {commit_mode}")
+
+    if commit_mode == "2pc":
+        loaded = _load_two_phase(db, shards, dates, new_pairs)
+    else:
+        load_id = load_id or compute_load_id(cotacoes_list, workers, shard_by)
+        loaded = _load_independent(db, shards, dates, new_pairs, load_id)
+
+    total_time = time.time() - load_start
+    if loaded:
+        rate = loaded / total_time if total_time > 0 else 0
+        print(f"[{print_timestamp()}] [OK] ✅ Carga paralela concluída: {loaded:,} registros "
+              f"em {total_time:.2f}s ({rate:.0f} registros/s)")
+    return loaded
+
+def _decision_load_id(load_token):
+    """load_id do registro de decisão da carga 2PC em load_shard_ledger"""
+    return f"2pc-{load_token}"
+
+def _xid_token(gtrid):
+    """Token da carga a partir do gtrid 'cotacoes-<token>-<nome>'"""
+    return gtrid[len(XID_PREFIX):].split("-", 1)[0]
+
+def recover_prepared(db, max_age_seconds=PREPARED_XACT_MAX_AGE_SECONDS, load_token=None, commit=None):
+    """
+    Resolve transações preparadas (pg_prepared_xacts) deixadas por cargas 2PC
+
+    Com o registro de decisão da carga em load_shard_ledger (gravado pelo
+    finalizador, confirmado antes dos shards), os shards ainda preparados são
+    confirmados. Sem ele nenhum shard foi confirmado: as transações com mais
+    de max_age_seconds são desfeitas.
+
+    Args:
+        load_token: Resolve só as transações desta carga (fase 2 do próprio processo)
+        commit: True/False força a decisão (None = decide pelo registro)
+
+    Returns:
+        list: gtrid das transações que continuam preparadas
+    """
+    raw_connection = db.engine.raw_connection()
+    try:
+        dbapi_conn = raw_connection.connection
+        dbapi_conn.rollback()
+        xids = [
+            xid for xid in dbapi_conn.tpc_recover()
+            if (xid.gtrid or "").startswith(XID_PREFIX) and xid.database == dbapi_conn.info.dbname
+            and (load_token is None or _xid_token(xid.gtrid) == load_token)
+        ]
+        if not xids:
+            return []
+
+        cursor = dbapi_conn.cursor()
+        cursor.execute(
+            "SELECT load_id FROM load_shard_ledger WHERE load_id = ANY(%s)",
+            ([_decision_load_id(token) for token in {_xid_token(xid.gtrid) for xid in xids}],)
+        )
+        decided = {row[0] for row in cursor.fetchall()}
+        dbapi_conn.rollback()
+
+        now = datetime.now(timezone.utc)
+        pending = []
+        committed = rolled_back = 0
+        # Finalizador primeiro: sua confirmação é o registro da decisão
+        for xid in sorted(xids, key=lambda xid: not xid.gtrid.endswith("-final")):
+            do_commit = commit if commit is not None else _decision_load_id(_xid_token(xid.gtrid)) in decided
+            if not do_commit and commit is None and (now - xid.prepared).total_seconds() < max_age_seconds:
+                pending.append(xid.gtrid)
+                continue
+            try:
+                if do_commit:
+                    dbapi_conn.tpc_commit(xid)
+                    committed += 1
+                else:
+                    dbapi_conn.tpc_rollback(xid)
+                    rolled_back += 1
+            except Exception as e:
+                print(f"[{print_timestamp()}] [ERROR] ❌ Falha ao resolver a transação preparada {xid.gtrid}: {e}")
+                pending.append(xid.gtrid)
+
+        if committed or rolled_back:
+            print(f"[{print_timestamp()}] [INFO] 🧹 Transações 2PC pendentes: {committed} confirmada(s), "
+                  f"{rolled_back} desfeita(s)")
+        return pending
+    finally:
+        raw_connection.close()
+
+def _load_two_phase(db, shards, dates, new_pairs):
+    """
+    Todos os shards em transações preparadas, confirmadas juntas
+
+    Uma transação extra (finalizador) lê os pares existentes antes dos shards,
+    remove os ausentes, atualiza os resumos e grava o registro de decisão; ela
+    também é preparada e, na fase 2, é confirmada antes dos shards.
+    """
+    # Antes de disputar as mesmas linhas: conclui ou desfaz cargas interrompidas
+    try:
+        recover_prepared(db)
+    except Exception as e:
+        print(f"[{print_timestamp()}] [WARN] ⚠️ Verificação de transações 2PC pendentes falhou: {e}")
+
+    load_token = uuid.uuid4().hex[:12]
+    connections = [db.engine.raw_connection() for _ in shards]
+    finalizer = db.engine.raw_connection()
+
+    def begin(connection, name):
+        dbapi_conn = connection.connection
+        dbapi_conn.tpc_begin(dbapi_conn.xid(0, f"cotacoes-{load_token}-{name}", "cotacoes"))
+        return dbapi_conn.cursor()
+
+    def run_shard(index):
+        cursor = begin(connections[index], index)
+        if not _has_unique_key(cursor):
+            raise RuntimeError("Carga paralela requer a chave única (ativo, datapregao)")
+        _load_shard(cursor, shards[index], staging=f"cotacoes_staging_{load_token}_{index}")
+        connections[index].connection.tpc_prepare()
+        return len(shards[index])
+
+    def rollback_all():
+        for conn in connections + [finalizer]:
+            try:
+                conn.connection.tpc_rollback()
+            except Exception:
+                conn.connection.rollback()
+
+    try:
+        # Retrato anterior à carga: os shards ainda não escreveram nada
+        final_cursor = begin(finalizer, "final")
+        old_pairs = summary_stats.fetch_pairs(final_cursor, dates)
+
+        with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+            futures = [executor.submit(run_shard, i) for i in range(len(shards))]
+            errors = []
+            for i, future in enumerate(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append((i, e))
+
+        if not errors:
+            try:
+                # Só remove pares fora da carga: não disputa linhas com os shards
+                _prune_missing(final_cursor, dates, new_pairs)
+                summary_stats.apply_load_delta(final_cursor, dates, old_pairs, new_pairs)
+                _record_shard(final_cursor, _decision_load_id(load_token), len(shards), len(shards),
+                              sum(len(s) for s in shards))
+                finalizer.connection.tpc_prepare()
+            except Exception as e:
+                errors.append(("final", e))
+
+        if not errors:
+            # Última verificação antes da fase 2: posse das datas ainda deste processo
+            try:
+                db.ensure_date_locks(dates)
+            except RuntimeError as e:
+                errors.append(("lock", e))
+
+        if errors:
+            for i, e in errors:
+                print(f"[{print_timestamp()}] [ERROR] ❌ Shard {i} falhou: {e}")
+            rollback_all()
+            # Preparadas que o rollback na própria conexão não desfez
+            pending = recover_prepared(db, load_token=load_token, commit=False)
+            if pending:
+                print(f"[{print_timestamp()}] [ERROR] ❌ Transações ainda preparadas: {', '.join(pending)} "
+                      f"(python parallel_load.py --recover)")
+            print(f"[{print_timestamp()}] [INFO] 💡 Todos os shards foram desfeitos (2PC)")
+            return 0
+
+        # Fase 2: todos preparados; o finalizador (registro da decisão) é
+        # confirmado primeiro. Falhas são refeitas pelo xid numa conexão nova
+        try:
+            for conn in [finalizer] + connections:
+                conn.connection.tpc_commit()
+        except Exception as e:
+            print(f"[{print_timestamp()}] [WARN] ⚠️ Fase 2 interrompida ({e}); confirmando pelo xid")
+            pending = recover_prepared(db, load_token=load_token, commit=True)
+            if pending:
+                print(f"[{print_timestamp()}] [ERROR] ❌ Transações ainda preparadas: {', '.join(pending)} "
+                      f"(python parallel_load.py --recover)")
+                return 0
+        return sum(len(s) for s in shards)
+
+    finally:
+        for conn in connections + [finalizer]:
+            conn.close()
+
+def _load_independent(db, shards, dates, new_pairs, load_id):
+    """Cada shard confirma sozinho e registra a conclusão em load_shard_ledger"""
+    with db.engine.connect() as conn:
+        done = {
+            row[0] for row in conn.exec_driver_sql(
+                "SELECT shard FROM load_shard_ledger WHERE load_id = %s AND status = 'done'",
+                (load_id,)
+            )
+        }
+    if done:
+        print(f"[{print_timestamp()}] [INFO] ⏭️ Carga {load_id}: {len(done)} shard(s) já concluído(s), pulando")
+
+    def run_shard(index):
+        if index in done:
+            return 0
+        raw_connection = db.engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            if not _has_unique_key(cursor):
+                raise RuntimeError("Carga paralela requer a chave única (ativo, datapregao)")
+            _load_shard(cursor, shards[index])
+            _record_shard(cursor, load_id, index, len(shards), len(shards[index]))
+            db.ensure_date_locks(dates)
+            raw_connection.commit()
+            return len(shards[index])
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+
+    loaded = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        futures = [executor.submit(run_shard, i) for i in range(len(shards))]
+        for i, future in enumerate(futures):
+            try:
+                loaded += future.result()
+            except Exception as e:
+                failed.append(i)
+                print(f"[{print_timestamp()}] [ERROR] ❌ Shard {i} falhou: {e}")
+
+    if failed:
+        print(f"[{print_timestamp()}] [WARN] ⚠️ {len(failed)} shard(s) pendente(s) na carga {load_id}; "
+              f"reexecute para concluir apenas os que faltam")
+        return 0
+
+    # Passo final: remove pares ausentes e recalcula os resumos. Shards de uma
+    # execução anterior já estão confirmados, então não há retrato "antes" e
+    # os resumos dos ativos tocados são recalculados a partir de cotacoes
+    final_step = len(shards)
+    if final_step not in done:
+        raw_connection = db.engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            existing = summary_stats.fetch_pairs(cursor, dates)
+            _prune_missing(cursor, dates, new_pairs)
+            tickers = {ativo for ativo, _ in existing | new_pairs}
+            summary_stats.refresh_exact(cursor, dates, tickers)
+            _record_shard(cursor, load_id, final_step, len(shards), 0)
+            db.ensure_date_locks(dates)
+            raw_connection.commit()
+        except Exception as e:
+            raw_connection.rollback()
+            print(f"[{print_timestamp()}] [ERROR] ❌ Passo final da carga {load_id} falhou: {e}")
+            return 0
+        finally:
+            raw_connection.close()
+
+    return loaded or sum(len(s) for s in shards)
+
+def _record_shard(cursor, load_id, shard, shard_count, rows):
+    """Marca o shard como concluído no ledger (na transação do próprio shard)"""
+    cursor.execute("""
+        INSERT INTO load_shard_ledger (load_id, shard, shard_count, status, rows, finished_at)
+        VALUES (%s, %s, %s, 'done', %s, now())
+        ON CONFLICT (load_id, shard) DO UPDATE
+        SET status = 'done', rows = EXCLUDED.rows, finished_at = EXCLUDED.finished_at
+    """, (load_id, shard, shard_count, rows))
+
+if __name__ == "__main__":
+    import sys
+
+    if "--recover" not in sys.argv[1:]:
+        print(__doc__)
+        sys.exit(0)
+    db = DatabaseManager()
+    if not db.connect():
+        sys.exit(1)
+    pending = recover_prepared(db)
+    if pending:
+        print(f"[{print_timestamp()}] [INFO] ⏳ {len(pending)} transação(ões) recente(s) ou com falha "
+              f"mantida(s): {', '.join(pending)}")
+    sys.exit(0)
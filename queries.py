@@ -0,0 +1,276 @@
+"""
+API de leitura de séries de cotações com memória limitada
+
+As consultas usam cursores nomeados no servidor (stream_results) e leitura
+em lotes (yield_per): o PostgreSQL envia `batch_size` linhas por vez e o
+processo nunca materializa o resultado inteiro. Isso permite percorrer
+milhões de cotações com uso de memória constante.
+
+Com as_numpy=True cada lote é convertido em um array estruturado do NumPy
+(dependência opcional, importada apenas quando usada).
+
+Consultas pontuais e frequentes (latest_close, last_sessions) passam pelo
+QUERY_CACHE (cache.py). As entradas são descartadas quando uma carga deste
+processo confirma datas do intervalo delas (register_load_listener) e, para
+cargas feitas por outros processos, pela consulta periódica de
+cotacoes_stats_dia.carregado_em (indexada).
+
+Exemplo:
+    from queries import iter_quotes, ohlc_series
+
+    for row in iter_quotes(["PETR4", "VALE3"], date(2025, 1, 1), date(2025, 9, 30)):
+        print(row.ativo, row.datapregao, row.fechamento)
+
+    serie = ohlc_series("PETR4", as_numpy=True)
+    serie["fechamento"].mean()
+"""
+
+from database import DatabaseManager, register_load_listener
+from cache import QueryCache
+from compact_schema import QUOTES_TABLE
+from sqlalchemy import text
+from datetime import timedelta
+from helpers import print_timestamp
+import os
+import threading
+import time
+
+# Linhas trazidas do servidor por vez
+DEFAULT_BATCH_SIZE = 10_000
+
+QUOTE_COLUMNS = ("ativo", "datapregao", "abertura", "fechamento", "volume")
+
+# Cache das consultas pontuais (configurável por variáveis de ambiente)
+QUERY_CACHE = QueryCache(
+    max_entries=int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "2048")),
+    max_rows=int(os.getenv("QUERY_CACHE_MAX_ROWS", "500000")),
+    ttl_seconds=int(os.getenv("QUERY_CACHE_TTL_SECONDS", "300")),
+)
+register_load_listener(QUERY_CACHE.invalidate_dates)
+
+# Intervalo mínimo entre verificações de cargas feitas por outros processos
+CACHE_SYNC_INTERVAL = float(os.getenv("QUERY_CACHE_SYNC_SECONDS", "5"))
+# Margem para cargas longas que confirmam com carregado_em anterior à última verificação
+CACHE_SYNC_OVERLAP = timedelta(minutes=10)
+
+_sync_state = {"checked_at": 0.0, "since": None, "seen": {}}
+_sync_lock = threading.Lock()
+
+# dtype dos arrays estruturados (preços e volume ausentes viram NaN)
+NUMPY_DTYPE = [
+    ("ativo", "U10"),
+    ("datapregao", "datetime64[D]"),
+    ("abertura", "f8"),
+    ("fechamento", "f8"),
+    ("volume", "f8"),
+]
+
+def _quote_filter(tickers, start, end):
+    """Monta o WHERE (e parâmetros) de ativos e intervalo de datas inclusivo"""
+    clauses = []
+    params = {}
+    if tickers:
+        clauses.append("ativo = ANY(:tickers)")
+        params["tickers"] = list(tickers)
+    # Limites explícitos em datapregao permitem a poda de partições
+    if start:
+        clauses.append("datapregao >= :start")
+        params["start"] = start
+    if end:
+        clauses.append("datapregao <= :end")
+        params["end"] = end
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    return where, params
+
+def _connect(db):
+    """Usa o DatabaseManager informado ou conecta um novo (pool compartilhado)"""
+    if db is None:
+        db = DatabaseManager()
+        if not db.connect():
+            return None
+    return db
+
+def _stream(db, sql, params, batch_size):
+    """Executa sql em cursor nomeado e gera as linhas em lotes de batch_size"""
+    with db.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(text(sql), params)
+        for batch in result.partitions(batch_size):
+            yield batch
+
+def to_numpy(rows):
+    """
+    Converte linhas (ativo, datapregao, abertura, fechamento, volume) em um
+    array estruturado do NumPy
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("as_numpy=True requer NumPy: pip install numpy")
+
+    nan = float("nan")
+    return np.array(
+        [
+            (
+                row[0],
+                row[1],
+                float(row[2]) if row[2] is not None else nan,
+                float(row[3]) if row[3] is not None else nan,
+                float(row[4]) if row[4] is not None else nan,
+            )
+            for row in rows
+        ],
+        dtype=NUMPY_DTYPE,
+    )
+
+def iter_quote_batches(tickers=None, start=None, end=None, batch_size=DEFAULT_BATCH_SIZE,
+                       as_numpy=False, db=None):
+    """
+    Gera as cotações em lotes, ordenadas por (ativo, datapregao)
+
+    Args:
+        tickers: Lista de ativos (None = todos)
+        start: Data inicial inclusiva (None = sem limite)
+        end: Data final inclusiva (None = sem limite)
+        batch_size: Linhas por lote trazidas do servidor
+        as_numpy: Gera arrays estruturados do NumPy em vez de listas de linhas
+        db: DatabaseManager conectado (padrão: novo, no pool compartilhado)
+
+    Yields:
+        list | numpy.ndarray: Um lote de cotações
+    """
+    db = _connect(db)
+    if db is None:
+        print(f"[{print_timestamp()}] [ERROR] ❌ Não foi possível conectar ao banco para consultar cotações")
+        return
+
+    where, params = _quote_filter(tickers, start, end)
+    sql = f"""
+        SELECT {', '.join(QUOTE_COLUMNS)}
+        FROM {QUOTES_TABLE}
+        {where}
+        ORDER BY ativo, datapregao
+    """
+    for batch in _stream(db, sql, params, batch_size):
+        yield to_numpy(batch) if as_numpy else batch
+
+def iter_quotes(tickers=None, start=None, end=None, batch_size=DEFAULT_BATCH_SIZE, db=None):
+    """
+    Gera as cotações uma a uma (Row com ativo, datapregao, abertura,
+    fechamento e volume), ordenadas por (ativo, datapregao)
+
+    Mesmo percorrendo o resultado linha a linha, o servidor envia lotes de
+    batch_size linhas; a memória usada não depende do tamanho do resultado.
+    """
+    for batch in iter_quote_batches(tickers, start, end, batch_size, db=db):
+        yield from batch
+
+def ohlc_series(ticker, start=None, end=None, as_numpy=False, batch_size=DEFAULT_BATCH_SIZE, db=None):
+    """
+    Série diária de um ativo ordenada por data
+
+    O arquivo BVBG.186 carregado traz apenas abertura, fechamento e volume
+    (sem máxima/mínima), por isso a série contém essas colunas.
+
+    Args:
+        ticker: Código do ativo (ex: "PETR4")
+        start: Data inicial inclusiva (None = sem limite)
+        end: Data final inclusiva (None = sem limite)
+        as_numpy: Retorna um único array estruturado do NumPy
+        batch_size: Linhas por lote trazidas do servidor
+        db: DatabaseManager conectado (padrão: novo, no pool compartilhado)
+
+    Returns:
+        list | numpy.ndarray: Linhas (ativo, datapregao, abertura, fechamento, volume)
+    """
+    batches = list(iter_quote_batches([ticker], start, end, batch_size, as_numpy=as_numpy, db=db))
+    if not as_numpy:
+        return [row for batch in batches for row in batch]
+
+    import numpy as np
+    if not batches:
+        return np.empty(0, dtype=NUMPY_DTYPE)
+    return np.concatenate(batches)
+
+def _sync_with_loads(db):
+    """
+    Invalida o cache para datas recarregadas por outros processos
+
+    Lê de cotacoes_stats_dia apenas as datas com carregado_em recente (índice
+    idx_stats_dia_carregado_em), no máximo uma vez a cada CACHE_SYNC_INTERVAL.
+    """
+    with _sync_lock:
+        now = time.monotonic()
+        if now - _sync_state["checked_at"] < CACHE_SYNC_INTERVAL:
+            return
+        _sync_state["checked_at"] = now
+
+        try:
+            with db.engine.connect() as conn:
+                server_now = conn.execute(text("SELECT LOCALTIMESTAMP")).scalar()
+                since = _sync_state["since"]
+                rows = [] if since is None else conn.execute(text("""
+                    SELECT datapregao, carregado_em
+                    FROM cotacoes_stats_dia
+                    WHERE carregado_em > :since
+                """), {"since": since - CACHE_SYNC_OVERLAP}).fetchall()
+        except Exception as e:
+            print(f"[{print_timestamp()}] [WARN] ⚠️ Falha ao verificar cargas recentes; limpando cache: {e}")
+            QUERY_CACHE.clear()
+            return
+
+        _sync_state["since"] = server_now
+        seen = _sync_state["seen"]
+        changed = [row.datapregao for row in rows if seen.get(row.datapregao) != row.carregado_em]
+        _sync_state["seen"] = {row.datapregao: row.carregado_em for row in rows}
+        if changed:
+            QUERY_CACHE.invalidate_dates(changed)
+
+def latest_close(ticker, db=None):
+    """
+    Último fechamento disponível do ativo (com cache)
+
+    Returns:
+        Row | None: (datapregao, fechamento) ou None se o ativo não tem cotações
+    """
+    db = _connect(db)
+    if db is None:
+        return None
+    _sync_with_loads(db)
+
+    def load():
+        with db.engine.connect() as conn:
+            return conn.execute(text(f"""
+                SELECT datapregao, fechamento
+                FROM {QUOTES_TABLE}
+                WHERE ativo = :ticker AND fechamento IS NOT NULL
+                ORDER BY datapregao DESC
+                LIMIT 1
+            """), {"ticker": ticker}).fetchone()
+
+    return QUERY_CACHE.get_or_load(("latest_close", (ticker,), None, None), load)
+
+def last_sessions(ticker, sessions=30, db=None):
+    """
+    Últimos `sessions` pregões do ativo em ordem de data (com cache)
+
+    Returns:
+        list: Linhas (ativo, datapregao, abertura, fechamento, volume)
+    """
+    db = _connect(db)
+    if db is None:
+        return []
+    _sync_with_loads(db)
+
+    def load():
+        with db.engine.connect() as conn:
+            rows = conn.execute(text(f"""
+                SELECT {', '.join(QUOTE_COLUMNS)}
+                FROM {QUOTES_TABLE}
+                WHERE ativo = :ticker
+                ORDER BY datapregao DESC
+                LIMIT :sessions
+            """), {"ticker": ticker, "sessions": sessions}).fetchall()
+        return list(reversed(rows))
+
+    # Intervalo aberto: qualquer nova data pode entrar nos últimos pregões
+    return QUERY_CACHE.get_or_load(("last_sessions", (ticker,), sessions, None), load)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Serviço HTTP local (somente leitura) de cotações
+
+Rotas:
+    GET /quotes/{ativo}?sessions=30           Últimos pregões do ativo
+    GET /ohlc/{ativo}?from=AAAA-MM-DD&to=...  Série diária no intervalo
+    GET /health                               Status do banco
+    GET /stats                                Contadores dos caches
+
+As respostas são NDJSON (uma cotação por linha), comprimidas com gzip quando
+o cliente aceita e enviadas em streaming (Transfer-Encoding: chunked). O ETag
+deriva da última data de pregão carregada e do horário da última carga
+(cotacoes_stats_dia): enquanto nada for carregado, clientes recebem 304.
+
+Um único processo atende vários clientes: as conexões vêm do pool
+compartilhado (database.get_engine) e respostas recentes ficam num cache em
+memória limitado por bytes.
+
+Uso:
+    python quote_service.py [--host=127.0.0.1] [--port=8080]
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from datetime import datetime, date
+from helpers import print_timestamp
+from decimal import Decimal
+from sqlalchemy import text
+from database import DatabaseManager
+from cache import QueryCache
+import queries
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+
+QUOTE_SERVICE_HOST = os.getenv("QUOTE_SERVICE_HOST", "127.0.0.1")
+QUOTE_SERVICE_PORT = int(os.getenv("QUOTE_SERVICE_PORT", "8080"))
+
+# Respostas comprimidas guardadas em memória (limite total e por resposta, em bytes)
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ITEM_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ITEM_BYTES", str(4 * 1024 * 1024)))
+RESPONSE_CACHE = QueryCache(max_entries=4096, max_rows=RESPONSE_CACHE_MAX_BYTES, ttl_seconds=3600)
+
+# Por quanto tempo a versão dos dados (base do ETag) é reaproveitada entre requisições
+DATA_VERSION_TTL_SECONDS = 1.0
+
+DEFAULT_SESSIONS = 30
+MAX_SESSIONS = 5000
+TICKER_RE = re.compile(r"^[A-Z0-9]{1,10}$")
+
+_version_state = {"checked_at": 0.0, "etag": None}
+_version_lock = threading.Lock()
+
+def data_version_etag(db):
+    """
+    ETag da versão dos dados: última data de pregão + horário da última carga
+
+    Lido de cotacoes_stats_dia (chave primária e índice em carregado_em) e
+    reaproveitado por DATA_VERSION_TTL_SECONDS.
+    """
+    with _version_lock:
+        now = time.monotonic()
+        if _version_state["etag"] and now - _version_state["checked_at"] < DATA_VERSION_TTL_SECONDS:
+            return _version_state["etag"]
+        with db.engine.connect() as conn:
+            row = conn.execute(text(
+                "SELECT MAX(datapregao) AS max_date, MAX(carregado_em) AS last_load FROM cotacoes_stats_dia"
+            )).fetchone()
+        last_load = row.last_load.strftime("%Y%m%d%H%M%S%f") if row.last_load else "0"
+        etag = f'"{row.max_date or "vazio"}-{last_load}"'
+        _version_state.update(checked_at=now, etag=etag)
+        return etag
+
+def _json_default(value):
+    """Serialização de datas e decimais para NDJSON"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tipo não serializável: {type(value)}")
+
+def _ndjson_lines(rows):
+    """Converte linhas (ativo, datapregao, abertura, fechamento, volume) em bytes NDJSON"""
+    return b"".join(
+        json.dumps(dict(zip(queries.QUOTE_COLUMNS, row)), default=_json_default).encode() + b"\n"
+        for row in rows
+    )
+
+def _parse_date(value, name):
+    """Converte AAAA-MM-DD em date (ValueError com mensagem para o cliente)"""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ValueError(f"Parâmetro '{name}' inválido: use AAAA-MM-DD")
+
+class QuoteRequestHandler(BaseHTTPRequestHandler):
+    """Atende as rotas de leitura; uma thread por conexão (ThreadingHTTPServer)"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "CotacoesB3/1.0"
+    db = None
+
+    def do_GET(self):
+        request_start = time.time()
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        parts = [p for p in url.path.split("/") if p]
+
+        try:
+            if parts == ["health"]:
+                ok, latency, error = self.db.health_check()
+                self._send_json(200 if ok else 503, {"ok": ok, "latency_ms": round(latency * 1000, 1),
+                                                     "error": error})
+            elif parts == ["stats"]:
+                self._send_json(200, {"query_cache": queries.QUERY_CACHE.stats(),
+                                      "response_cache": RESPONSE_CACHE.stats()})
+            elif len(parts) == 2 and parts[0] in ("quotes", "ohlc"):
+                self._serve_quotes(parts[0], parts[1].upper(), params, url)
+            else:
+                self._send_json(404, {"error": "Rota não encontrada"})
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except BrokenPipeError:
+            return
+        except Exception as e:
+            print(f"[{print_timestamp()}] [ERROR] ❌ {self.path}: {e}")
+            self._send_json(503, {"error": "Banco de dados indisponível"})
+
+        print(f"[{print_timestamp()}] [INFO] {self.command} {self.path} ({(time.time() - request_start) * 1000:.0f}ms)")
+
+    def _serve_quotes(self, route, ticker, params, url):
+        """Responde /quotes e /ohlc com ETag, 304, cache de respostas e gzip"""
+        if not TICKER_RE.match(ticker):
+            raise ValueError(f"Ativo inválido: {ticker}")
+
+        etag = data_version_etag(self.db)
+        if etag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+            self._send_headers(304, etag)
+            return
+
+        if route == "quotes":
+            sessions = int(params.get("sessions", [DEFAULT_SESSIONS])[0])
+            if not 1 <= sessions <= MAX_SESSIONS:
+                raise ValueError(f"'sessions' deve estar entre 1 e {MAX_SESSIONS}")
+        else:
+            start = _parse_date(params["from"][0], "from") if "from" in params else None
+            end = _parse_date(params["to"][0], "to") if "to" in params else None
+
+        accepts_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        cache_key = (url.path, url.query, etag)
+        hit, body = RESPONSE_CACHE.get(cache_key)
+        if hit:
+            if not accepts_gzip:
+                body = gzip.decompress(body)
+            self._send_headers(200, etag, gzip_encoded=accepts_gzip, length=len(body))
+            self.wfile.write(body)
+            return
+
+        if route == "quotes":
+            batches = iter([queries.last_sessions(ticker, sessions, db=self.db)])
+        else:
+            batches = queries.iter_quote_batches([ticker], start, end, db=self.db)
+        self._stream_batches(batches, etag, accepts_gzip, cache_key)
+
+    def _stream_batches(self, batches, etag, accepts_gzip, cache_key):
+        """
+        Envia os lotes em chunks à medida que chegam do banco
+
+        A versão comprimida é acumulada para o cache de respostas enquanto
+        couber em RESPONSE_CACHE_MAX_ITEM_BYTES.
+        """
+        # wbits=31: formato gzip (mesmo usado por gzip.decompress)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        cached = []
+        cached_size = 0
+        self._send_headers(200, etag, gzip_encoded=accepts_gzip, chunked=True)
+
+        try:
+            for batch in batches:
+                data = _ndjson_lines(batch)
+                compressed = compressor.compress(data)
+                if cached is not None:
+                    cached.append(compressed)
+                    cached_size += len(compressed)
+                    if cached_size > RESPONSE_CACHE_MAX_ITEM_BYTES:
+                        cached = None
+                self._write_chunk(compressed if accepts_gzip else data)
+        except BrokenPipeError:
+            raise
+        except Exception as e:
+            # Cabeçalhos já enviados: encerra a conexão sem o chunk final para
+            # que o cliente perceba a resposta incompleta
+            print(f"[{print_timestamp()}] [ERROR] ❌ Falha no streaming de {self.path}: {e}")
+            self.close_connection = True
+            return
+
+        tail = compressor.flush()
+        if accepts_gzip:
+            self._write_chunk(tail)
+        self.wfile.write(b"0\r\n\r\n")
+
+        if cached is not None:
+            body = b"".join(cached) + tail
+            RESPONSE_CACHE.put(cache_key, body, cost=len(body))
+
+    def _write_chunk(self, data):
+        """Escreve um chunk HTTP/1.1 (chunks vazios são omitidos)"""
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+
+    def _send_headers(self, status, etag, gzip_encoded=False, length=None, chunked=False):
+        """Status e cabeçalhos comuns das respostas de cotações"""
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if status == 304:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        if gzip_encoded:
+            self.send_header("Content-Encoding", "gzip")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def _send_json(self, status, payload):
+        """Resposta JSON simples (health, stats e erros)"""
+        body = json.dumps(payload, default=_json_default).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Os acessos já são registrados em do_GET no formato do projeto"""
+        return
+
+def run_server(host=QUOTE_SERVICE_HOST, port=QUOTE_SERVICE_PORT):
+    """Inicia o serviço e atende até Ctrl+C"""
+    db = DatabaseManager()
+    if not db.connect():
+        print(f"[{print_timestamp()}] [ERROR] ❌ PostgreSQL indisponível; serviço não iniciado")
+        return False
+
+    QuoteRequestHandler.db = db
+    server = ThreadingHTTPServer((host, port), QuoteRequestHandler)
+    server.daemon_threads = True
+    print(f"[{print_timestamp()}] [OK] ✅ Serviço de cotações em http://{host}:{port}")
+    print(f"[{print_timestamp()}] [INFO] 💡 Ex.: curl --compressed http://{host}:{port}/quotes/PETR4")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n[{print_timestamp()}] [INFO] ⚠️ Serviço interrompido pelo usuário")
+    finally:
+        server.server_close()
+    return True
+
+if __name__ == "__main__":
+    host = QUOTE_SERVICE_HOST
+    port = QUOTE_SERVICE_PORT
+    for arg in sys.argv[1:]:
+        if arg.startswith("--host="):
+            host = arg.split("=", 1)[1]
+        elif arg.startswith("--port="):
+            port = int(arg.split("=", 1)[1])
+        else:
+            print(f"[ERROR] Argumento inválido: {arg}")
+            print("Uso: python quote_service.py [--host=127.0.0.1] [--port=8080]")
+            sys.exit(1)
+    sys.exit(0 if run_server(host, port) else 1)
@@ -0,0 +1,278 @@
+"""
+Histórico de execuções do pipeline (tabela run_history) e detecção de regressões
+
+Cada execução de main.run_pipeline que extrai e carrega um pregão grava um
+registro com a duração, bytes, linhas e vazão de cada etapa (a partir dos
+spans de instrumentation.py), o tempo total e o pico de memória (RSS). Sem
+PostgreSQL disponível, o registro vai para RUN_HISTORY_FILE (JSON-lines).
+
+O relatório compara a última execução concluída com a mediana das
+RUN_HISTORY_WINDOW anteriores e aponta as métricas que pioraram mais que
+REGRESSION_THRESHOLD.
+
+Uso:
+    python run_history.py                    # Relatório da última execução (código 1 se houver regressão)
+    python run_history.py --threshold=0.5    # Tolerância de 50%
+    python run_history.py --window=20        # Mediana das últimas 20 execuções
+    python run_history.py --list             # Últimas execuções registradas
+"""
+
+from statistics import median
+from helpers import print_timestamp
+import json
+import os
+import socket
+import sys
+
+RUN_HISTORY_FILE = os.getenv("RUN_HISTORY_FILE", "./dados_b3/run_history.jsonl")
+# Execuções anteriores usadas na mediana de referência
+RUN_HISTORY_WINDOW = int(os.getenv("RUN_HISTORY_WINDOW", "10"))
+# Piora relativa à mediana considerada regressão (0.25 = 25%)
+REGRESSION_THRESHOLD = float(os.getenv("REGRESSION_THRESHOLD", "0.25"))
+# Execuções anteriores mínimas para comparar uma métrica
+REGRESSION_MIN_RUNS = 3
+# Etapas mais curtas que isso (mediana) não são comparadas: variação é ruído
+REGRESSION_MIN_SECONDS = 0.5
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+# Etapas registradas, na ordem do pipeline (nomes dos spans)
+STAGES = ("download", "unzip", "upload", "archive", "parse", "insert", "analyze", "metrics", "load")
+
+def peak_rss_bytes():
+    """
+    Pico de memória residente do processo e dos processos filhos (None fora do Unix)
+
+    É o pico desde o início do processo: no daemon e nos workers da fila,
+    inclui os dias processados antes.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss: kilobytes no Linux, bytes no macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def _walk(span):
+    for child in span.children:
+        yield child
+        yield from _walk(child)
+
+def build_record(root, ok):
+    """
+    Registro da execução a partir do span raiz 'pipeline'
+
+    Etapas com mais de um span (partes, novas tentativas) têm durações e
+    contadores somados.
+
+    Returns:
+        dict: Registro ou None se a execução não processou nada (pulada pelo
+              load_ledger ou pelo lock da data)
+    """
+    stages = {}
+    for span in _walk(root):
+        if span.name not in STAGES:
+            continue
+        stage = stages.setdefault(span.name, {"seconds": 0.0, "bytes": 0, "rows": 0})
+        stage["seconds"] += span.elapsed()
+        stage["bytes"] += span.counts.get("bytes", 0)
+        stage["rows"] += span.counts.get("rows", 0)
+    if not stages:
+        return None
+
+    for stage in stages.values():
+        stage["seconds"] = round(stage["seconds"], 3)
+        if stage["seconds"] > 0:
+            stage["rows_per_s"] = round(stage["rows"] / stage["seconds"], 1) if stage["rows"] else None
+            stage["bytes_per_s"] = round(stage["bytes"] / stage["seconds"], 1) if stage["bytes"] else None
+
+    return {
+        "started_at": root.started_at.isoformat(timespec="seconds"),
+        "data_pregao": root.attrs.get("date"),
+        "status": STATUS_OK if ok else STATUS_FAILED,
+        "load_mode": root.attrs.get("mode"),
+        "workers": root.attrs.get("workers"),
+        "direct": root.attrs.get("direct"),
+        "total_seconds": round(root.elapsed(), 3),
+        "peak_rss_bytes": peak_rss_bytes(),
+        "host": socket.gethostname(),
+        "trace_id": root.trace_id,
+        "stages": stages,
+    }
+
+def _append_file(record):
+    os.makedirs(os.path.dirname(RUN_HISTORY_FILE) or ".", exist_ok=True)
+    with open(RUN_HISTORY_FILE, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+def save_run(record, db=None):
+    """
+    Grava o registro em run_history (ou em RUN_HISTORY_FILE sem banco)
+
+    Returns:
+        str: 'postgres', 'file' ou None se nada foi gravado
+    """
+    try:
+        from sqlalchemy import text
+        if db is None:
+            from database import DatabaseManager
+            db = DatabaseManager()
+        if db.engine is not None or db.connect():
+            with db.engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO run_history (started_at, data_pregao, status, load_mode, workers, direct,
+                                             total_seconds, peak_rss_bytes, host, trace_id, stages)
+                    VALUES (:started_at, :data_pregao, :status, :load_mode, :workers, :direct,
+                            :total_seconds, :peak_rss_bytes, :host, :trace_id, CAST(:stages AS JSONB))
+                """), dict(record, stages=json.dumps(record["stages"])))
+            return "postgres"
+    except Exception as e:
+        print(f"[{print_timestamp()}] [WARN] ⚠️ run_history indisponível ({e}); gravando em {RUN_HISTORY_FILE}")
+
+    try:
+        _append_file(record)
+        return "file"
+    except OSError as e:
+        print(f"[{print_timestamp()}] [WARN] ⚠️ Não foi possível gravar o histórico da execução: {e}")
+        return None
+
+def load_runs(db=None, limit=100):
+    """
+    Últimas execuções registradas, da mais antiga para a mais recente
+
+    Lê run_history; sem banco (ou com a tabela vazia), lê RUN_HISTORY_FILE.
+    """
+    runs = []
+    try:
+        from sqlalchemy import text
+        if db is None:
+            from database import DatabaseManager
+            db = DatabaseManager()
+        if db.engine is not None or db.connect():
+            with db.engine.connect() as conn:
+                rows = conn.execute(text("""
+                    SELECT * FROM run_history ORDER BY started_at DESC, id DESC LIMIT :limit
+                """), {"limit": limit}).mappings().fetchall()
+            runs = [dict(row, started_at=row["started_at"].isoformat(timespec="seconds")) for row in reversed(rows)]
+    except Exception:
+        runs = []
+
+    if not runs:
+        try:
+            with open(RUN_HISTORY_FILE) as f:
+                runs = [json.loads(line) for line in f if line.strip()][-limit:]
+        except (OSError, ValueError):
+            runs = []
+    return runs
+
+def _metrics(run):
+    """Métricas comparáveis de uma execução: nome -> (valor, maior é pior)"""
+    values = {
+        "total_seconds": (run.get("total_seconds"), True),
+        "peak_rss_bytes": (run.get("peak_rss_bytes"), True),
+    }
+    for name, stage in (run.get("stages") or {}).items():
+        values[f"{name}.seconds"] = (stage.get("seconds"), True)
+        if stage.get("rows_per_s"):
+            values[f"{name}.rows_per_s"] = (stage["rows_per_s"], False)
+    return values
+
+def compare_runs(latest, previous, threshold=REGRESSION_THRESHOLD, min_runs=REGRESSION_MIN_RUNS):
+    """
+    Compara uma execução com a mediana das anteriores
+
+    Args:
+        latest: Registro da execução avaliada
+        previous: Registros de referência (somente execuções concluídas)
+        threshold: Piora relativa tolerada
+
+    Returns:
+        list: dicts {'metric', 'latest', 'median', 'change', 'regression'}
+              (change > 0 = piora), na ordem das métricas de latest
+    """
+    baseline = [_metrics(run) for run in previous]
+    comparisons = []
+    for metric, (value, higher_is_worse) in _metrics(latest).items():
+        history = [m[metric][0] for m in baseline if m.get(metric, (None,))[0] is not None]
+        if value is None or len(history) < min_runs:
+            continue
+        reference = median(history)
+        if reference <= 0 or (metric.endswith("seconds") and reference < REGRESSION_MIN_SECONDS):
+            continue
+        change = (value - reference) / reference
+        if not higher_is_worse:
+            change = -change
+        comparisons.append({
+            "metric": metric,
+            "latest": value,
+            "median": reference,
+            "change": change,
+            "regression": change > threshold,
+        })
+    return comparisons
+
+def regression_report(runs, window=RUN_HISTORY_WINDOW, threshold=REGRESSION_THRESHOLD):
+    """
+    Compara a última execução concluída com a mediana das window anteriores
+
+    Returns:
+        tuple: (registro avaliado ou None, comparações de compare_runs)
+    """
+    done = [run for run in runs if run.get("status") == STATUS_OK]
+    if not done:
+        return None, []
+    latest = done[-1]
+    return latest, compare_runs(latest, done[-window - 1:-1], threshold)
+
+def _format_value(metric, value):
+    if metric == "peak_rss_bytes":
+        return f"{value / (1024 * 1024):.0f} MB"
+    if metric.endswith("rows_per_s"):
+        return f"{value:,.0f}/s"
+    return f"{value:.2f}s"
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    window, threshold = RUN_HISTORY_WINDOW, REGRESSION_THRESHOLD
+    for arg in args:
+        if arg.startswith("--window="):
+            window = int(arg.split("=", 1)[1])
+        elif arg.startswith("--threshold="):
+            threshold = float(arg.split("=", 1)[1])
+
+    runs = load_runs(limit=max(window + 1, 20) * 3)
+
+    if "--list" in args:
+        print(f"{'INÍCIO':<20} {'PREGÃO':<8} {'STATUS':<7} {'TOTAL':>9} {'RSS':>8}  ETAPAS")
+        print("-" * 84)
+        for run in runs[-20:]:
+            rss = f"{run['peak_rss_bytes'] / (1024 * 1024):.0f} MB" if run.get("peak_rss_bytes") else "-"
+            stages = " ".join(f"{name}={stage['seconds']:.1f}s" for name, stage in run["stages"].items())
+            print(f"{run['started_at']:<20} {run.get('data_pregao') or '-':<8} {run['status']:<7} "
+                  f"{run['total_seconds']:>8.1f}s {rss:>8}  {stages}")
+        sys.exit(0)
+
+    latest, comparisons = regression_report(runs, window, threshold)
+    if latest is None:
+        print(f"[{print_timestamp()}] [INFO] Nenhuma execução concluída registrada")
+        sys.exit(0)
+
+    print(f"📊 Execução de {latest['started_at']} (pregão {latest.get('data_pregao')}) "
+          f"vs. mediana de até {window} execuções anteriores (tolerância {threshold:.0%})")
+    print(f"{'MÉTRICA':<22} {'ÚLTIMA':>12} {'MEDIANA':>12} {'PIORA':>8}")
+    print("-" * 58)
+    for item in comparisons:
+        flag = " ⚠️ REGRESSÃO" if item["regression"] else ""
+        print(f"{item['metric']:<22} {_format_value(item['metric'], item['latest']):>12} "
+              f"{_format_value(item['metric'], item['median']):>12} {item['change']:>+8.0%}{flag}")
+    if not comparisons:
+        print(f"Histórico insuficiente: são necessárias ao menos {REGRESSION_MIN_RUNS} execuções anteriores")
+
+    regressions = [item for item in comparisons if item["regression"]]
+    if regressions:
+        print(f"\n[{print_timestamp()}] [WARN] ⚠️ {len(regressions)} regressão(ões): "
+              f"{', '.join(item['metric'] for item in regressions)}")
+    sys.exit(1 if regressions else 0)
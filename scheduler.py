@@ -0,0 +1,321 @@
+"""
+Agendador de estágios para pipelines de vários dias
+
+Cada dia passa pelos estágios download → unzip → upload → parse → load. Cada
+estágio tem seu próprio número de threads e uma fila limitada na entrada:
+enquanto o dia N carrega no PostgreSQL, o dia N+1 é processado e o dia N+2
+está sendo baixado, mantendo rede, CPU e banco ocupados ao mesmo tempo.
+
+- Filas limitadas: um estágio lento bloqueia os anteriores (os dias
+  processados em memória ficam limitados ao tamanho das filas)
+- Retry por estágio, com espera exponencial entre as tentativas
+- Isolamento de falhas: um dia que falha em qualquer estágio é registrado e
+  descartado, sem interromper os demais
+
+Uso (via main.py):
+    python main.py 250901-250930 [--workers=4] [--force]
+"""
+
+from datetime import datetime, timedelta
+from helpers import print_timestamp
+import queue
+import threading
+import time
+
+# Espera antes da primeira nova tentativa (dobra a cada tentativa)
+RETRY_BACKOFF_SECONDS = 2.0
+
+# Marca de fim de fluxo entre estágios
+_END = object()
+
+STATUS_DONE = "done"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED = "failed"
+
+class Stage:
+    """
+    Estágio do pipeline
+
+    func recebe o job (dict) e devolve o job atualizado para o próximo
+    estágio, ou None para encerrar o job sem erro (ex.: dia já carregado).
+    """
+
+    def __init__(self, name, func, concurrency=1, retries=0, queue_size=2):
+        self.name = name
+        self.func = func
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.queue_size = max(1, queue_size)
+
+class StageScheduler:
+    """Executa jobs por uma sequência de estágios com threads e filas limitadas"""
+
+    def __init__(self, stages, retry_backoff=RETRY_BACKOFF_SECONDS):
+        self.stages = stages
+        self.retry_backoff = retry_backoff
+        self.results = {}
+        self._results_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def run(self, jobs):
+        """
+        Executa os jobs (dicts com a chave 'key') e aguarda o fim de todos
+
+        Returns:
+            dict: key -> {'status', 'stage', 'error', 'timings'}
+        """
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        remaining = [stage.concurrency for stage in self.stages]
+        remaining_lock = threading.Lock()
+        threads = []
+
+        def worker(index):
+            stage = self.stages[index]
+            while True:
+                job = queues[index].get()
+                if job is _END:
+                    break
+                if self._stop.is_set():
+                    self._finish(job, STATUS_FAILED, stage.name, "interrompido")
+                    continue
+                job = self._run_stage(stage, job)
+                if job is None:
+                    continue
+                if index + 1 < len(self.stages):
+                    queues[index + 1].put(job)
+                else:
+                    self._finish(job, STATUS_DONE)
+
+            # O último worker do estágio propaga o fim para o próximo
+            with remaining_lock:
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].concurrency):
+                    queues[index + 1].put(_END)
+
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.concurrency):
+                thread = threading.Thread(target=worker, args=(index,), name=f"{stage.name}-{n + 1}", daemon=True)
+                thread.start()
+                threads.append(thread)
+
+        def feed():
+            for job in jobs:
+                job.setdefault("timings", {})
+                queues[0].put(job)
+            for _ in range(self.stages[0].concurrency):
+                queues[0].put(_END)
+
+        feeder = threading.Thread(target=feed, name="feeder", daemon=True)
+        feeder.start()
+        threads.append(feeder)
+
+        try:
+            for thread in threads:
+                # join com timeout mantém o Ctrl+C responsivo na thread principal
+                while thread.is_alive():
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            # Os jobs em andamento terminam o estágio atual; os demais são descartados
+            self._stop.set()
+            raise
+        return self.results
+
+    def _run_stage(self, stage, job):
+        """Executa o estágio com retry; em falha definitiva registra o job e retorna None"""
+        stage_start = time.time()
+        for attempt in range(stage.retries + 1):
+            try:
+                result = stage.func(job)
+                job["timings"][stage.name] = time.time() - stage_start
+                if result is None:
+                    self._finish(job, STATUS_SKIPPED, stage.name)
+                return result
+            except Exception as e:
+                if attempt >= stage.retries or self._stop.is_set():
+                    job["timings"][stage.name] = time.time() - stage_start
+                    print(f"[{print_timestamp()}] [ERROR] ❌ {job['key']}: estágio {stage.name} falhou "
+                          f"após {attempt + 1} tentativa(s): {e}")
+                    self._finish(job, STATUS_FAILED, stage.name, str(e))
+                    return None
+                wait = self.retry_backoff * (2 ** attempt)
+                print(f"[{print_timestamp()}] [WARN] ⚠️ {job['key']}: estágio {stage.name} falhou "
+                      f"({e}); nova tentativa em {wait:.0f}s ({attempt + 2}/{stage.retries + 1})")
+                time.sleep(wait)
+
+    def _finish(self, job, status, stage=None, error=None):
+        """Registra o resultado final do job"""
+        with self._results_lock:
+            self.results[job["key"]] = {
+                "status": status, "stage": stage, "error": error, "timings": dict(job.get("timings", {})),
+            }
+
+def trading_days(start_str, end_str):
+    """
+    Dias úteis (segunda a sexta) entre duas datas YYMMDD, inclusivas
+
+    Feriados não são conhecidos: o download desses dias falha e o dia é
+    reportado como falho sem afetar os demais.
+    """
+    start = datetime.strptime(start_str, "%y%m%d").date()
+    end = datetime.strptime(end_str, "%y%m%d").date()
+    days = []
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            days.append(day.strftime("%y%m%d"))
+        day += timedelta(days=1)
+    return days
+
+def build_b3_stages(db, load_mode="replace", workers=1, commit_mode="2pc", stage_concurrency=None, force=False):
+    """
+    Estágios do pipeline da B3 para o StageScheduler
+
+    Args:
+        db: DatabaseManager conectado (pool compartilhado entre as threads)
+        stage_concurrency: dict opcional nome do estágio -> threads
+    """
+    # Imports locais: o agendador genérico não depende do pipeline da B3
+    from extract import download_zip, unzip_spre, upload_xml, cleanup_temp_files
+    from transform_load import process_xml_parts, load_parsed, parts_load_settings, PARSER_VERSION
+    from azure_storage import get_source_validator
+    from extract import read_xml_parts
+    import load_ledger
+    import compact_schema
+
+    def download(job):
+        job["zip_path"] = download_zip(job["key"])
+        return job
+
+    def unzip(job):
+        job["xml_paths"] = unzip_spre(job["key"], job["zip_path"])
+        return job
+
+    def upload(job):
+        # Guarda as partes em memória para o parse, que não precisa baixá-las de volta do blob
+        if "xml_parts" not in job:
+            job["xml_parts"] = read_xml_parts(job["key"], job["xml_paths"])
+        job["file_name"] = upload_xml(job["key"], job["xml_paths"])
+        cleanup_temp_files(job["key"])
+        return job
+
+    def parse(job):
+        # Versão baixada (hash do ZIP, se a B3 não informou ETag/Last-Modified) já carregada: pula o dia
+        job["etag"] = get_source_validator(job["file_name"])
+        if not force and load_ledger.is_loaded(db, job["file_name"], job["etag"], PARSER_VERSION):
+            return None
+        xml_parts = job.pop("xml_parts")
+        job["part_count"] = len(xml_parts)
+        job["cotacoes"] = process_xml_parts(list(xml_parts), xml_parts)
+        if not job["cotacoes"]:
+            raise RuntimeError(f"Nenhuma cotação extraída de {job['file_name']}")
+        if compact_schema.COMPACT_STORAGE:
+            compact_schema.resolve_ticker_ids(db, job["cotacoes"])
+        return job
+
+    def load(job):
+        cotacoes = job.pop("cotacoes")
+        load_workers, load_commit_mode = parts_load_settings(job["part_count"], workers, commit_mode)
+        if not load_parsed(job["file_name"], cotacoes, job["etag"], load_mode, load_workers, load_commit_mode, db=db):
+            # Mantém os dados para a nova tentativa
+            job["cotacoes"] = cotacoes
+            raise RuntimeError(f"Falha na carga de {job['file_name']}")
+        return job
+
+    concurrency = {"download": 2, "unzip": 1, "upload": 2, "parse": 1, "load": 1}
+    concurrency.update(stage_concurrency or {})
+
+    # Dias processados ficam em memória até a carga: fila curta antes do load.
+    # 'append' não é idempotente, então a carga só é repetida no modo 'replace'.
+    return [
+        Stage("download", download, concurrency["download"], retries=2),
+        Stage("unzip", unzip, concurrency["unzip"], retries=0),
+        Stage("upload", upload, concurrency["upload"], retries=2),
+        Stage("parse", parse, concurrency["parse"], retries=1),
+        Stage("load", load, concurrency["load"], retries=1 if load_mode == "replace" else 0, queue_size=1),
+    ]
+
+def run_range(days, load_mode="replace", workers=1, commit_mode="2pc", force=False, stage_concurrency=None):
+    """
+    Executa o pipeline para vários dias com os estágios sobrepostos
+
+    Args:
+        days: Datas YYMMDD (ex.: trading_days('250901', '250930'))
+        force: Reprocessa dias já registrados no load_ledger
+
+    Returns:
+        dict: data -> resultado (ver StageScheduler.run)
+    """
+    from database import DatabaseManager
+    from transform_load import PARSER_VERSION
+    from extract import ensure_data_directory, cleanup_temp_files, probe_source_validator
+    import load_ledger
+
+    from health import check_services
+
+    range_start = time.time()
+    # Sondas rápidas (com cache): serviço fora do ar falha logo, sem esperar timeouts de conexão
+    down = [name for name, result in check_services().items() if not result["ok"]]
+    if down:
+        print(f"[{print_timestamp()}] [ERROR] ❌ Serviço(s) indisponível(is): {', '.join(down)}")
+        return {day: {"status": STATUS_FAILED, "stage": "health", "error": f"{', '.join(down)} indisponível",
+                      "timings": {}} for day in days}
+
+    db = DatabaseManager()
+    if not (db.connect() and db.create_tables()):
+        return {day: {"status": STATUS_FAILED, "stage": "connect", "error": "PostgreSQL indisponível", "timings": {}}
+                for day in days}
+
+    results = {}
+    pending = []
+    owned_elsewhere = 0
+    for day in days:
+        file_name = f"BVBG186_{day}.xml"
+        validator = None if force else probe_source_validator(day)
+        if validator and load_ledger.is_loaded(db, file_name, validator, PARSER_VERSION):
+            results[day] = {"status": STATUS_SKIPPED, "stage": None, "error": None, "timings": {}}
+        elif not db.try_lock_date(datetime.strptime(day, "%y%m%d").date()):
+            # Outra instância detém a data (advisory lock): não repete o trabalho
+            owned_elsewhere += 1
+            results[day] = {"status": STATUS_SKIPPED, "stage": None,
+                            "error": "em processamento por outra instância", "timings": {}}
+        else:
+            pending.append(day)
+
+    print(f"[{print_timestamp()}] [INFO] 🗓️ {len(days)} dia(s) útil(eis): {len(pending)} a processar, "
+          f"{len(days) - len(pending) - owned_elsewhere} já carregado(s), {owned_elsewhere} com outra instância")
+    try:
+        if pending:
+            ensure_data_directory()
+            scheduler = StageScheduler(build_b3_stages(db, load_mode, workers, commit_mode, stage_concurrency, force))
+            results.update(scheduler.run([{"key": day} for day in pending]))
+    finally:
+        for day in pending:
+            db.unlock_date(datetime.strptime(day, "%y%m%d").date())
+
+    for day in pending:
+        if results[day]["status"] == STATUS_FAILED:
+            cleanup_temp_files(day)
+
+    print_range_summary(results, time.time() - range_start)
+    from instrumentation import write_prometheus
+    write_prometheus()
+    return results
+
+def print_range_summary(results, total_time):
+    """Resumo por dia e tempo acumulado por estágio"""
+    stage_totals = {}
+    for result in results.values():
+        for stage, seconds in result["timings"].items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+
+    print(f"[{print_timestamp()}] [INFO] 📊 RESUMO DO INTERVALO ({total_time:.2f}s):")
+    for day in sorted(results):
+        result = results[day]
+        icon = {STATUS_DONE: "✅", STATUS_SKIPPED: "⏭️"}.get(result["status"], "❌")
+        detail = f" no estágio {result['stage']}: {result['error']}" if result["status"] == STATUS_FAILED else ""
+        print(f"[{print_timestamp()}] [INFO]   {icon} {day} {result['status']}{detail}")
+    if stage_totals:
+        busy = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in stage_totals.items())
+        print(f"[{print_timestamp()}] [INFO]   ⏱️ Tempo somado por estágio: {busy}")
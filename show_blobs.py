@@ -6,7 +6,6 @@ Exibe informações detalhadas sobre os arquivos armazenados
 no container de dados da B3.
 """
 
-from azure_storage import list_blobs
 from datetime import datetime
 
 def show_blob_storage():
@@ -18,8 +17,9 @@ def show_blob_storage():
     print("=" * 60)
 
     try:
+        # Import tardio: o SDK do Azure só é carregado quando o container é listado
         from azure.storage.blob import BlobServiceClient
-        from azure_storage import AZURE_BLOB_CONNECTION, CONTAINER
+        from config import AZURE_BLOB_CONNECTION, CONTAINER
 
         service = BlobServiceClient.from_connection_string(AZURE_BLOB_CONNECTION)
         container = service.get_container_client(CONTAINER)
@@ -43,8 +43,9 @@ def show_blob_storage():
             # Tenta extrair data do nome do arquivo
             try:
                 if "BVBG186_" in blob.name:
-                    date_part = blob.name.replace("BVBG186_", "").replace(".xml", "")
-                    if len(date_part) == 6:  # YYMMDD
+                    # BVBG186_250923.xml, BVBG186_250923_part01.xml, BVBG186_250923.manifest.json
+                    date_part = blob.name.replace("BVBG186_", "")[:6]
+                    if date_part.isdigit():  # YYMMDD
                         year = 2000 + int(date_part[:2])
                         month = int(date_part[2:4])
                         day = int(date_part[4:6])
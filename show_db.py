@@ -6,13 +6,17 @@ Fornece informações sobre o banco de dados e permite executar
 consultas básicas na tabela de cotações.
 """
 
-from database import DatabaseManager
-from sqlalchemy import text
+# database/sqlalchemy são importados dentro das funções: --help e a ajuda
+# da consulta interativa não pagam o custo de import
+import time
 
 def show_database_info():
     """
     Mostra informações gerais do banco de dados
     """
+    from database import DatabaseManager
+    from sqlalchemy import text
+
     print("=" * 60)
     print("🗄️  INFORMAÇÕES DO BANCO POSTGRESQL")
     print("=" * 60)
@@ -30,30 +34,31 @@ def show_database_info():
         print(f"🔗 URL de Conexão: {db.database_url}")
         print(f"📊 Status: Conectado com sucesso")
 
-        # Contar total de registros
-        total_records = session.execute(text("SELECT COUNT(*) FROM cotacoes")).scalar()
-        print(f"📈 Total de cotações: {total_records:,}")
+        # Totais vêm das tabelas de resumo mantidas pela carga (summary_stats.py),
+        # sem varrer cotacoes
+        totals = session.execute(text("""
+            SELECT COALESCE(SUM(registros), 0) AS total_records,
+                   MIN(datapregao) AS min_date,
+                   MAX(datapregao) AS max_date,
+                   MAX(carregado_em) AS last_load
+            FROM cotacoes_stats_dia
+        """)).fetchone()
+        print(f"📈 Total de cotações: {totals.total_records:,}")
 
-        # Contar ativos únicos
-        unique_assets = session.execute(text("SELECT COUNT(DISTINCT ativo) FROM cotacoes")).scalar()
+        unique_assets = session.execute(text("SELECT COUNT(*) FROM cotacoes_stats_ativo")).scalar()
         print(f"🏢 Ativos únicos: {unique_assets}")
 
-        # Data mais antiga e mais recente
-        date_range = session.execute(text("""
-            SELECT MIN(datapregao) as min_date, MAX(datapregao) as max_date
-            FROM cotacoes
-        """)).fetchone()
-
-        if date_range.min_date and date_range.max_date:
-            print(f"📅 Período: {date_range.min_date} até {date_range.max_date}")
+        if totals.min_date and totals.max_date:
+            print(f"📅 Período: {totals.min_date} até {totals.max_date}")
+        if totals.last_load:
+            print(f"🕒 Última carga: {totals.last_load:%Y-%m-%d %H:%M:%S}")
 
         # Top 5 ativos com mais registros
         print("\n📊 TOP 5 ATIVOS COM MAIS REGISTROS:")
         top_assets = session.execute(text("""
-            SELECT ativo, COUNT(*) as total
-            FROM cotacoes
-            GROUP BY ativo
-            ORDER BY total DESC
+            SELECT ativo, registros AS total
+            FROM cotacoes_stats_ativo
+            ORDER BY registros DESC
             LIMIT 5
         """)).fetchall()
 
@@ -75,6 +80,10 @@ def show_recent_data():
     print("📈 DADOS RECENTES (ÚLTIMOS 10 REGISTROS)")
     print("=" * 60)
 
+    from database import DatabaseManager
+    from compact_schema import QUOTES_TABLE
+    from sqlalchemy import text
+
     db = DatabaseManager()
     if not db.connect():
         return
@@ -82,12 +91,22 @@ def show_recent_data():
     try:
         session = db.get_session()
 
-        recent_data = session.execute(text("""
-            SELECT id, ativo, datapregao, abertura, fechamento, volume
-            FROM cotacoes
-            ORDER BY id DESC
-            LIMIT 10
-        """)).fetchall()
+        if QUOTES_TABLE == "cotacoes":
+            recent_sql = """
+                SELECT id, ativo, datapregao, abertura, fechamento, volume
+                FROM cotacoes
+                ORDER BY id DESC
+                LIMIT 10
+            """
+        else:
+            # A view do armazenamento compacto não tem id: mais recentes por data
+            recent_sql = f"""
+                SELECT NULL AS id, ativo, datapregao, abertura, fechamento, volume
+                FROM {QUOTES_TABLE}
+                ORDER BY datapregao DESC, ativo
+                LIMIT 10
+            """
+        recent_data = session.execute(text(recent_sql)).fetchall()
 
         print(f"{'ID':<8} {'ATIVO':<8} {'DATA':<12} {'ABERTURA':<10} {'FECHAMENTO':<12} {'VOLUME':<15}")
         print("-" * 75)
@@ -97,7 +116,7 @@ def show_recent_data():
             fechamento = f"{row.fechamento:.2f}" if row.fechamento else "N/A"
             volume = f"{row.volume:,.0f}" if row.volume else "N/A"
 
-            print(f"{row.id:<8} {row.ativo:<8} {row.datapregao} {abertura:<10} {fechamento:<12} {volume:<15}")
+            print(f"{row.id if row.id is not None else '-':<8} {row.ativo:<8} {row.datapregao} {abertura:<10} {fechamento:<12} {volume:<15}")
 
         session.close()
 
@@ -134,57 +153,150 @@ def show_connection_commands():
     print("   Database: cotacoes_b3")
     print("   User: postgres, Password: postgres")
 
+# Consulta interativa: linhas por página e timeout padrão por consulta
+QUERY_PAGE_SIZE = 20
+QUERY_TIMEOUT_SECONDS = 30
+
+# Comandos aceitos por DECLARE CURSOR (lidos por cursor no servidor, página a página)
+STREAMABLE_PREFIXES = ("select", "with", "values", "table")
+
+def print_query_help():
+    """Comandos especiais da consulta interativa"""
+    print("Comandos especiais:")
+    print("  \\timing          Liga/desliga a exibição do tempo de execução")
+    print("  \\explain         Liga/desliga EXPLAIN (ANALYZE, BUFFERS) em vez dos resultados")
+    print("  \\timeout N       statement_timeout por consulta, em segundos (0 = sem limite)")
+    print("  \\readonly        Liga/desliga transação somente leitura (protege contra DML/DDL acidental)")
+    print("  \\help            Mostra esta ajuda")
+    print("Com \\explain a consulta sempre roda em transação somente leitura (o ANALYZE a executa);")
+    print("sem \\readonly, comandos DML/DDL são executados e confirmados. Resultados são paginados")
+    print(f"({QUERY_PAGE_SIZE} linhas por vez, Enter para a próxima página, 'q' para parar).")
+
+def _run_query(db, query, timeout_seconds, explain, read_only=False):
+    """
+    Executa uma consulta em transação própria e com timeout
+
+    A transação é somente leitura com read_only=True ou com explain (o
+    EXPLAIN ANALYZE executa a consulta de verdade).
+
+    Linhas são lidas de um cursor no servidor apenas quando exibidas.
+
+    Returns:
+        tuple: (linhas exibidas, segundos até a primeira página, segundos totais)
+    """
+    from sqlalchemy import text
+
+    query_start = time.time()
+    with db.engine.connect() as conn:
+        with conn.begin():
+            if read_only or explain:
+                conn.execute(text("SET TRANSACTION READ ONLY"))
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_seconds * 1000)}"))
+
+            if explain:
+                plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {query}")).fetchall()
+                first_page_time = time.time() - query_start
+                for (line,) in plan:
+                    print(line)
+                return 0, first_page_time, time.time() - query_start
+
+            if query.lower().startswith(STREAMABLE_PREFIXES):
+                # yield_per = página: o servidor envia só as linhas exibidas
+                result = conn.execution_options(stream_results=True, yield_per=QUERY_PAGE_SIZE).execute(text(query))
+            else:
+                result = conn.execute(text(query))
+            if not result.returns_rows:
+                print("Consulta executada com sucesso")
+                return 0, time.time() - query_start, time.time() - query_start
+
+            shown = 0
+            first_page_time = None
+            header_printed = False
+            while True:
+                rows = result.fetchmany(QUERY_PAGE_SIZE)
+                if first_page_time is None:
+                    first_page_time = time.time() - query_start
+                if not rows:
+                    if shown == 0:
+                        print("Nenhum resultado encontrado")
+                    break
+
+                if not header_printed:
+                    print(" | ".join(result.keys()))
+                    print("-" * 50)
+                    header_printed = True
+                for row in rows:
+                    print(" | ".join(str(col) for col in row))
+                shown += len(rows)
+
+                if len(rows) < QUERY_PAGE_SIZE:
+                    break
+                answer = input(f"-- {shown} linhas exibidas; Enter para mais, 'q' para parar -- ").strip().lower()
+                if answer in ("q", "quit"):
+                    break
+            result.close()
+            return shown, first_page_time, time.time() - query_start
+
 def interactive_query():
     """
     Permite executar consultas interativas
+
+    Cada consulta usa uma conexão do pool só durante sua execução, com
+    statement_timeout próprio; \\timing e \\explain ajudam a diagnosticar consultas lentas.
     """
     print("\n" + "=" * 60)
     print("💻 CONSULTA INTERATIVA")
     print("=" * 60)
-    print("Digite uma consulta SQL (ou 'quit' para sair):")
+    print("Digite uma consulta SQL (ou 'quit' para sair, '\\help' para comandos):")
+
+    from database import DatabaseManager
 
     db = DatabaseManager()
     if not db.connect():
         return
 
-    session = db.get_session()
+    timing = False
+    explain = False
+    read_only = False
+    timeout_seconds = QUERY_TIMEOUT_SECONDS
 
     while True:
         try:
-            query = input("\nSQL> ").strip()
+            query = input("\nSQL> ").strip().rstrip(";").strip()
             if query.lower() in ['quit', 'exit', 'q']:
                 break
 
             if not query:
                 continue
 
-            result = session.execute(text(query))
-
-            if query.lower().startswith('select'):
-                rows = result.fetchall()
-                if rows:
-                    # Mostra header
-                    if hasattr(rows[0], '_fields'):
-                        print(" | ".join(rows[0]._fields))
-                        print("-" * 50)
-
-                    # Mostra dados
-                    for row in rows[:20]:  # Limita a 20 linhas
-                        print(" | ".join(str(col) for col in row))
-
-                    if len(rows) > 20:
-                        print(f"... e mais {len(rows) - 20} linhas")
+            if query.startswith("\\"):
+                command, _, argument = query[1:].partition(" ")
+                if command == "timing":
+                    timing = not timing
+                    print(f"Tempo de execução {'ligado' if timing else 'desligado'}")
+                elif command == "explain":
+                    explain = not explain
+                    print(f"EXPLAIN (ANALYZE, BUFFERS) {'ligado' if explain else 'desligado'}")
+                elif command == "readonly":
+                    read_only = not read_only
+                    print(f"Transação somente leitura {'ligada' if read_only else 'desligada'}")
+                elif command == "timeout" and argument.strip().replace(".", "", 1).isdigit():
+                    timeout_seconds = float(argument)
+                    print(f"statement_timeout: {timeout_seconds:g}s" if timeout_seconds else "statement_timeout: sem limite")
                 else:
-                    print("Nenhum resultado encontrado")
-            else:
-                print("Consulta executada com sucesso")
+                    print_query_help()
+                continue
+
+            shown, first_page_time, total_time = _run_query(db, query, timeout_seconds, explain, read_only)
+            if timing:
+                print(f"⏱️  Primeira página: {first_page_time * 1000:.1f}ms | Total: {total_time * 1000:.1f}ms"
+                      + (f" | {shown} linhas lidas" if shown else ""))
 
         except KeyboardInterrupt:
             break
         except Exception as e:
             print(f"❌ Erro na consulta: {e}")
 
-    session.close()
     print("\n👋 Saindo da consulta interativa")
 
 def main():
@@ -0,0 +1,121 @@
+"""
+Tabelas de resumo mantidas pela carga
+
+- cotacoes_stats_dia: registros por data de pregão e horário da última carga
+- cotacoes_stats_ativo: registros por ativo e primeira/última data
+
+As funções recebem um cursor DB-API e rodam na mesma transação da carga,
+de modo que os resumos nunca divergem dos dados confirmados. show_db.py
+lê apenas estas tabelas (alguns milhares de linhas), sem varrer cotacoes.
+"""
+
+from collections import Counter
+from compact_schema import QUOTES_TABLE
+
+def fetch_pairs(cursor, dates):
+    """Pares (ativo, data) já gravados em QUOTES_TABLE para as datas informadas"""
+    cursor.execute(
+        f"SELECT ativo, datapregao FROM {QUOTES_TABLE} WHERE datapregao = ANY(%s)",
+        (list(dates),)
+    )
+    return set(cursor.fetchall())
+
+def apply_load_delta(cursor, dates, old_pairs, new_pairs):
+    """
+    Atualiza os resumos após substituir as datas informadas
+
+    Args:
+        cursor: Cursor na transação da carga
+        dates: Datas substituídas pela carga
+        old_pairs: Pares (ativo, data) existentes antes da carga nessas datas
+        new_pairs: Pares (ativo, data) existentes após a carga nessas datas
+    """
+    _write_day_stats(cursor, dates, new_pairs)
+
+    added = new_pairs - old_pairs
+    removed = old_pairs - new_pairs
+    if not added and not removed:
+        return
+
+    deltas = Counter()
+    first_dates = {}
+    last_dates = {}
+    for ativo, day in added:
+        deltas[ativo] += 1
+        first_dates[ativo] = min(day, first_dates.get(ativo, day))
+        last_dates[ativo] = max(day, last_dates.get(ativo, day))
+    for ativo, _ in removed:
+        deltas[ativo] -= 1
+
+    tickers = sorted(deltas)
+    cursor.execute("""
+        INSERT INTO cotacoes_stats_ativo AS s (ativo, registros, primeira_data, ultima_data)
+        SELECT * FROM unnest(%s::varchar[], %s::integer[], %s::date[], %s::date[])
+        ON CONFLICT (ativo) DO UPDATE
+        SET registros = s.registros + EXCLUDED.registros,
+            primeira_data = LEAST(s.primeira_data, EXCLUDED.primeira_data),
+            ultima_data = GREATEST(s.ultima_data, EXCLUDED.ultima_data)
+    """, (
+        tickers,
+        [deltas[t] for t in tickers],
+        [first_dates.get(t) for t in tickers],
+        [last_dates.get(t) for t in tickers],
+    ))
+
+    # Remoções podem mover primeira/última data: recalcula pela chave única
+    removed_tickers = sorted({ativo for ativo, _ in removed})
+    if removed_tickers:
+        _refresh_ticker_bounds(cursor, removed_tickers)
+
+    cursor.execute("DELETE FROM cotacoes_stats_ativo WHERE registros <= 0")
+
+def refresh_exact(cursor, dates, tickers):
+    """
+    Recalcula os resumos das datas e ativos informados a partir de QUOTES_TABLE
+
+    Usado quando não há um retrato confiável do estado anterior (ex.: carga
+    paralela com commit independente retomada após falha).
+    """
+    cursor.execute(
+        f"SELECT ativo, datapregao FROM {QUOTES_TABLE} WHERE datapregao = ANY(%s)",
+        (list(dates),)
+    )
+    _write_day_stats(cursor, dates, set(cursor.fetchall()))
+
+    tickers = sorted(tickers)
+    if not tickers:
+        return
+    cursor.execute(f"""
+        INSERT INTO cotacoes_stats_ativo AS s (ativo, registros, primeira_data, ultima_data)
+        SELECT t.ativo, COUNT(c.ativo), MIN(c.datapregao), MAX(c.datapregao)
+        FROM unnest(%s::varchar[]) AS t(ativo)
+        LEFT JOIN {QUOTES_TABLE} c ON c.ativo = t.ativo
+        GROUP BY t.ativo
+        ON CONFLICT (ativo) DO UPDATE
+        SET registros = EXCLUDED.registros,
+            primeira_data = EXCLUDED.primeira_data,
+            ultima_data = EXCLUDED.ultima_data
+    """, (tickers,))
+    cursor.execute("DELETE FROM cotacoes_stats_ativo WHERE registros <= 0")
+
+def _write_day_stats(cursor, dates, pairs):
+    """Grava a contagem absoluta de cada data e marca o horário da carga"""
+    per_day = Counter(day for _, day in pairs)
+    dates = sorted(dates)
+    cursor.execute("""
+        INSERT INTO cotacoes_stats_dia AS s (datapregao, registros, carregado_em)
+        SELECT d, n, now() FROM unnest(%s::date[], %s::integer[]) AS t(d, n)
+        ON CONFLICT (datapregao) DO UPDATE
+        SET registros = EXCLUDED.registros,
+            carregado_em = EXCLUDED.carregado_em
+    """, (dates, [per_day.get(d, 0) for d in dates]))
+    cursor.execute("DELETE FROM cotacoes_stats_dia WHERE registros <= 0")
+
+def _refresh_ticker_bounds(cursor, tickers):
+    """Recalcula primeira/última data dos ativos (busca indexada por ativo)"""
+    cursor.execute(f"""
+        UPDATE cotacoes_stats_ativo s
+        SET primeira_data = (SELECT MIN(c.datapregao) FROM {QUOTES_TABLE} c WHERE c.ativo = s.ativo),
+            ultima_data = (SELECT MAX(c.datapregao) FROM {QUOTES_TABLE} c WHERE c.ativo = s.ativo)
+        WHERE s.ativo = ANY(%s)
+    """, (tickers,))
@@ -15,11 +15,7 @@ Funcionalidades testadas:
 
 import sys
 import time
-from datetime import datetime
-
-def print_timestamp():
-    """Retorna timestamp formatado para logs"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+from helpers import print_timestamp
 
 def print_section_header(title):
     """Imprime cabeçalho de seção formatado"""
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Testes do cliente compartilhado do Blob Storage (sem rede: o cliente só
+conecta na primeira operação)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import threading
+import azure_storage
+
+def test_blob_service_is_created_once_and_reused(monkeypatch):
+    """Duas chamadas devolvem o mesmo cliente, sem travar no lock"""
+    monkeypatch.setattr(azure_storage, "_blob_service", None)
+    result = []
+    worker = threading.Thread(target=lambda: result.extend([azure_storage.get_blob_service(),
+                                                            azure_storage.get_blob_service()]))
+    worker.daemon = True
+    worker.start()
+    worker.join(timeout=5)
+
+    assert not worker.is_alive(), "get_blob_service travou"
+    assert result[0] is result[1]
+    assert result[0].account_name == "devstoreaccount1"
+
+def test_part_blob_names():
+    """Um único XML mantém o nome do dia; várias partes recebem sufixo estável"""
+    assert azure_storage.part_blob_names("BVBG186_250923.xml", 1) == ["BVBG186_250923.xml"]
+    assert azure_storage.part_blob_names("BVBG186_250923.xml", 2) == [
+        "BVBG186_250923_part01.xml", "BVBG186_250923_part02.xml"]
+
+def test_source_validator_comes_from_manifest(monkeypatch):
+    """A versão registrada no ledger é a da B3 gravada no manifesto, não o ETag do blob"""
+    monkeypatch.setattr(azure_storage, "get_manifest", lambda name: {"source_validator": "b3-etag:\"abc\""})
+    assert azure_storage.get_source_validator("BVBG186_250923.xml") == "b3-etag:\"abc\""
+    monkeypatch.setattr(azure_storage, "get_manifest", lambda name: None)
+    assert azure_storage.get_source_validator("BVBG186_250923.xml") is None
+
+def test_extract_source_validator_precedence():
+    """ETag da B3, depois Last-Modified, depois hash do conteúdo baixado"""
+    from extract import source_validator
+    assert source_validator("\"abc\"", "Tue, 23 Sep 2025") == "b3-etag:\"abc\""
+    assert source_validator(None, "Tue, 23 Sep 2025") == "b3-last-modified:Tue, 23 Sep 2025"
+    assert source_validator(None, None, b"zip") == source_validator(content=b"zip")
+    assert source_validator(None, None, b"zip").startswith("sha256:")
+    assert source_validator() is None
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Testes do cache LRU/TTL das consultas de leitura
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import QueryCache
+from datetime import date
+import time
+
+def test_hits_misses_and_lru_eviction():
+    """Acertos/erros são contados e a entrada menos usada sai primeiro"""
+    cache = QueryCache(max_entries=2, max_rows=100, ttl_seconds=60)
+    cache.put("a", [1])
+    cache.put("b", [2])
+    assert cache.get("a") == (True, [1])   # "a" passa a ser a mais recente
+    cache.put("c", [3])                     # excede max_entries: sai "b"
+
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, [3])
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["evictions"] == 1
+
+def test_row_limit_and_ttl():
+    """O total de linhas limita o cache e entradas expiradas não são servidas"""
+    cache = QueryCache(max_entries=10, max_rows=5, ttl_seconds=0.05)
+    cache.put("grande", list(range(6)))     # maior que max_rows: não é guardado
+    assert cache.get("grande") == (False, None)
+
+    cache.put("x", [1, 2, 3])
+    cache.put("y", [4, 5, 6])               # 6 linhas: sai "x"
+    assert cache.stats()["rows"] == 3
+
+    time.sleep(0.1)
+    assert cache.get("y") == (False, None)
+
+def test_invalidate_dates_only_overlapping_ranges():
+    """Só entradas cujo intervalo inclui a data carregada são descartadas"""
+    cache = QueryCache()
+    cache.put("setembro", [1], date(2025, 9, 1), date(2025, 9, 30))
+    cache.put("outubro", [2], date(2025, 10, 1), date(2025, 10, 31))
+    cache.put("ultimo", [3])                # intervalo aberto
+
+    assert cache.invalidate_dates([date(2025, 10, 6)]) == 2
+    assert cache.get("setembro") == (True, [1])
+    assert cache.get("outubro") == (False, None)
+    assert cache.get("ultimo") == (False, None)
+
+def test_get_or_load_calls_loader_once():
+    """Depois do primeiro carregamento o valor vem da memória"""
+    cache = QueryCache()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return [42]
+
+    assert cache.get_or_load("k", loader) == [42]
+    assert cache.get_or_load("k", loader) == [42]
+    assert len(calls) == 1
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Testes do armazenamento compacto (conversão para centavos e cache de tickers)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date
+from decimal import Decimal
+import compact_schema
+
+class FakeCursor:
+    def copy_expert(self, sql, buffer):
+        self.sql = sql
+        self.rows = buffer.read().splitlines()
+
+def test_copy_compact_writes_cents_ordered_by_key():
+    """Preços e volume viram centavos inteiros; ausentes viram NULL (campo vazio)"""
+    cursor = FakeCursor()
+    compact_schema._copy_compact(cursor, [
+        {'ticker_id': 2, 'data_pregao': date(2025, 9, 23), 'abertura': Decimal("31.45"),
+         'fechamento': None, 'volume': Decimal("1000.5")},
+        {'ticker_id': 1, 'data_pregao': date(2025, 9, 23), 'abertura': Decimal("10"),
+         'fechamento': Decimal("10.01"), 'volume': None},
+    ])
+    assert "cotacoes_compact_staging" in cursor.sql
+    assert cursor.rows == ["1,2025-09-23,1000,1001,", "2,2025-09-23,3145,,100050"]
+
+def test_resolve_ticker_ids_uses_process_cache(monkeypatch):
+    """Símbolos já conhecidos não vão ao banco"""
+    monkeypatch.setattr(compact_schema, "_ticker_ids", {"PETR4": 7, "VALE3": 9})
+
+    class NoDatabase:
+        engine = None
+        def connect(self):
+            raise AssertionError("não deveria acessar o banco")
+
+    data = [{'ativo': "PETR4"}, {'ativo': "VALE3"}, {'ativo': "PETR4"}]
+    assert compact_schema.resolve_ticker_ids(NoDatabase(), data) == 0
+    assert [c['ticker_id'] for c in data] == [7, 9, 7]
+
+def test_backfill_refuses_empty_source(monkeypatch):
+    """Com cotacoes vazia o backfill não toca cotacoes_compact"""
+    class Connection:
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def exec_driver_sql(self, sql):
+            assert "FROM cotacoes " in sql
+            return []
+
+    class Engine:
+        def connect(self):
+            return Connection()
+
+    class Database:
+        engine = Engine()
+
+    monkeypatch.setattr(compact_schema, "sync_dates", lambda db, dates: (_ for _ in ()).throw(
+        AssertionError("não deveria copiar datas")))
+    assert compact_schema.backfill(Database()) is None
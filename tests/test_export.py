@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Testes da exportação em massa (consulta do COPY, divisão por partição e arquivos gerados)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date
+from types import SimpleNamespace
+import export
+
+class FakeDatabase:
+    """DatabaseManager sem banco: partições fixas de setembro e outubro de 2025"""
+    def __init__(self):
+        self.partition_tables = []
+
+    def connect(self):
+        return True
+
+    def list_partitions(self, table="cotacoes"):
+        self.partition_tables.append(table)
+        prefix = "cotacoes_compact" if table == "cotacoes_compact" else "cotacoes"
+        return [
+            (f"{prefix}_2025_09", date(2025, 9, 1), date(2025, 10, 1)),
+            (f"{prefix}_2025_10", date(2025, 10, 1), date(2025, 11, 1)),
+        ]
+
+def _stub_export_one(calls):
+    def export_one(db, table, tickers, start, end, path, export_format):
+        calls.append((table, start, end, os.path.basename(path)))
+        with open(path, "wb") as f:
+            f.write(b"x" * 10)
+        return 10
+    return export_one
+
+def test_export_range_returns_written_paths(tmp_path, monkeypatch):
+    """Um arquivo por partição; o retorno lista os caminhos gravados"""
+    calls = []
+    monkeypatch.setattr(export, "export_one", _stub_export_one(calls))
+    monkeypatch.setattr(export, "QUOTES_TABLE", "cotacoes")
+
+    paths = export.export_range(date(2025, 9, 15), date(2025, 10, 10), workers=2,
+                                output=str(tmp_path), db=FakeDatabase())
+
+    assert paths == [str(tmp_path / "cotacoes_2025_09.csv.gz"), str(tmp_path / "cotacoes_2025_10.csv.gz")]
+    assert all(os.path.exists(path) for path in paths)
+    assert sorted(call[0] for call in calls) == ["cotacoes_2025_09", "cotacoes_2025_10"]
+
+class FakeCursor:
+    """Cursor psycopg2: mogrify interpola os parâmetros e copy_expert grava um CSV fixo"""
+    def __init__(self):
+        self.executed = []
+
+    def mogrify(self, sql, params):
+        self.params = params
+        return (sql % tuple(repr(p) for p in params)).encode()
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def copy_expert(self, sql, out):
+        self.copy_sql = sql
+        out.write(b"ativo,datapregao,abertura,fechamento,volume\nPETR4,2025-09-23,31.45,31.90,1000.00\n")
+
+def test_build_select_filters_range_and_tickers():
+    """Intervalo sempre filtrado; ativos só quando informados"""
+    cursor = FakeCursor()
+    sql = export.build_select(cursor, "cotacoes_2025_09", ["PETR4"], date(2025, 9, 1), date(2025, 9, 30))
+    assert sql.startswith("SELECT ativo, datapregao, abertura, fechamento, volume FROM cotacoes_2025_09 WHERE ")
+    assert "datapregao BETWEEN" in sql and "ativo = ANY(" in sql
+    assert cursor.params == [date(2025, 9, 1), date(2025, 9, 30), ["PETR4"]]
+
+    sql = export.build_select(FakeCursor(), "cotacoes", None, date(2025, 9, 1), date(2025, 9, 30))
+    assert "ativo = ANY" not in sql
+
+def test_export_one_copies_to_gzip(tmp_path):
+    """COPY ... TO STDOUT vai direto para o .csv.gz e a transação é confirmada"""
+    import gzip
+    cursor = FakeCursor()
+    committed = []
+
+    class RawConnection:
+        def cursor(self):
+            return cursor
+        def commit(self):
+            committed.append(True)
+        def close(self):
+            pass
+
+    db = SimpleNamespace(engine=SimpleNamespace(raw_connection=RawConnection))
+    path = tmp_path / "out.csv.gz"
+    size = export.export_one(db, "cotacoes", None, date(2025, 9, 1), date(2025, 9, 30), str(path), "csv")
+
+    assert size == os.path.getsize(path) and committed
+    assert cursor.copy_sql.startswith("COPY (SELECT ") and "FORMAT csv, HEADER true" in cursor.copy_sql
+    assert cursor.executed == ["SET LOCAL statement_timeout = 0"]
+    assert gzip.open(path).read().splitlines()[1] == b"PETR4,2025-09-23,31.45,31.90,1000.00"
+
+def test_compact_jobs_read_view_clipped_to_partition(tmp_path, monkeypatch):
+    """Com armazenamento compacto cada partição é lida pela view, no intervalo do mês"""
+    calls = []
+    monkeypatch.setattr(export, "export_one", _stub_export_one(calls))
+    monkeypatch.setattr(export, "QUOTES_TABLE", "cotacoes_compat")
+    db = FakeDatabase()
+
+    export.export_range(date(2025, 9, 15), date(2025, 10, 10), workers=4, output=str(tmp_path), db=db)
+
+    assert db.partition_tables == ["cotacoes_compact"]
+    assert sorted(calls) == [
+        ("cotacoes_compat", date(2025, 9, 15), date(2025, 9, 30), "cotacoes_compact_2025_09.csv.gz"),
+        ("cotacoes_compat", date(2025, 10, 1), date(2025, 10, 10), "cotacoes_compact_2025_10.csv.gz"),
+    ]
+
+def test_single_worker_writes_one_file(tmp_path, monkeypatch):
+    """workers=1 gera um único arquivo com o intervalo completo"""
+    calls = []
+    monkeypatch.setattr(export, "export_one", _stub_export_one(calls))
+    monkeypatch.setattr(export, "QUOTES_TABLE", "cotacoes")
+    path = str(tmp_path / "tudo.csv.gz")
+
+    assert export.export_range(date(2025, 9, 1), date(2025, 10, 31), output=path, db=FakeDatabase()) == [path]
+    assert calls == [("cotacoes", date(2025, 9, 1), date(2025, 10, 31), "tudo.csv.gz")]
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Testes das sondas de saúde (servidor TCP local, sem PostgreSQL nem Azurite)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from health import probe_postgres, _timed
+import socket
+import threading
+import time
+
+def _fake_postgres(reply):
+    """Servidor que responde ao SSLRequest com reply; retorna a porta"""
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def serve():
+        conn, _ = server.accept()
+        conn.recv(8)
+        conn.sendall(reply)
+        conn.close()
+        server.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return server.getsockname()[1]
+
+def test_postgres_probe_accepts_ssl_reply():
+    """'N' (sem SSL) é uma resposta válida do protocolo"""
+    ok, latency, detail = _timed(probe_postgres, "127.0.0.1", _fake_postgres(b"N"), 0.5)
+    assert ok and latency < 0.5
+
+def test_postgres_probe_rejects_other_protocols():
+    """Um serviço que responde outra coisa na porta não passa na verificação"""
+    ok, _, detail = _timed(probe_postgres, "127.0.0.1", _fake_postgres(b"H"), 0.5)
+    assert not ok and "inesperada" in detail
+
+def test_closed_port_fails_fast():
+    """Porta fechada falha dentro do timeout"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    start = time.time()
+    ok, _, _ = _timed(probe_postgres, "127.0.0.1", port, 0.5)
+    assert not ok and time.time() - start < 1.0
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Orçamento de tempo de import dos pontos de entrada (python -X importtime)
+
+main.py, show_db.py, show_blobs.py e health.py são chamados com frequência
+por cron e sondas: não devem carregar sqlalchemy, o SDK do Azure, requests
+ou tqdm só para exibir ajuda ou verificar serviços.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ("main", "show_db", "show_blobs", "health")
+HEAVY_MODULES = ("sqlalchemy", "azure", "requests", "tqdm", "psycopg2", "numpy")
+
+# Tempo cumulativo máximo de import de cada ponto de entrada (microssegundos)
+IMPORT_BUDGET_US = 150_000
+
+def _importtime(module):
+    """Executa 'import module' com -X importtime e devolve {módulo: tempo cumulativo em µs}"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True,
+    )
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time: self [us] | cumulative | nome (indentado)"
+        _, cumulative, name = line.split("|")
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+def test_entry_points_skip_heavy_dependencies():
+    """Nenhum ponto de entrada importa dependências pesadas no topo do módulo"""
+    for module in ENTRY_POINTS:
+        loaded = _importtime(module)
+        heavy = sorted({name.split(".")[0] for name in loaded if name.split(".")[0] in HEAVY_MODULES})
+        assert not heavy, f"{module} importa {', '.join(heavy)} no carregamento"
+
+def test_entry_points_within_budget():
+    """Import de cada ponto de entrada dentro de IMPORT_BUDGET_US"""
+    for module in ENTRY_POINTS:
+        cumulative = _importtime(module)[module]
+        assert cumulative < IMPORT_BUDGET_US, f"{module}: {cumulative / 1000:.0f}ms de import"
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Testes da instrumentação (spans, contadores e exportação Prometheus/JSONL)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import pytest
+import instrumentation
+from instrumentation import span, add, render_prometheus
+
+@pytest.fixture(autouse=True)
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(instrumentation, "TRACE_FILE", str(path))
+    instrumentation.reset()
+    yield path
+    instrumentation.reset()
+
+def test_nested_spans_share_trace_and_write_jsonl(trace_file):
+    """Spans internos ficam aninhados no externo e cada um vira uma linha do trace"""
+    with span("pipeline", date="250923") as root:
+        with span("parse") as parse:
+            add("rows", 10)
+            add("rows", 5)
+
+    assert root.find("parse") is parse
+    assert parse.counts == {"rows": 15}
+
+    records = [json.loads(line) for line in trace_file.read_text().splitlines()]
+    assert [r["name"] for r in records] == ["parse", "pipeline"]
+    assert records[0]["parent_id"] == records[1]["span_id"]
+    assert {r["trace_id"] for r in records} == {root.trace_id}
+    assert records[1]["attrs"] == {"date": "250923"}
+
+def test_failed_span_is_recorded_and_reraised(trace_file):
+    """Exceções marcam o span com erro sem serem engolidas"""
+    with pytest.raises(RuntimeError):
+        with span("download"):
+            raise RuntimeError("sem arquivo")
+
+    record = json.loads(trace_file.read_text())
+    assert record["status"] == "error" and record["error"] == "sem arquivo"
+    assert 'cotacoes_b3_stage_runs_total{stage="download",status="error"} 1' in render_prometheus()
+
+def test_prometheus_text_format():
+    """Contadores por etapa, histograma cumulativo e vazão da etapa"""
+    with span("insert"):
+        add("rows", 1000)
+
+    text = render_prometheus()
+    assert "# TYPE cotacoes_b3_rows_total counter" in text
+    assert 'cotacoes_b3_rows_total{stage="insert"} 1000' in text
+    assert "# TYPE cotacoes_b3_stage_seconds histogram" in text
+    assert 'cotacoes_b3_stage_seconds_bucket{stage="insert",le="+Inf"} 1' in text
+    assert 'cotacoes_b3_stage_seconds_count{stage="insert"} 1' in text
+    assert 'cotacoes_b3_stage_throughput{stage="insert",unit="rows"}' in text
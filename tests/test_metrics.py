@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Testes do cálculo vetorizado das métricas derivadas
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import compute_metrics, VOLATILITY_WINDOW
+import numpy as np
+
+def test_returns_and_moving_averages():
+    """Retorno sobre o pregão anterior e médias só com janela completa"""
+    closes = np.arange(1, 31, dtype=np.float64)
+    result = compute_metrics(closes)
+
+    assert np.isnan(result["retorno"][0])
+    assert result["retorno"][1] == 1.0
+    assert np.isnan(result["media_movel_5"][3])
+    assert result["media_movel_5"][4] == 3.0
+    assert result["media_movel_20"][-1] == np.mean(closes[-20:])
+
+def test_volatility_matches_sample_std():
+    """Volatilidade é o desvio padrão amostral dos últimos retornos"""
+    closes = np.cumprod(np.full(40, 1.01)) * 10
+    closes[-1] *= 1.05
+    result = compute_metrics(closes)
+
+    returns = closes[1:] / closes[:-1] - 1
+    expected = np.std(returns[-VOLATILITY_WINDOW:], ddof=1)
+    assert np.isclose(result[f"volatilidade_{VOLATILITY_WINDOW}"][-1], expected)
+
+def test_missing_close_does_not_leak_past_window():
+    """Um fechamento ausente só afeta as janelas que o contêm"""
+    closes = np.arange(1, 31, dtype=np.float64)
+    closes[10] = np.nan
+    result = compute_metrics(closes)
+
+    assert np.isnan(result["retorno"][10]) and np.isnan(result["retorno"][11])
+    assert np.isnan(result["media_movel_5"][14])
+    assert result["media_movel_5"][15] == np.mean(closes[11:16])
+
+def test_load_path_does_not_import_numpy():
+    """transform_load importa metrics sem carregar NumPy (só o cálculo o importa)"""
+    import subprocess
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    completed = subprocess.run(
+        [sys.executable, "-c", "import sys, transform_load; print('numpy' in sys.modules)"],
+        cwd=project_dir, capture_output=True, text=True, check=True,
+    )
+    assert completed.stdout.strip() == "False"
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Testes da recuperação de transações 2PC deixadas por cargas interrompidas
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import parallel_load
+
+def _xid(gtrid, age_seconds, database="cotacoes_b3"):
+    prepared = datetime.now(timezone.utc) - timedelta(seconds=age_seconds)
+    return SimpleNamespace(gtrid=gtrid, prepared=prepared, database=database)
+
+class FakeConnection:
+    """Conexão psycopg2 com pg_prepared_xacts e load_shard_ledger em memória"""
+    def __init__(self, xids, decided):
+        self.xids = xids
+        self.decided = decided
+        self.info = SimpleNamespace(dbname="cotacoes_b3")
+        self.actions = []
+
+    def rollback(self):
+        pass
+
+    def tpc_recover(self):
+        return list(self.xids)
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def execute(self, sql, params):
+                self.rows = [(load_id,) for load_id in params[0] if load_id in connection.decided]
+
+            def fetchall(self):
+                return self.rows
+        return Cursor()
+
+    def tpc_commit(self, xid):
+        self.actions.append(("commit", xid.gtrid))
+
+    def tpc_rollback(self, xid):
+        self.actions.append(("rollback", xid.gtrid))
+
+class FakeDatabase:
+    def __init__(self, connection):
+        self.connection = connection
+        self.engine = self
+
+    def raw_connection(self):
+        return SimpleNamespace(connection=self.connection, close=lambda: None)
+
+def test_recover_commits_decided_and_rolls_back_stale_loads():
+    """Com registro de decisão confirma; sem ele desfaz só as antigas"""
+    connection = FakeConnection([
+        _xid("cotacoes-aaa-0", 5),
+        _xid("cotacoes-aaa-final", 5),
+        _xid("cotacoes-bbb-0", 3600),
+        _xid("cotacoes-ccc-0", 5),
+        _xid("cotacoes-ddd-0", 3600, database="outro"),
+        _xid("externa-1", 3600),
+    ], decided={"2pc-aaa"})
+
+    pending = parallel_load.recover_prepared(FakeDatabase(connection), max_age_seconds=600)
+
+    assert connection.actions == [
+        ("commit", "cotacoes-aaa-final"),
+        ("commit", "cotacoes-aaa-0"),
+        ("rollback", "cotacoes-bbb-0"),
+    ]
+    assert pending == ["cotacoes-ccc-0"]
+
+def test_recover_own_load_forces_decision():
+    """Na fase 2 do próprio processo a decisão é forçada e só a carga informada é tocada"""
+    connection = FakeConnection([_xid("cotacoes-aaa-1", 1), _xid("cotacoes-bbb-1", 1)], decided=set())
+    assert parallel_load.recover_prepared(FakeDatabase(connection), load_token="aaa", commit=True) == []
+    assert connection.actions == [("commit", "cotacoes-aaa-1")]
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Testes do histórico de execuções e da detecção de regressões (sem banco)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation
+from instrumentation import span
+from run_history import build_record, compare_runs, regression_report, STATUS_OK, STATUS_FAILED
+
+def _run(parse_seconds, insert_rows_per_s, status=STATUS_OK):
+    return {
+        "status": status,
+        "total_seconds": parse_seconds + 10,
+        "peak_rss_bytes": 500 * 1024 * 1024,
+        "stages": {
+            "parse": {"seconds": parse_seconds, "rows": 1000},
+            "insert": {"seconds": 5.0, "rows": 1000, "rows_per_s": insert_rows_per_s},
+        },
+    }
+
+def test_build_record_sums_stage_spans(monkeypatch):
+    """Etapas repetidas são somadas; spans fora de STAGES não viram etapas"""
+    monkeypatch.setattr(instrumentation, "TRACE_FILE", "")
+    with span("pipeline", date="250923", mode="replace") as root:
+        with span("extract"):
+            with span("download") as download:
+                download.add("bytes", 2048)
+        with span("parse") as parse:
+            parse.add("rows", 100)
+        with span("parse") as parse:
+            parse.add("rows", 50)
+
+    record = build_record(root, ok=True)
+    assert record["data_pregao"] == "250923" and record["status"] == STATUS_OK
+    assert set(record["stages"]) == {"download", "parse"}
+    assert record["stages"]["parse"]["rows"] == 150
+    assert record["stages"]["download"]["bytes"] == 2048
+
+def test_build_record_skips_runs_without_stages(monkeypatch):
+    """Execuções puladas (ledger ou lock) não entram no histórico"""
+    monkeypatch.setattr(instrumentation, "TRACE_FILE", "")
+    with span("pipeline") as root:
+        pass
+    assert build_record(root, ok=True) is None
+
+def test_regression_against_rolling_median():
+    """Piora acima da tolerância em duração ou vazão é sinalizada"""
+    runs = [_run(10.0, 2000), _run(11.0, 2100), _run(9.0, 1900), _run(40.0, 100, STATUS_FAILED),
+            _run(14.0, 1000)]
+    latest, comparisons = regression_report(runs, window=10, threshold=0.25)
+
+    assert latest is runs[-1]
+    flagged = {item["metric"] for item in comparisons if item["regression"]}
+    assert flagged == {"parse.seconds", "insert.rows_per_s"}
+
+def test_insufficient_history_is_not_compared():
+    """Sem REGRESSION_MIN_RUNS execuções anteriores, nada é comparado"""
+    assert compare_runs(_run(50.0, 10), [_run(10.0, 2000)]) == []
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Testes do agendador de estágios (sem rede nem banco)
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import Stage, StageScheduler, trading_days, STATUS_DONE, STATUS_FAILED, STATUS_SKIPPED
+import threading
+import time
+
+def test_stages_overlap_across_jobs():
+    """Com filas entre estágios, um job pode estar no 2º estágio enquanto outro está no 1º"""
+    active = set()
+    overlap = []
+    lock = threading.Lock()
+
+    def slow(name):
+        def func(job):
+            with lock:
+                active.add(name)
+                if len(active) > 1:
+                    overlap.append(tuple(sorted(active)))
+            time.sleep(0.05)
+            with lock:
+                active.discard(name)
+            return job
+        return func
+
+    scheduler = StageScheduler([Stage("a", slow("a")), Stage("b", slow("b"))])
+    results = scheduler.run([{"key": k} for k in "xyz"])
+
+    assert all(r["status"] == STATUS_DONE for r in results.values())
+    assert overlap
+
+def test_retry_and_failure_isolation():
+    """Falhas transitórias são repetidas; uma falha definitiva não afeta os outros jobs"""
+    attempts = {}
+
+    def flaky(job):
+        attempts[job["key"]] = attempts.get(job["key"], 0) + 1
+        if job["key"] == "ruim" or (job["key"] == "instavel" and attempts["instavel"] == 1):
+            raise RuntimeError("falhou")
+        return job
+
+    def skip_known(job):
+        return None if job["key"] == "pular" else job
+
+    scheduler = StageScheduler([Stage("fetch", flaky, concurrency=2, retries=1), Stage("load", skip_known)],
+                               retry_backoff=0)
+    results = scheduler.run([{"key": k} for k in ("ok", "instavel", "ruim", "pular")])
+
+    assert results["ok"]["status"] == STATUS_DONE
+    assert results["instavel"]["status"] == STATUS_DONE and attempts["instavel"] == 2
+    assert results["ruim"]["status"] == STATUS_FAILED and results["ruim"]["stage"] == "fetch"
+    assert attempts["ruim"] == 2
+    assert results["pular"]["status"] == STATUS_SKIPPED
+
+def test_trading_days_skip_weekends():
+    """Sábados e domingos não entram no intervalo"""
+    assert trading_days("250926", "250930") == ["250926", "250929", "250930"]
@@ -1,8 +1,17 @@
-from azure_storage import get_file_from_blob
+from azure_storage import get_file_from_blob, get_source_validator, list_day_parts
 from database import DatabaseManager, Cotacoes
+import load_ledger
+import metrics
+import compact_schema
+import instrumentation
+from instrumentation import span
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
+from helpers import print_timestamp, format_file_size
 from decimal import Decimal
+import multiprocessing
+import os
 import re
 import time
 from tqdm import tqdm
@@ -10,20 +19,12 @@ from tqdm import tqdm
 # Namespace usado no XML da B3 (seção de cotações)
 NAMESPACE = {"ns": "urn:bvmf.217.01.xsd"}
 
-def print_timestamp():
-    """Retorna timestamp formatado para logs"""
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-def format_file_size(size_bytes):
-    """Formata tamanho de arquivo em unidades legíveis"""
-    if size_bytes == 0:
-        return "0 B"
-    size_names = ["B", "KB", "MB", "GB"]
-    i = 0
-    while size_bytes >= 1024 and i < len(size_names) - 1:
-        size_bytes /= 1024
-        i += 1
-    return f"{size_bytes:.1f} {size_names[i]}"
+# Versão do parser registrada em load_ledger: incremente ao mudar a extração
+# dos campos para que arquivos já carregados sejam reprocessados
+PARSER_VERSION = "1"
+
+# Processos usados no parse das partes de um dia com vários XMLs
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "4"))
 
 def extract_date_from_xml(xml_date_text):
     """
@@ -82,12 +83,14 @@ def clean_price_value(price_text):
         print(f"[WARN] Valor de preço inválido: {price_text}")
     return None
 
-def process_xml_cotacoes(file_name):
+def process_xml_cotacoes(file_name, xml_content=None):
     """
     Processa arquivo XML da B3 e extrai dados de cotações
 
     Args:
         file_name: Nome do arquivo no blob storage
+        xml_content: Conteúdo do XML já em memória (bytes ou str); quando
+                     informado, o arquivo não é baixado do blob storage
 
     Returns:
         Lista de dicionários com dados das cotações
@@ -95,18 +98,24 @@ def process_xml_cotacoes(file_name):
     processing_start = time.time()
     print(f"[{print_timestamp()}] [INFO] 📥 Iniciando processamento do arquivo: {file_name}")
 
-    # Obtém o conteúdo do arquivo do blob storage
-    download_start = time.time()
-    xml_content = get_file_from_blob(file_name)
-    download_time = time.time() - download_start
-    
-    if not xml_content:
-        print(f"[{print_timestamp()}] [ERROR] ❌ Não foi possível obter o arquivo {file_name} do blob storage")
-        return []
+    if xml_content is None:
+        # Obtém o conteúdo do arquivo do blob storage
+        download_start = time.time()
+        xml_content = get_file_from_blob(file_name)
+        download_time = time.time() - download_start
 
-    xml_size = len(xml_content.encode('utf-8'))
-    print(f"[{print_timestamp()}] [OK] ✅ Arquivo baixado do blob storage em {download_time:.2f}s ({format_file_size(xml_size)})")
+        if not xml_content:
+            print(f"[{print_timestamp()}] [ERROR] ❌ Não foi possível obter o arquivo {file_name} do blob storage")
+            return []
+
+        xml_size = len(xml_content.encode('utf-8'))
+        print(f"[{print_timestamp()}] [OK] ✅ Arquivo baixado do blob storage em {download_time:.2f}s ({format_file_size(xml_size)})")
+    else:
+        # ET.fromstring aceita bytes direto: sem decodificar/recodificar o arquivo
+        xml_size = len(xml_content) if isinstance(xml_content, bytes) else len(xml_content.encode('utf-8'))
+        print(f"[{print_timestamp()}] [INFO] ⚡ Usando XML em memória ({format_file_size(xml_size)}), sem download do blob")
 
+    instrumentation.add("bytes", xml_size)
     cotacoes_data = []
     stats = {
         'total_elements': 0,
@@ -133,6 +142,7 @@ def process_xml_cotacoes(file_name):
         search_time = time.time() - search_start
         
         stats['total_elements'] = len(pric_rpts)
+        instrumentation.add("elements", len(pric_rpts))
         print(f"[{print_timestamp()}] [INFO] 📊 Encontrados {len(pric_rpts)} elementos PricRpt para processar em {search_time:.2f}s")
 
         # Processamento com barra de progresso
@@ -251,25 +261,164 @@ def process_xml_cotacoes(file_name):
     print(f"[{print_timestamp()}] [OK] ✅ Processamento XML concluído com sucesso!")
     return cotacoes_data
 
-def transform_and_load(file_name):
+def process_xml_parts(part_names, xml_parts=None, max_workers=PARSE_WORKERS):
+    """
+    Processa todas as partes XML de um dia
+
+    Com mais de uma parte, cada uma é processada em um processo separado
+    (o parse com ElementTree não libera o GIL). Uma parte sem cotações
+    invalida o dia inteiro: no modo replace, uma carga parcial apagaria as
+    cotações das partes ausentes.
+
+    Args:
+        part_names: Blobs das partes (azure_storage.list_day_parts)
+        xml_parts: dict parte -> conteúdo já em memória (modo direto)
+        max_workers: Processos simultâneos
+
+    Returns:
+        Lista de dicionários com dados das cotações de todas as partes
+    """
+    with span("parse", parts=len(part_names)) as sp:
+        xml_parts = xml_parts or {}
+        if len(part_names) == 1:
+            cotacoes_data = process_xml_cotacoes(part_names[0], xml_parts.get(part_names[0]))
+            sp.add("rows", len(cotacoes_data))
+            return cotacoes_data
+
+        workers = max(1, min(max_workers, len(part_names)))
+        print(f"[{print_timestamp()}] [INFO] 🧩 Processando {len(part_names)} partes em {workers} processo(s)")
+
+        # spawn: processos limpos, sem herdar conexões nem threads do pai
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(process_xml_cotacoes, name, xml_parts.get(name))
+                for name in part_names
+            ]
+            results = [future.result() for future in futures]
+
+        empty = [name for name, data in zip(part_names, results) if not data]
+        if empty:
+            print(f"[{print_timestamp()}] [ERROR] ❌ Parte(s) sem cotações: {', '.join(empty)}; dia descartado")
+            return []
+
+        cotacoes_data = [cotacao for data in results for cotacao in data]
+        # Bytes e elementos contados nos processos filhos não chegam a este processo
+        sp.add("bytes", sum(len(data) for data in xml_parts.values()))
+        sp.add("rows", len(cotacoes_data))
+        print(f"[{print_timestamp()}] [OK] ✅ {len(part_names)} partes processadas em {sp.elapsed():.2f}s "
+              f"({len(cotacoes_data):,} cotações)")
+        return cotacoes_data
+
+def parts_load_settings(part_count, workers, commit_mode):
+    """
+    Conexões e modo de commit da carga de um dia com part_count partes
+
+    Sem --workers explícito, um dia com várias partes é carregado com uma
+    conexão por parte (até PARSE_WORKERS) em um único commit 2PC.
+
+    Returns:
+        tuple: (workers, commit_mode)
+    """
+    if part_count > 1 and workers == 1:
+        workers, commit_mode = min(part_count, PARSE_WORKERS), "2pc"
+        print(f"[{print_timestamp()}] [INFO] 🧩 {part_count} partes: carga com {workers} conexões em commit único")
+    return workers, commit_mode
+
+def transform_and_load(file_name, load_mode="replace", workers=1, commit_mode="2pc", force=False,
+                       xml_parts=None, archive=None):
     """
     Função principal que executa o pipeline de transformação e carga
 
     Args:
         file_name: Nome do arquivo XML no blob storage
+        load_mode: 'replace' recarrega as datas do arquivo de forma idempotente;
+                   'append' insere todos os registros sem tocar nos existentes
+        workers: Conexões paralelas usadas na carga (1 = carga em uma conexão)
+        commit_mode: Com workers > 1, '2pc' (tudo ou nada) ou 'independent'
+        force: Recarrega mesmo que o load_ledger indique o arquivo já carregado
+        xml_parts: dict parte -> XML já em memória (modo direto, extract.extract_direct)
+        archive: Future do arquivamento no blob; aguardado antes da carga para
+                 que o load_ledger registre a versão gravada no manifesto
     """
     pipeline_start = time.time()
     print(f"[{print_timestamp()}] [INFO] 🚀 Iniciando pipeline de transformação e carga para: {file_name}")
 
+    # 0. Consulta o ledger antes de processar o arquivo, com a versão da B3
+    # gravada no manifesto (no modo direto o manifesto ainda está sendo
+    # gravado: a versão é lida e consultada após o arquivamento)
+    db = DatabaseManager()
+    etag = get_source_validator(file_name) if archive is None else None
+    if archive is None and _already_loaded(db, file_name, etag, force):
+        return True
+
     # 1. Processar XML e extrair dados
     print(f"[{print_timestamp()}] [INFO] 📊 ETAPA 1: Processamento de dados XML")
-    cotacoes_data = process_xml_cotacoes(file_name)
+    part_names = list(xml_parts) if xml_parts else list_day_parts(file_name)
+    cotacoes_data = process_xml_parts(part_names, xml_parts)
+    xml_parts = None  # libera o XML antes da carga
+    if cotacoes_data and compact_schema.COMPACT_STORAGE:
+        # Armazenamento compacto: ids dos ativos resolvidos junto com o parse
+        try:
+            compact_schema.resolve_ticker_ids(db, cotacoes_data)
+        except Exception as e:
+            print(f"[{print_timestamp()}] [ERROR] ❌ Falha ao resolver os ids dos ativos: {e}")
+            return False
+
+    if archive is not None:
+        # O blob é o registro oficial: sem arquivamento, não há carga
+        archive_wait_start = time.time()
+        try:
+            archive.result()
+        except Exception as e:
+            print(f"[{print_timestamp()}] [ERROR] ❌ Falha ao arquivar {file_name} no blob storage: {e}")
+            return False
+        etag = get_source_validator(file_name)
+        print(f"[{print_timestamp()}] [OK] ✅ Arquivamento no blob confirmado "
+              f"(espera de {time.time() - archive_wait_start:.2f}s após o parse)")
+        if _already_loaded(db, file_name, etag, force):
+            return True
 
     if not cotacoes_data:
         pipeline_time = time.time() - pipeline_start
         print(f"[{print_timestamp()}] [WARN] ⚠️ Nenhuma cotação foi extraída do arquivo após {pipeline_time:.2f}s")
         return False
 
+    workers, commit_mode = parts_load_settings(len(part_names), workers, commit_mode)
+    with span("load", mode=load_mode, workers=workers) as sp:
+        loaded = load_parsed(file_name, cotacoes_data, etag, load_mode, workers, commit_mode,
+                             db=db, pipeline_start=pipeline_start)
+        sp.add("rows", len(cotacoes_data) if loaded else 0)
+    return loaded
+
+def _already_loaded(db, file_name, etag, force):
+    """Versão da B3 já carregada com o parser atual (False sem versão conhecida ou com force)"""
+    if force or not etag or not db.connect() or not load_ledger.is_loaded(db, file_name, etag, PARSER_VERSION):
+        return False
+    print(f"[{print_timestamp()}] [INFO] ⏭️ {file_name} já carregado (versão {etag}, parser {PARSER_VERSION}); "
+          f"use --force para recarregar")
+    return True
+
+def load_parsed(file_name, cotacoes_data, etag, load_mode="replace", workers=1, commit_mode="2pc",
+                db=None, pipeline_start=None):
+    """
+    Carrega cotações já extraídas do XML (etapas 2 a 5 do pipeline)
+
+    Separada de transform_and_load para que o agendador multi-dia
+    (scheduler.py) execute parse e carga como estágios independentes.
+
+    Args:
+        file_name: Nome do arquivo XML no blob storage (chave do load_ledger)
+        cotacoes_data: Registros retornados por process_xml_cotacoes
+        etag: Versão da B3 registrada no load_ledger (azure_storage.get_source_validator)
+        db: DatabaseManager (padrão: novo)
+        pipeline_start: Início do pipeline, para o tempo total (padrão: agora)
+
+    Returns:
+        bool: True se os dados foram carregados
+    """
+    db = db or DatabaseManager()
+    pipeline_start = pipeline_start or time.time()
+
     # 2. Preparar dados para inserção (manter todos os registros)
     prep_start = time.time()
     print(f"[{print_timestamp()}] [INFO] 📊 ETAPA 2: Preparação dos dados")
@@ -297,7 +446,6 @@ def transform_and_load(file_name):
     print(f"[{print_timestamp()}] [INFO] 📊 ETAPA 3: Conexão com banco de dados")
     db_start = time.time()
     
-    db = DatabaseManager()
     if not db.connect():
         pipeline_time = time.time() - pipeline_start
         print(f"[{print_timestamp()}] [ERROR] ❌ Falha ao conectar ao banco de dados após {pipeline_time:.2f}s")
@@ -319,21 +467,34 @@ def transform_and_load(file_name):
     print(f"[{print_timestamp()}] [OK] ✅ Estrutura de tabelas verificada em {table_time:.2f}s")
 
     # 5. Inserir dados em lote
-    print(f"[{print_timestamp()}] [INFO] 📊 ETAPA 4: Inserção de dados no PostgreSQL")
-    insert_start = time.time()
-    
-    inserted_count = db.insert_cotacoes_batch(cotacoes_unique)
-    insert_time = time.time() - insert_start
+    print(f"[{print_timestamp()}] [INFO] 📊 ETAPA 4: Inserção de dados no PostgreSQL (modo: {load_mode})")
+    load_ledger.mark_started(db, file_name, etag, PARSER_VERSION, load_mode)
+    try:
+        inserted_count = db.load_cotacoes(cotacoes_unique, mode=load_mode, workers=workers, commit_mode=commit_mode)
+    except Exception as e:
+        load_ledger.mark_finished(db, file_name, 0, time.time() - pipeline_start, error=str(e))
+        raise
+    load_ledger.mark_finished(
+        db, file_name, inserted_count, time.time() - pipeline_start,
+        error=None if inserted_count > 0 else "Nenhum registro carregado"
+    )
 
     pipeline_total_time = time.time() - pipeline_start
 
     if inserted_count > 0:
-        rate = inserted_count / insert_time if insert_time > 0 else 0
+        # 6. Métricas derivadas (somente das datas carregadas); falha não desfaz a carga
+        print(f"[{print_timestamp()}] [INFO] 📊 ETAPA 5: Métricas derivadas")
+        try:
+            with span("metrics"):
+                metrics.update_metrics(db, {c['data_pregao'] for c in cotacoes_unique})
+        except Exception as e:
+            print(f"[{print_timestamp()}] [WARN] ⚠️ Falha ao calcular métricas derivadas "
+                  f"(reexecute com 'python metrics.py'): {e}")
+
+        pipeline_total_time = time.time() - pipeline_start
         print(f"[{print_timestamp()}] [SUCCESS] 🎉 Pipeline concluído com sucesso!")
         print(f"[{print_timestamp()}] [INFO] 📊 RESUMO FINAL:")
         print(f"[{print_timestamp()}] [INFO]   ✅ Cotações inseridas: {inserted_count:,}")
-        print(f"[{print_timestamp()}] [INFO]   ⏱️  Tempo de inserção: {insert_time:.2f}s")
-        print(f"[{print_timestamp()}] [INFO]   📈 Taxa de inserção: {rate:.0f} registros/s")
         print(f"[{print_timestamp()}] [INFO]   ⏱️  Tempo total do pipeline: {pipeline_total_time:.2f}s")
         return True
     else:
@@ -0,0 +1,216 @@
+"""
+Workers distribuídos por data coordenados pela fila do Azurite
+
+- Coordenador (main.py --enqueue AAMMDD-AAMMDD): publica uma mensagem por
+  dia útil na fila WORK_QUEUE_NAME
+- Worker (main.py --worker): recebe uma mensagem por vez com
+  VISIBILITY_TIMEOUT_SECONDS, renova a visibilidade enquanto processa e
+  apaga a mensagem (ack) só depois do pipeline concluir
+
+Vários workers (máquinas ou containers) podem consumir a mesma fila: cada
+mensagem fica invisível para os demais enquanto um worker a processa. Se o
+worker morrer, a mensagem volta à fila ao fim do timeout e outro worker a
+retoma. O processamento é idempotente: a carga substitui os dados da data e
+o load_ledger pula arquivos já carregados.
+
+Mensagens recebidas mais de MAX_DEQUEUE_COUNT vezes vão para a fila
+POISON_QUEUE_NAME com o último erro, sem bloquear as demais.
+
+Uso:
+    python work_queue.py              # Mensagens pendentes em cada fila
+    python work_queue.py --clear      # Esvazia a fila de trabalho e a de poison
+"""
+
+from datetime import datetime
+from helpers import print_timestamp
+import json
+import os
+import threading
+import time
+
+WORK_QUEUE_NAME = os.getenv("WORK_QUEUE_NAME", "pregoes-pendentes")
+POISON_QUEUE_NAME = os.getenv("POISON_QUEUE_NAME", "pregoes-poison")
+
+# Tempo que uma mensagem fica invisível para outros workers após o recebimento
+VISIBILITY_TIMEOUT_SECONDS = int(os.getenv("VISIBILITY_TIMEOUT_SECONDS", "300"))
+# Tentativas antes de mover a mensagem para a fila de poison
+MAX_DEQUEUE_COUNT = int(os.getenv("MAX_DEQUEUE_COUNT", "5"))
+# Espera antes de uma nova tentativa após falha (a mensagem volta a ficar visível)
+RETRY_DELAY_SECONDS = int(os.getenv("RETRY_DELAY_SECONDS", "60"))
+# Espera máxima entre consultas com a fila vazia
+IDLE_MAX_SECONDS = 30
+
+def get_queue(name):
+    """QueueClient da fila name, criada se ainda não existir"""
+    from azure.storage.queue import QueueClient
+    from azure.core.exceptions import ResourceExistsError
+    from config import AZURE_QUEUE_CONNECTION
+
+    queue = QueueClient.from_connection_string(AZURE_QUEUE_CONNECTION, name)
+    try:
+        queue.create_queue()
+    except ResourceExistsError:
+        pass
+    return queue
+
+def enqueue_dates(days, force=False):
+    """
+    Publica uma mensagem por data na fila de trabalho
+
+    Args:
+        days: Datas YYMMDD
+        force: Os workers reprocessam mesmo datas já carregadas
+
+    Returns:
+        int: Mensagens publicadas
+    """
+    queue = get_queue(WORK_QUEUE_NAME)
+    for day in days:
+        queue.send_message(json.dumps({"date": day, "force": force}))
+    print(f"[{print_timestamp()}] [OK] ✅ {len(days)} data(s) publicada(s) em '{WORK_QUEUE_NAME}'")
+    return len(days)
+
+class _VisibilityHeartbeat:
+    """
+    Renova a visibilidade da mensagem enquanto o worker a processa
+
+    Cada renovação devolve um novo pop_receipt, necessário para o ack.
+    """
+
+    def __init__(self, queue, message):
+        self.queue = queue
+        self.message = message
+        self.pop_receipt = message.pop_receipt
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="visibility-heartbeat", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(VISIBILITY_TIMEOUT_SECONDS / 3):
+            try:
+                self.extend(VISIBILITY_TIMEOUT_SECONDS)
+            except Exception as e:
+                print(f"[{print_timestamp()}] [WARN] ⚠️ Falha ao renovar a visibilidade da mensagem: {e}")
+
+    def extend(self, seconds):
+        """Mantém a mensagem invisível por mais seconds segundos"""
+        with self._lock:
+            updated = self.queue.update_message(self.message, pop_receipt=self.pop_receipt,
+                                                visibility_timeout=seconds)
+            self.pop_receipt = updated.pop_receipt
+
+def _to_poison(queue, poison, message, error):
+    """Move a mensagem para a fila de poison com o motivo"""
+    poison.send_message(json.dumps({
+        "message": message.content,
+        "dequeue_count": message.dequeue_count,
+        "error": error,
+        "moved_at": datetime.now().isoformat(timespec="seconds"),
+    }))
+    queue.delete_message(message, message.pop_receipt)
+
+def run_worker(pipeline, exit_when_empty=False, **pipeline_options):
+    """
+    Consome a fila de trabalho até Ctrl+C (ou até esvaziá-la)
+
+    Args:
+        pipeline: pipeline(date_str, force=..., **pipeline_options) -> bool (main.run_pipeline)
+        exit_when_empty: Encerra quando não houver mensagens (jobs em lote)
+
+    Returns:
+        dict: Contadores {'done', 'failed', 'poisoned'}
+    """
+    queue = get_queue(WORK_QUEUE_NAME)
+    poison = get_queue(POISON_QUEUE_NAME)
+    counters = {"done": 0, "failed": 0, "poisoned": 0}
+    idle = 1
+    last_errors = {}
+
+    print(f"[{print_timestamp()}] [INFO] 👷 Worker consumindo '{WORK_QUEUE_NAME}' "
+          f"(visibilidade {VISIBILITY_TIMEOUT_SECONDS}s, até {MAX_DEQUEUE_COUNT} tentativas)")
+    try:
+        while True:
+            # Uma mensagem por vez: as demais continuam visíveis para outros workers
+            pages = queue.receive_messages(messages_per_page=1, visibility_timeout=VISIBILITY_TIMEOUT_SECONDS)
+            message = next(iter(pages), None)
+            if message is None:
+                if exit_when_empty:
+                    break
+                time.sleep(idle)
+                idle = min(idle * 2, IDLE_MAX_SECONDS)
+                continue
+            idle = 1
+
+            try:
+                payload = json.loads(message.content)
+                day = payload["date"]
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"[{print_timestamp()}] [ERROR] ❌ Mensagem inválida {message.id}: {e}")
+                _to_poison(queue, poison, message, f"Mensagem inválida: {e}")
+                counters["poisoned"] += 1
+                continue
+
+            if message.dequeue_count > MAX_DEQUEUE_COUNT:
+                error = last_errors.pop(message.id, "excedeu o limite de tentativas")
+                print(f"[{print_timestamp()}] [ERROR] ☠️ {day}: {message.dequeue_count} tentativas; "
+                      f"movida para '{POISON_QUEUE_NAME}'")
+                _to_poison(queue, poison, message, error)
+                counters["poisoned"] += 1
+                continue
+
+            print(f"[{print_timestamp()}] [INFO] 📥 {day}: tentativa {message.dequeue_count}/{MAX_DEQUEUE_COUNT}")
+            with _VisibilityHeartbeat(queue, message) as heartbeat:
+                try:
+                    ok = pipeline(day, force=payload.get("force", False), **pipeline_options)
+                    error = None if ok else "pipeline retornou falha"
+                except Exception as e:
+                    ok, error = False, str(e)
+
+            if ok:
+                # Ack: só agora a mensagem sai da fila
+                queue.delete_message(message, heartbeat.pop_receipt)
+                last_errors.pop(message.id, None)
+                counters["done"] += 1
+            else:
+                # Volta à fila após RETRY_DELAY_SECONDS (para este ou outro worker)
+                last_errors[message.id] = error
+                heartbeat.extend(RETRY_DELAY_SECONDS)
+                counters["failed"] += 1
+                print(f"[{print_timestamp()}] [WARN] ⚠️ {day}: {error}; nova tentativa em {RETRY_DELAY_SECONDS}s")
+    except KeyboardInterrupt:
+        # Mensagem em andamento volta à fila ao fim do timeout de visibilidade
+        print(f"\n[{print_timestamp()}] [INFO] ⚠️ Worker interrompido pelo usuário")
+
+    print(f"[{print_timestamp()}] [INFO] 📊 Worker: {counters['done']} concluída(s), "
+          f"{counters['failed']} falha(s), {counters['poisoned']} em poison")
+    return counters
+
+def queue_report():
+    """
+    Mensagens aproximadas em cada fila
+
+    Returns:
+        dict: nome da fila -> mensagens
+    """
+    return {
+        name: get_queue(name).get_queue_properties().approximate_message_count
+        for name in (WORK_QUEUE_NAME, POISON_QUEUE_NAME)
+    }
+
+if __name__ == "__main__":
+    import sys
+
+    if "--clear" in sys.argv[1:]:
+        for name in (WORK_QUEUE_NAME, POISON_QUEUE_NAME):
+            get_queue(name).clear_messages()
+        print(f"[{print_timestamp()}] [OK] ✅ Filas esvaziadas")
+    for name, count in queue_report().items():
+        print(f"{name:<24} {count:>8} mensagem(ns)")